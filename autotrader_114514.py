@@ -22,12 +22,14 @@ from typing import List
 
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
-import numpy as np
-import matplotlib
-
-matplotlib.use('Agg')
-from matplotlib import pyplot
-import gc
+from charts import ChartRenderer
+from diagnostics import OFF, Diagnostics
+from gc_policy import CollectionPolicy
+from log_pipeline import LogPipeline
+from regression import SlidingSlope
+from retention import RetentionPolicy
+from scheduler import MessageScheduler
+from streaming_stats import RollingStats, RollingVWAP
 
 LOT_SIZE = 10
 POSITION_LIMIT = 100
@@ -38,22 +40,9 @@ MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 PERIOD_HISTORY = 26
 PERIOD_VWAP = 12
 OFFSET = 2.4
-
-
-# 画图函数
-def save_img(name: str, a: List[int], b: List[int], cc: List[int], d: List[int]):
-    fig = pyplot.figure(figsize=(min(len(a) / 10, 50), min(len(b) / 10, 50)), clear=True)
-    pp = fig.add_subplot(111)
-    pp.grid(True)
-    pp.plot(a, c='black')
-    pp.plot(b, c='orange')
-    pp.plot(cc, c='green')
-    pp.plot(d, c='red')
-    pyplot.savefig(name, dpi=100)
-    pyplot.clf()
-    pyplot.close(fig)
-    del fig
-    gc.collect()
+PLOT_HISTORY = 500  # samples shown on the charts
+GC_POLICY = "default"  # one of gc_policy.POLICIES
+DIAGNOSTICS_LEVEL = OFF  # diagnostics.DEBUG records every channel
 
 
 class AutoTrader(BaseAutoTrader):
@@ -70,6 +59,7 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
+        self.outbox = MessageScheduler(loop, self, on_dropped=self.on_insert_dropped)
         self.bids = set()
         self.asks = set()
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
@@ -79,14 +69,24 @@ class AutoTrader(BaseAutoTrader):
         self.temp_price = 0
         self.state = 0  # 0为平仓状态 1为做多状态 -1为做空状态
         # FUTURE的vwap
-        self.future_vwap_list = list()
-        self.future_vwap_upper_rail = list()
-        self.future_vwap_lower_rail = list()
-        self.future_history_price = list()
-        self.future_history_volume = list()
-        self.future_time = [0]
+        self.retention = RetentionPolicy()
+        self.future_vwap_list = self.retention.retain("future_vwap_list", PLOT_HISTORY)
+        self.future_vwap_stats = RollingStats(PERIOD_VWAP)
+        self.future_vwap_upper_rail = self.retention.retain("future_vwap_upper_rail", PLOT_HISTORY)
+        self.future_vwap_lower_rail = self.retention.retain("future_vwap_lower_rail", PLOT_HISTORY)
+        self.future_history_price = self.retention.retain("future_history_price", PLOT_HISTORY)
+        self.retention.report(self.logger)
+        self.future_history = RollingVWAP(PERIOD_HISTORY - 1, skip_first=True)
+        self.future_trend = SlidingSlope(5)
         # FUTURE的vwap斜率
         self.future_slope = 0
+        # 画图
+        self.charts = ChartRenderer(self.logger)
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
+        self.diagnostics = Diagnostics(team_name + "_diagnostics.txt", DIAGNOSTICS_LEVEL)
+        self.slope_diagnostics = self.diagnostics.channel("future_slope", ("slope",))
+        self.book_diagnostics = self.diagnostics.channel("book", ("bid", "ask"))
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -98,6 +98,15 @@ class AutoTrader(BaseAutoTrader):
         if client_order_id != 0 and (client_order_id in self.bids or client_order_id in self.asks):
             self.on_order_status_message(client_order_id, 0, 0, 0)
 
+    def on_insert_dropped(self, client_order_id: int) -> None:
+        """Called when the outbox drops an insert that was cancelled before it was sent."""
+        if client_order_id == self.bid_id:
+            self.bid_id = 0
+        elif client_order_id == self.ask_id:
+            self.ask_id = 0
+        self.bids.discard(client_order_id)
+        self.asks.discard(client_order_id)
+
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled.
 
@@ -117,6 +126,7 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
         self.logger.info("received order book for instrument %d with sequence number %d", instrument,
                          sequence_number)
 
@@ -133,71 +143,62 @@ class AutoTrader(BaseAutoTrader):
             new_ask_price = ask_prices[0] + price_adjustment if ask_prices[0] != 0 else 0"""
 
             self.future_history_price.append((ask_prices[0] + bid_prices[0]) / 2)
-            self.future_history_volume.append(ask_volumes[0] + bid_volumes[0])
+            self.future_history.push(self.future_history_price[-1], ask_volumes[0] + bid_volumes[0])
 
             # 计算vwap
-            s = s2 = 0
-            for i in range(-1, -min(len(self.future_history_price), PERIOD_HISTORY), -1):
-                s += self.future_history_price[i] * self.future_history_volume[i]
-                s2 += self.future_history_volume[i]
-            if s2 == 0:
-                vwap = 0
-            else:
-                vwap = int(s / s2)
+            vwap = int(self.future_history.vwap())
             self.future_vwap_list.append(vwap)
-            std = np.std(self.future_vwap_list[-PERIOD_VWAP:])
+            self.future_vwap_stats.push(vwap)
+            std = self.future_vwap_stats.std()
             self.future_vwap_upper_rail.append(vwap + std * OFFSET)
             self.future_vwap_lower_rail.append(vwap - std * OFFSET)
-            self.future_time.append(self.future_time[-1] + 1)
 
             # vwap斜率
-            if len(self.future_time) > 5:
-                a = self.future_time[-5:]
-                b = self.future_vwap_list[-5:]
-                params = np.polyfit(a, b, 1)
-                poly = np.poly1d(params)
-                print(poly[1])
-                self.future_slope = poly[1]
+            self.future_trend.push(vwap)
+            if len(self.future_trend) == 5:
+                self.future_slope = self.future_trend.slope()
+                self.slope_diagnostics.record(self.future_slope)
 
             # 画图
-            if len(self.future_history_price) > PERIOD_HISTORY:
-                save_img('a.png',
-                         self.future_history_price[PERIOD_HISTORY:],
-                         self.future_vwap_list[PERIOD_HISTORY:],
-                         self.future_vwap_upper_rail[PERIOD_HISTORY:],
-                         self.future_vwap_lower_rail[PERIOD_HISTORY:])
+            shown = self.future_history_price.count - PERIOD_HISTORY
+            if shown > 0:
+                self.charts.plot('a.png',
+                                 ((self.future_history_price.tail(shown), 'black'),
+                                  (self.future_vwap_list.tail(shown), 'orange'),
+                                  (self.future_vwap_upper_rail.tail(shown), 'green'),
+                                  (self.future_vwap_lower_rail.tail(shown), 'red')))
 
             # 交易
             if self.bid_id != 0 and bid_prices[0] not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
+                self.outbox.send_cancel_order(self.bid_id)
                 self.bid_id = 0
             if self.ask_id != 0 and ask_prices[0] not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
+                self.outbox.send_cancel_order(self.ask_id)
                 self.ask_id = 0
 
-            print(bid_prices[0],ask_prices[0])
+            self.book_diagnostics.record(bid_prices[0], ask_prices[0])
             fuck = 110000
 
             if -1 < self.future_slope < 1:
                 if self.state == -1 and (1 - bid_prices[0] / self.temp_price >= self.stop_profit or bid_prices[0] / self.temp_price - 1 >= self.stop_loss):
                     if self.bid_id == 0 and bid_prices[0] != 0 and self.position + LOT_SIZE < POSITION_LIMIT:
-                        self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, LOT_SIZE)
+                        self.outbox.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, LOT_SIZE)
                         self.state = 0
                         self.temp_price = 0
 
                 elif self.state == 1 and (ask_prices[0] / self.temp_price - 1 >= self.stop_profit or 1 - ask_prices[0] / self.temp_price >= self.stop_loss):
                     if self.ask_id == 0 and ask_prices[0] != 0 and self.position - LOT_SIZE > -POSITION_LIMIT:
-                        self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, LOT_SIZE)
+                        self.outbox.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, LOT_SIZE)
                         self.state = 0
                         self.temp_price = 0
 
                 if self.state == 0:
                     if self.bid_id == 0 and bid_prices[0] != 0 and self.position + LOT_SIZE < POSITION_LIMIT and bid_prices[0] <= self.future_vwap_lower_rail[-1]:
-                        self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, LOT_SIZE)
+                        self.outbox.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, LOT_SIZE)
                         self.temp_price = bid_prices[0]
                         self.state = 1
                     if self.ask_id == 0 and ask_prices[0] != 0 and self.position - LOT_SIZE > -POSITION_LIMIT and ask_prices[0] >= self.future_vwap_upper_rail[-1]:
-                        self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, LOT_SIZE)
+                        self.outbox.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, LOT_SIZE)
                         self.temp_price = ask_prices[0]
                         self.state = -1
 
@@ -212,10 +213,10 @@ class AutoTrader(BaseAutoTrader):
                          price, volume)
         """if client_order_id in self.bids:
             self.position += volume
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
         elif client_order_id in self.asks:
             self.position -= volume
-            self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)"""
+            self.outbox.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)"""
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
                                 fees: int) -> None:
@@ -21,13 +21,21 @@ from typing import List
 
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, Side, MAXIMUM_ASK, MINIMUM_BID
 
-import numpy as np
+from diagnostics import OFF, Diagnostics
+from gc_policy import CollectionPolicy
+from log_pipeline import LogPipeline
+from orders import DONE, OrderRegistry
+from regression import SlidingSlope
+from scheduler import MessageScheduler
+from streaming_stats import RollingVWAP
 
 LOT_SIZE = 10
 POSITION_LIMIT = 100
 TICK_SIZE_IN_CENTS = 100
 MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
+GC_POLICY = "default"  # one of gc_policy.POLICIES
+DIAGNOSTICS_LEVEL = OFF  # diagnostics.DEBUG records every channel
 
 
 class AutoTrader(BaseAutoTrader):
@@ -44,26 +52,23 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
-        self.bids = set()
-        self.asks = set()
+        self.orders = OrderRegistry()
+        self.outbox = MessageScheduler(loop, self, self.orders)
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
-        self.fut_bids = set()
-        self.fut_asks = set()
         self.fut_ask_id = self.fut_bid_id = self.fut_position = 0
         self.value = 0
         self.fut_vwap = self.fut_prev_vwap = self.prev_fut_return = 0
         self.delta = 0
         self.etf_price = self.fut_price = 0
         #for vwap
-        self.vwap_list = list()
-        self.history_price = list()
-        self.history_volume = list()
-        self.time = [0]
+        self.history = RollingVWAP(23, skip_first=True)
         #for slopes
-        self.a = list()
-        self.b = list()
-        self.poly = np.poly1d([0])
-        self.history_price_aver = list()
+        self.vwap_trend = SlidingSlope(5)
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
+        self.diagnostics = Diagnostics(team_name + "_diagnostics.txt", DIAGNOSTICS_LEVEL)
+        self.slope_diagnostics = self.diagnostics.channel("slope", ("slope",))
+        self.price_diagnostics = self.diagnostics.channel("prices", ("future", "etf", "value"))
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -72,8 +77,11 @@ class AutoTrader(BaseAutoTrader):
         will identify that order, otherwise the client_order_id will be zero.
         """
         self.logger.warning("error with order %d: %s", client_order_id, error_message.decode())
-        if client_order_id != 0:
+        order = self.orders.get(client_order_id)
+        if order is not None and order.instrument == Instrument.ETF:
             self.on_order_status_message(client_order_id, 0, 0, 0)
+        elif order is not None:
+            self.orders.hedge_filled(client_order_id)
 
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled, partially or fully.
@@ -86,9 +94,10 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received hedge filled for order %d with average price %d and volume %d", client_order_id,
                          price, volume)
-        if client_order_id in self.fut_bids:
+        order = self.orders.hedge_filled(client_order_id)
+        if order is not None and order.side == Side.BID:
             self.fut_position += volume
-        elif client_order_id in self.fut_asks:
+        elif order is not None:
             self.fut_position -= volume
 
     def on_order_book_update_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
@@ -100,36 +109,22 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
         self.logger.info("received order book for instrument %d with sequence number %d", instrument,
                          sequence_number)
         self.value = self.position * self.etf_price + self.fut_position * self.fut_price
 
-        self.history_price.append((ask_prices[0]+bid_prices[0])/2)
-        self.history_volume.append(ask_volumes[0]+bid_volumes[0])
-        if len(self.history_price) > 5:
-            self.history_price_aver.append(sum(self.history_price[-5:])/5)
+        self.history.push((ask_prices[0]+bid_prices[0])/2, ask_volumes[0]+bid_volumes[0])
 
         #calculate VWAP
-        s = s2 = 0
-        for i in range(-1,-min(len(self.history_price),24),-1):
-            s += self.history_price[i] * self.history_volume[i]
-            s2 += self.history_volume[i]
-        if s2 == 0:
-            vwap = 0
-        else:
-            vwap = int(s/s2)
-        self.vwap_list.append(vwap)
-
-        self.time.append(self.time[-1]+1)
+        vwap = int(self.history.vwap())
 
         #calculate slopes
-        if len(self.time) > 5:
-            self.a = self.time[-5:]
-            self.b = self.vwap_list[-5:]
-            params = np.polyfit(self.a,self.b,1)
-            self.poly = np.poly1d(params)
-            print("slope=",self.poly[1])
-        slope = self.poly[1]
+        self.vwap_trend.push(vwap)
+        slope = 0
+        if len(self.vwap_trend) == 5:
+            slope = self.vwap_trend.slope()
+            self.slope_diagnostics.record(slope)
         
         if bid_volumes[0] + ask_volumes[0] == 0:
             return
@@ -151,26 +146,28 @@ class AutoTrader(BaseAutoTrader):
             slope_adj = int(100 * slope) //TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
             new_bid_price = int((vwap + pos_adj + fut_return * 100) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS) - 200 + slope_adj
             new_ask_price = new_bid_price + slope_adj
-            print(self.fut_price/100, self.etf_price/100, self.value/100)
+            self.price_diagnostics.record(self.fut_price / 100, self.etf_price / 100, self.value / 100)
 
             if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
+                self.outbox.send_cancel_order(self.bid_id)
                 self.bid_id = 0
             if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
+                self.outbox.send_cancel_order(self.ask_id)
                 self.ask_id = 0
 
-            if self.bid_id == 0 and new_bid_price != 0 and self.position + 2*LOT_SIZE < POSITION_LIMIT:
+            if (self.bid_id == 0 and new_bid_price != 0 and self.position + 2*LOT_SIZE < POSITION_LIMIT
+                    and self.orders.exposure.capacity(Side.BUY) >= LOT_SIZE):
                 self.bid_id = next(self.order_ids)
                 self.bid_price = new_bid_price
-                self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
-                self.bids.add(self.bid_id)
+                self.orders.insert(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, 0)
+                self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
 
-            if self.ask_id == 0 and new_ask_price != 0 and self.position - 2*LOT_SIZE > -POSITION_LIMIT:
+            if (self.ask_id == 0 and new_ask_price != 0 and self.position - 2*LOT_SIZE > -POSITION_LIMIT
+                    and self.orders.exposure.capacity(Side.SELL) >= LOT_SIZE):
                 self.ask_id = next(self.order_ids)
                 self.ask_price = new_ask_price
-                self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
-                self.asks.add(self.ask_id)
+                self.orders.insert(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, 0)
+                self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when when of your orders is filled, partially or fully.
@@ -184,16 +181,18 @@ class AutoTrader(BaseAutoTrader):
 
         self.value = self.position * self.etf_price + self.fut_position * self.fut_price
 
-        if client_order_id in self.bids:
+        order = self.orders.filled(client_order_id, volume)
+
+        if order is not None and order.side == Side.BUY:
             self.position += volume
             self.fut_ask_id = next(self.order_ids)
-            self.send_hedge_order(self.fut_ask_id, Side.ASK, MIN_BID_NEAREST_TICK, volume)#int(self.value / self.fut_price)
-            self.fut_asks.add(self.fut_ask_id)
-        elif client_order_id in self.asks:
+            self.outbox.send_hedge_order(self.fut_ask_id, Side.ASK, MIN_BID_NEAREST_TICK, volume)#int(self.value / self.fut_price)
+            self.orders.hedge(self.fut_ask_id, Side.ASK, MIN_BID_NEAREST_TICK, volume)
+        elif order is not None:
             self.position -= volume
             self.fut_bid_id = next(self.order_ids)
-            self.send_hedge_order(self.fut_bid_id, Side.BID, MAX_ASK_NEAREST_TICK, volume)
-            self.fut_bids.add(self.fut_bid_id)
+            self.outbox.send_hedge_order(self.fut_bid_id, Side.BID, MAX_ASK_NEAREST_TICK, volume)
+            self.orders.hedge(self.fut_bid_id, Side.BID, MAX_ASK_NEAREST_TICK, volume)
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
                                 fees: int) -> None:
@@ -208,16 +207,13 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received order status for order %d with fill volume %d remaining %d and fees %d",
                          client_order_id, fill_volume, remaining_volume, fees)
-        if remaining_volume == 0:
+        order = self.orders.status(client_order_id, remaining_volume)
+        if order is not None and order.state == DONE:
             if client_order_id == self.bid_id:
                 self.bid_id = 0
             elif client_order_id == self.ask_id:
                 self.ask_id = 0
 
-            # It could be either a bid or an ask
-            self.bids.discard(client_order_id)
-            self.asks.discard(client_order_id)
-
     def on_trade_ticks_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
                                ask_volumes: List[int], bid_prices: List[int], bid_volumes: List[int]) -> None:
         """Called periodically when there is trading activity on the market.
@@ -22,12 +22,18 @@ from typing import List
 
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
+from gc_policy import CollectionPolicy
+from indicators import Ichimoku
+from log_pipeline import LogPipeline
+from scheduler import MessageScheduler
+
 
 LOT_SIZE = 10
 POSITION_LIMIT = 100
 TICK_SIZE_IN_CENTS = 100
 MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
+GC_POLICY = "default"  # one of gc_policy.POLICIES
 
 
 class AutoTrader(BaseAutoTrader):
@@ -44,11 +50,13 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
+        self.outbox = MessageScheduler(loop, self, on_dropped=self.on_insert_dropped)
         self.bids = set()
         self.asks = set()
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
-        self.history = [0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0]
-        self.chikou = [0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0]  #late for 26 days
+        self.ichimoku = Ichimoku()
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -60,6 +68,15 @@ class AutoTrader(BaseAutoTrader):
         if client_order_id != 0:
             self.on_order_status_message(client_order_id, 0, 0, 0)
 
+    def on_insert_dropped(self, client_order_id: int) -> None:
+        """Called when the outbox drops an insert that was cancelled before it was sent."""
+        if client_order_id == self.bid_id:
+            self.bid_id = 0
+        elif client_order_id == self.ask_id:
+            self.ask_id = 0
+        self.bids.discard(client_order_id)
+        self.asks.discard(client_order_id)
+
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled, partially or fully.
 
@@ -81,36 +98,39 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
         self.logger.info("received order book for instrument %d with sequence number %d", instrument,
                          sequence_number)
 
-        if len(self.history) > 52:
-            del self.history[0]
-        self.history.append((ask_prices[0]+bid_prices[0])/2)
-        self.chikou = self.history[:25]
-        
+        self.ichimoku.push((ask_prices[0]+bid_prices[0])/2)
+        # the chikou span (the price 27 ticks back) against the price, on the previous two ticks
+        chikou_pre = self.ichimoku.close_ago(29)
+        chikou_now = self.ichimoku.close_ago(28)
+        price_pre = self.ichimoku.close_ago(2)
+        price_now = self.ichimoku.close_ago(1)
+
         if instrument == Instrument.FUTURE:
             price_adjustment = - (self.position // LOT_SIZE) * TICK_SIZE_IN_CENTS
             new_bid_price = bid_prices[0] + price_adjustment if bid_prices[0] != 0 else 0
             new_ask_price = ask_prices[0] + price_adjustment if ask_prices[0] != 0 else 0
 
             if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
+                self.outbox.send_cancel_order(self.bid_id)
                 self.bid_id = 0
             if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
+                self.outbox.send_cancel_order(self.ask_id)
                 self.ask_id = 0
 
-            if self.bid_id == 0 and (self.chikou[min(24,len(self.chikou)-2)] < self.history[min(50,len(self.history)-2)] and self.chikou[min(25,len(self.chikou)-1)] > self.history[min(51,len(self.history)-1)]) and self.position < POSITION_LIMIT:
+            if self.bid_id == 0 and (chikou_pre < price_pre and chikou_now > price_now) and self.position < POSITION_LIMIT:
                 self.bid_id = next(self.order_ids)
                 self.bid_price = new_bid_price
-                self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
+                self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
                 self.bids.add(self.bid_id)
 
-            if self.ask_id == 0 and (self.chikou[min(24,len(self.chikou)-2)] > self.history[min(50,len(self.history)-2)] and self.chikou[min(25,len(self.chikou)-1)] < self.history[min(51,len(self.history)-1)]) and self.position > -POSITION_LIMIT:
+            if self.ask_id == 0 and (chikou_pre > price_pre and chikou_now < price_now) and self.position > -POSITION_LIMIT:
                 self.ask_id = next(self.order_ids)
                 self.ask_price = new_ask_price
-                self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
+                self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
                 self.asks.add(self.ask_id)
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
@@ -124,11 +144,11 @@ class AutoTrader(BaseAutoTrader):
                          price, volume)
         if client_order_id in self.bids:
             self.position += volume
-            self.send_hedge_order(next(self.order_ids), Side.BID, MINIMUM_BID, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.BID, MINIMUM_BID, volume)
         elif client_order_id in self.asks:
             self.position -= volume
-            self.send_hedge_order(next(self.order_ids), Side.ASK,
-                                  MAXIMUM_ASK//TICK_SIZE_IN_CENTS*TICK_SIZE_IN_CENTS, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.ASK,
+                                         MAXIMUM_ASK//TICK_SIZE_IN_CENTS*TICK_SIZE_IN_CENTS, volume)
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
                                 fees: int) -> None:
@@ -17,16 +17,21 @@
 #     <https://www.gnu.org/licenses/>.
 import asyncio
 import itertools
-import numpy as np
 
 from typing import List
 
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
+from gc_policy import CollectionPolicy
+from indicators import CROSS_DOWN, CROSS_UP, CrossoverDetector
+from log_pipeline import LogPipeline
+from scheduler import MessageScheduler
+
 
 LOT_SIZE = 10
 POSITION_LIMIT = 100
 TICK_SIZE_IN_CENTS = 100
+GC_POLICY = "default"  # one of gc_policy.POLICIES
 
 
 class AutoTrader(BaseAutoTrader):
@@ -43,12 +48,14 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
+        self.outbox = MessageScheduler(loop, self, on_dropped=self.on_insert_dropped)
         self.bids = set()
         self.asks = set()
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
         # use for CTA
-        self.history = list()
-        self.short_pre = self.short_now = self.long_pre = self.long_now = 0
+        self.crossover = CrossoverDetector(4, 19, delay=1)
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -60,6 +67,15 @@ class AutoTrader(BaseAutoTrader):
         if client_order_id != 0:
             self.on_order_status_message(client_order_id, 0, 0, 0)
 
+    def on_insert_dropped(self, client_order_id: int) -> None:
+        """Called when the outbox drops an insert that was cancelled before it was sent."""
+        if client_order_id == self.bid_id:
+            self.bid_id = 0
+        elif client_order_id == self.ask_id:
+            self.ask_id = 0
+        self.bids.discard(client_order_id)
+        self.asks.discard(client_order_id)
+
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled, partially or fully.
 
@@ -81,6 +97,7 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
         self.logger.info("received order book for instrument %d with sequence number %d", instrument,
                          sequence_number)
         if instrument == Instrument.FUTURE:
@@ -88,34 +105,31 @@ class AutoTrader(BaseAutoTrader):
             new_bid_price = bid_prices[0] + price_adjustment if bid_prices[0] != 0 else 0
             new_ask_price = ask_prices[0] + price_adjustment if ask_prices[0] != 0 else 0
 
-            if len(self.history) > 21:
-                del self.history[0]
-            self.history.append((ask_prices[0]+bid_prices[0])*1.0/2)
+            cross = self.crossover.push((ask_prices[0]+bid_prices[0])*1.0/2)
+            short_rising = self.crossover.short_now > self.crossover.short_pre
+            long_rising = self.crossover.long_now > self.crossover.long_pre
+            short_falling = self.crossover.short_now < self.crossover.short_pre
+            long_falling = self.crossover.long_now < self.crossover.long_pre
 
             if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
+                self.outbox.send_cancel_order(self.bid_id)
                 self.bid_id = 0
             if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
+                self.outbox.send_cancel_order(self.ask_id)
                 self.ask_id = 0
 
-            self.short_pre = np.mean(self.history[-6:-2])
-            self.short_now = np.mean(self.history[-5:-1])
-            self.long_pre = np.mean(self.history[-21:-2])
-            self.long_now = np.mean(self.history[-20:-1])
-
             if self.bid_id == 0 and new_bid_price != 0 and self.position < POSITION_LIMIT - 20 \
-                    and (self.short_pre < self.long_pre and self.short_now >= self.long_now and self.short_now > self.short_pre and self.long_now > self.long_pre):
+                    and (cross == CROSS_UP and short_rising and long_rising):
                 self.bid_id = next(self.order_ids)
                 self.bid_price = new_bid_price
-                self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.FAK)
+                self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.FAK)
                 self.bids.add(self.bid_id)
 
             if self.ask_id == 0 and new_ask_price != 0 and self.position > -POSITION_LIMIT \
-                    and (self.short_pre > self.long_pre and self.short_now <= self.long_now and self.short_now < self.short_pre and self.long_now < self.long_pre):
+                    and (cross == CROSS_DOWN and short_falling and long_falling):
                 self.ask_id = next(self.order_ids)
                 self.ask_price = new_ask_price
-                self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.FAK)
+                self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.FAK)
                 self.asks.add(self.ask_id)
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
@@ -129,11 +143,11 @@ class AutoTrader(BaseAutoTrader):
                          price, volume)
         if client_order_id in self.bids:
             self.position += volume
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MINIMUM_BID, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.ASK, MINIMUM_BID, volume)
         elif client_order_id in self.asks:
             self.position -= volume
-            self.send_hedge_order(next(self.order_ids), Side.BID,
-                                  MAXIMUM_ASK//TICK_SIZE_IN_CENTS*TICK_SIZE_IN_CENTS, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.BID,
+                                         MAXIMUM_ASK//TICK_SIZE_IN_CENTS*TICK_SIZE_IN_CENTS, volume)
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
                                 fees: int) -> None:
@@ -22,13 +22,20 @@ from typing import List
 
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
-import numpy as np
+from diagnostics import OFF, Diagnostics
+from gc_policy import CollectionPolicy
+from log_pipeline import LogPipeline
+from regression import SlidingSlope
+from scheduler import MessageScheduler
+from streaming_stats import RollingVWAP
 
 LOT_SIZE = 20
 POSITION_LIMIT = 100
 TICK_SIZE_IN_CENTS = 100
 MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
+GC_POLICY = "default"  # one of gc_policy.POLICIES
+DIAGNOSTICS_LEVEL = OFF  # diagnostics.DEBUG records every channel
 
 
 class AutoTrader(BaseAutoTrader):
@@ -45,19 +52,18 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
+        self.outbox = MessageScheduler(loop, self, on_dropped=self.on_insert_dropped)
         self.bids = set()
         self.asks = set()
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
         #for vwap
-        self.vwap_list = list()
-        self.history_price = list()
-        self.history_volume = list()
-        self.time = [0]
+        self.history = RollingVWAP(23, skip_first=True)
         #for slopes
-        self.a = list()
-        self.b = list()
-        self.poly = np.poly1d([0])
-        self.history_price_aver = list()
+        self.vwap_trend = SlidingSlope(5)
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
+        self.diagnostics = Diagnostics(team_name + "_diagnostics.txt", DIAGNOSTICS_LEVEL)
+        self.slope_diagnostics = self.diagnostics.channel("slope", ("slope",))
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -69,6 +75,15 @@ class AutoTrader(BaseAutoTrader):
         if client_order_id != 0:
             self.on_order_status_message(client_order_id, 0, 0, 0)
 
+    def on_insert_dropped(self, client_order_id: int) -> None:
+        """Called when the outbox drops an insert that was cancelled before it was sent."""
+        if client_order_id == self.bid_id:
+            self.bid_id = 0
+        elif client_order_id == self.ask_id:
+            self.ask_id = 0
+        self.bids.discard(client_order_id)
+        self.asks.discard(client_order_id)
+
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled, partially or fully.
 
@@ -90,35 +105,21 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
         if (ask_volumes[0]+bid_volumes[0]==0):
             return
 
-        self.history_price.append((ask_prices[0]+bid_prices[0])/2)
-        self.history_volume.append(ask_volumes[0]+bid_volumes[0])
-        if len(self.history_price) > 5:
-            self.history_price_aver.append(sum(self.history_price[-5:])/5)
+        self.history.push((ask_prices[0]+bid_prices[0])/2, ask_volumes[0]+bid_volumes[0])
 
         #calculate VWAP
-        s = s2 = 0
-        for i in range(-1,-min(len(self.history_price),24),-1):
-            s += self.history_price[i] * self.history_volume[i]
-            s2 += self.history_volume[i]
-        if s2 == 0:
-            vwap = 0
-        else:
-            vwap = int(s/s2)
-        self.vwap_list.append(vwap)
-
-        self.time.append(self.time[-1]+1)
+        vwap = int(self.history.vwap())
 
         #calculate slopes
-        if len(self.time) > 5:
-            self.a = self.time[-5:]
-            self.b = self.vwap_list[-5:]
-            params = np.polyfit(self.a,self.b,1)
-            self.poly = np.poly1d(params)
-            print(self.poly[1])
-        slope = self.poly[1]
+        self.vwap_trend.push(vwap)
+        slope = 0
+        if len(self.vwap_trend) == 5:
+            slope = self.vwap_trend.slope()
+            self.slope_diagnostics.record(slope)
 
         if instrument == Instrument.FUTURE:
             vwap = (bid_prices[0] * ask_volumes[0] + ask_prices[0] * bid_volumes[0]) / (bid_volumes[0] + ask_volumes[0])
@@ -127,22 +128,22 @@ class AutoTrader(BaseAutoTrader):
             new_ask_price = new_bid_price + 200
 
             if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
+                self.outbox.send_cancel_order(self.bid_id)
                 self.bid_id = 0
             if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
+                self.outbox.send_cancel_order(self.ask_id)
                 self.ask_id = 0
 
             if self.bid_id == 0 and (slope >= 1) and self.position + LOT_SIZE < POSITION_LIMIT:
                 self.bid_id = next(self.order_ids)
                 self.bid_price = new_bid_price
-                self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GFD)
+                self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GFD)
                 self.bids.add(self.bid_id)
 
             if self.ask_id == 0 and (slope <= -1) and self.position - LOT_SIZE > -POSITION_LIMIT:
                 self.ask_id = next(self.order_ids)
                 self.ask_price = new_ask_price
-                self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GFD)
+                self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GFD)
                 self.asks.add(self.ask_id)
             
             if -1 < slope < 1:
@@ -150,13 +151,13 @@ class AutoTrader(BaseAutoTrader):
                     if self.bid_id == 0:
                         self.bid_id = next(self.order_ids)
                         self.bid_price = new_bid_price
-                        self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, -self.position, Lifespan.FAK)
+                        self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, -self.position, Lifespan.FAK)
                         self.bids.add(self.bid_id)
                 elif self.position > 0:
                     if self.ask_id == 0:
                         self.ask_id = next(self.order_ids)
                         self.ask_price = new_ask_price
-                        self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, self.position, Lifespan.FAK)
+                        self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, self.position, Lifespan.FAK)
                         self.asks.add(self.ask_id)
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
@@ -170,10 +171,10 @@ class AutoTrader(BaseAutoTrader):
                          price, volume)
         if client_order_id in self.bids:
             self.position += volume
-            self.send_hedge_order(next(self.order_ids), Side.BID, MIN_BID_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.BID, MIN_BID_NEAREST_TICK, volume)
         elif client_order_id in self.asks:
             self.position -= volume
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MAX_ASK_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.ASK, MAX_ASK_NEAREST_TICK, volume)
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
                                 fees: int) -> None:
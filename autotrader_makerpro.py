@@ -22,7 +22,12 @@ from typing import List
 
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
-import numpy as np
+from diagnostics import OFF, Diagnostics
+from gc_policy import CollectionPolicy
+from log_pipeline import LogPipeline
+from scheduler import MessageScheduler
+from series import PairBuffer
+from streaming_stats import RunningStats
 
 
 LOT_SIZE = 10
@@ -32,6 +37,8 @@ MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 
 OFFSET = 1.0
+GC_POLICY = "default"  # one of gc_policy.POLICIES
+DIAGNOSTICS_LEVEL = OFF  # diagnostics.DEBUG records every channel
 
 
 class AutoTrader(BaseAutoTrader):
@@ -48,13 +55,18 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
+        self.outbox = MessageScheduler(loop, self, on_dropped=self.on_insert_dropped)
         self.bids = set()
         self.asks = set()
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
         #
-        self.ETF_price = list()
-        self.fut_price = list()
-        self.delta = list()
+        self.ETF_price = self.fut_price = 0.0
+        self.pairs = PairBuffer()
+        self.delta = RunningStats()
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
+        self.diagnostics = Diagnostics(team_name + "_diagnostics.txt", DIAGNOSTICS_LEVEL)
+        self.std_diagnostics = self.diagnostics.channel("spread", ("std",))
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -66,6 +78,15 @@ class AutoTrader(BaseAutoTrader):
         if client_order_id != 0 and (client_order_id in self.bids or client_order_id in self.asks):
             self.on_order_status_message(client_order_id, 0, 0, 0)
 
+    def on_insert_dropped(self, client_order_id: int) -> None:
+        """Called when the outbox drops an insert that was cancelled before it was sent."""
+        if client_order_id == self.bid_id:
+            self.bid_id = 0
+        elif client_order_id == self.ask_id:
+            self.ask_id = 0
+        self.bids.discard(client_order_id)
+        self.asks.discard(client_order_id)
+
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled.
 
@@ -85,6 +106,7 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
 
         if (ask_volumes[0]+bid_volumes[0]==0):
             return
@@ -96,36 +118,37 @@ class AutoTrader(BaseAutoTrader):
         new_bid_price = int(vwap) //TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS -300
         new_ask_price = new_bid_price + 200
 
-        if len(self.ETF_price) == len(self.fut_price) > 0:
-            self.delta = [self.ETF_price[i] - self.fut_price[i] for i in range(0,len(self.ETF_price))]
-        
-        std = np.std(self.delta)
-        print("std=",std)
+        std = self.delta.std()
+        self.std_diagnostics.record(std)
 
         if instrument == Instrument.ETF:
-            self.ETF_price.append((ask_prices[0]+bid_prices[0])/2)
+            self.ETF_price = (ask_prices[0]+bid_prices[0])/2
+            if self.pairs.update_etf(sequence_number, self.ETF_price):
+                self.delta.push(self.pairs.last_etf - self.pairs.last_future)
 
         if instrument == Instrument.FUTURE:
-            self.fut_price.append((ask_prices[0]+bid_prices[0])/2)
+            self.fut_price = (ask_prices[0]+bid_prices[0])/2
+            if self.pairs.update_future(sequence_number, self.fut_price):
+                self.delta.push(self.pairs.last_etf - self.pairs.last_future)
 
             if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
+                self.outbox.send_cancel_order(self.bid_id)
                 self.bid_id = 0
             if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
+                self.outbox.send_cancel_order(self.ask_id)
                 self.ask_id = 0
 
-            if len(self.ETF_price) > 1 and len(self.fut_price) > 1:
-                if self.bid_id == 0 and (self.ETF_price[-1] - self.fut_price[-1] < -OFFSET * std + 170) and self.position + LOT_SIZE < POSITION_LIMIT:
+            if len(self.delta) > 1:
+                if self.bid_id == 0 and (self.ETF_price - self.fut_price < -OFFSET * std + 170) and self.position + LOT_SIZE < POSITION_LIMIT:
                     self.bid_id = next(self.order_ids)
                     self.bid_price = new_bid_price
-                    self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
+                    self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
                     self.bids.add(self.bid_id)
     
-                if self.ask_id == 0 and (self.ETF_price[-1] - self.fut_price[-1] > OFFSET * std - 170) and self.position - LOT_SIZE > -POSITION_LIMIT:
+                if self.ask_id == 0 and (self.ETF_price - self.fut_price > OFFSET * std - 170) and self.position - LOT_SIZE > -POSITION_LIMIT:
                     self.ask_id = next(self.order_ids)
                     self.ask_price = new_ask_price
-                    self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
+                    self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
                     self.asks.add(self.ask_id)
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
@@ -139,10 +162,10 @@ class AutoTrader(BaseAutoTrader):
                          price, volume)
         if client_order_id in self.bids:
             self.position += volume
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
         elif client_order_id in self.asks:
             self.position -= volume
-            self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
                                 fees: int) -> None:
@@ -24,6 +24,16 @@ from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, M
 
 import numpy as np
 
+from diagnostics import OFF, Diagnostics
+from gc_policy import CollectionPolicy
+from hedging import HedgeEngine
+from log_pipeline import LogPipeline
+from orders import DONE, OrderRegistry
+from regression import OnlineLinearRegression
+from scheduler import MessageScheduler
+from series import PairBuffer
+from streaming_stats import RollingStats
+
 LOT_SIZE = 10
 POSITION_LIMIT = 100
 TICK_SIZE_IN_CENTS = 100
@@ -31,6 +41,9 @@ MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 
 OFFSET = 0.8
+HEDGE_THRESHOLD = 9
+GC_POLICY = "default"  # one of gc_policy.POLICIES
+DIAGNOSTICS_LEVEL = OFF  # diagnostics.DEBUG records every channel
 
 
 class AutoTrader(BaseAutoTrader):
@@ -47,19 +60,23 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
-        self.bids = set()
-        self.asks = set()
+        self.orders = OrderRegistry()
+        self.outbox = MessageScheduler(loop, self, self.orders)
+        self.hedger = HedgeEngine(loop, self.outbox, self.orders, self.order_ids, threshold=HEDGE_THRESHOLD)
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
-        self.fut_bids = set()
-        self.fut_asks = set()
-        self.fut_ask_id = self.fut_bid_id = self.fut_position = 0
+        self.fut_position = 0
         #
-        self.ETF_price = list()
-        self.fut_price = list()
-        self.delta = list()
-        self.std = list()
-        self.aver = list()
+        self.pairs = PairBuffer()
+        self.delta = 0.0
+        self.delta_window = RollingStats(150)
+        self.std = 0.0
         self.alpha = self.beta = 0
+        self.hedge_fit = OnlineLinearRegression()
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
+        self.diagnostics = Diagnostics(team_name + "_diagnostics.txt", DIAGNOSTICS_LEVEL)
+        self.spread_diagnostics = self.diagnostics.channel("spread", ("beta", "alpha", "delta", "band", "position",
+                                                                      "fut_position"))
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -68,8 +85,11 @@ class AutoTrader(BaseAutoTrader):
         will identify that order, otherwise the client_order_id will be zero.
         """
         self.logger.warning("error with order %d: %s", client_order_id, error_message.decode())
-        if client_order_id != 0 and (client_order_id in self.bids or client_order_id in self.asks):
+        order = self.orders.get(client_order_id)
+        if order is not None and order.instrument == Instrument.ETF:
             self.on_order_status_message(client_order_id, 0, 0, 0)
+        elif order is not None:
+            self.hedger.filled(client_order_id, 0)
 
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled.
@@ -80,9 +100,10 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received hedge filled for order %d with average price %d and volume %d", client_order_id,
                          price, volume)
-        if client_order_id in self.fut_bids:
+        order = self.hedger.filled(client_order_id, volume)
+        if order is not None and order.side == Side.BID:
             self.fut_position += volume
-        elif client_order_id in self.fut_asks:
+        elif order is not None:
             self.fut_position -= volume
 
     def on_order_book_update_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
@@ -94,6 +115,7 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
 
         if (ask_volumes[0]+bid_volumes[0]==0):
             return
@@ -106,58 +128,42 @@ class AutoTrader(BaseAutoTrader):
         new_ask_price = new_bid_price
 
         if instrument == Instrument.ETF:
-            self.ETF_price.append(np.log((ask_prices[0]+bid_prices[0])/2))
-        if instrument == Instrument.FUTURE:
-            self.fut_price.append(np.log((ask_prices[0]+bid_prices[0])/2))
-        if len(self.ETF_price) > 0 and len(self.fut_price) > 0:
-            a = self.ETF_price
-            b = self.fut_price
-            if len(self.ETF_price) > len(self.fut_price):
-                a=self.ETF_price[len(self.ETF_price)-len(self.fut_price):]
-            elif len(self.ETF_price) < len(self.fut_price):
-                b=self.fut_price[len(self.fut_price)-len(self.ETF_price):]
-            params = np.polyfit(a,b,1)
-            poly = np.poly1d(params)
-            self.beta = poly[1]
-            self.alpha = poly[0]
-            print("beta=",self.beta,"alpha=",self.alpha)
-            self.delta.append(b[-1] - a[-1] * self.beta - self.alpha)
-            self.aver.append(np.average(self.delta))
-            self.std.append(np.std(self.delta[-150:]))
-            print("delta=",self.delta[-1]*100000,"std=",self.std[-1] * OFFSET*100000)
-            print("position=",self.position,"fut_position=",self.fut_position)
+            paired = self.pairs.update_etf(sequence_number, np.log((ask_prices[0]+bid_prices[0])/2))
+        else:
+            paired = self.pairs.update_future(sequence_number, np.log((ask_prices[0]+bid_prices[0])/2))
+        if paired:
+            self.delta = self.hedge_fit.push(self.pairs.last_etf, self.pairs.last_future)
+            self.beta = self.hedge_fit.beta
+            self.alpha = self.hedge_fit.alpha
+            self.delta_window.push(self.delta)
+            self.std = self.delta_window.std()
+            self.spread_diagnostics.record(self.beta, self.alpha, self.delta * 100000,
+                                           self.std * OFFSET * 100000, self.position, self.fut_position)
 
         if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-            self.send_cancel_order(self.bid_id)
+            self.outbox.send_cancel_order(self.bid_id)
             self.bid_id = 0
 
         if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-            self.send_cancel_order(self.ask_id)
+            self.outbox.send_cancel_order(self.ask_id)
             self.ask_id = 0
 
-        if len(self.ETF_price) > 1 and len(self.fut_price) > 1:
-            if self.bid_id == 0 and (self.delta[-1] > self.std[-1] * OFFSET) and self.position + LOT_SIZE * 1.75 < POSITION_LIMIT:
+        if self.hedge_fit.ready:
+            if (self.bid_id == 0 and (self.delta > self.std * OFFSET) and self.position + LOT_SIZE * 1.75 < POSITION_LIMIT
+                    and self.orders.exposure.capacity(Side.BUY) >= LOT_SIZE):
                 self.bid_id = next(self.order_ids)
                 self.bid_price = new_bid_price
-                self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
-                self.bids.add(self.bid_id)
+                self.orders.insert(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, 0)
+                self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
 
-            if self.ask_id == 0 and (self.delta[-1] < -self.std[-1] * OFFSET) and self.position - LOT_SIZE * 1.75 > -POSITION_LIMIT:
+            if (self.ask_id == 0 and (self.delta < -self.std * OFFSET) and self.position - LOT_SIZE * 1.75 > -POSITION_LIMIT
+                    and self.orders.exposure.capacity(Side.SELL) >= LOT_SIZE):
                 self.ask_id = next(self.order_ids)
                 self.ask_price = new_ask_price
-                self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
-                self.asks.add(self.ask_id)
+                self.orders.insert(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, 0)
+                self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
         
-        if self.fut_position + self.position >= 10:
-            self.fut_ask_id = next(self.order_ids)
-            self.send_hedge_order(self.fut_ask_id, Side.ASK, MIN_BID_NEAREST_TICK, 5)
-            self.fut_asks.add(self.fut_ask_id)
-            print("yes")
-        elif self.fut_position + self.position <= -10:
-            self.fut_bid_id = next(self.order_ids)
-            self.send_hedge_order(self.fut_bid_id, Side.BID, MAX_ASK_NEAREST_TICK, 5)
-            self.fut_bids.add(self.fut_bid_id)
-            print("yess")
+        self.hedger.rebalance(self.position)
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your orders is filled, partially or fully.
@@ -168,24 +174,19 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received order filled for order %d with price %d and volume %d", client_order_id,
                          price, volume)
-        if client_order_id in self.bids:
+        order = self.orders.filled(client_order_id, volume)
+        if order is None:
+            return
+        # Hedge at the fitted ratio, or lot for lot while beta is too small to divide by.
+        hedge_volume = int(volume / self.beta) if self.beta > 0.8 else volume
+        if order.side == Side.BUY:
             self.position += volume
-            if self.fut_position - int(volume / self.beta) > -POSITION_LIMIT:
-                self.fut_ask_id = next(self.order_ids)
-                if self.beta > 0.8:
-                    self.send_hedge_order(self.fut_ask_id, Side.ASK, MIN_BID_NEAREST_TICK, int(volume / self.beta))
-                else:
-                    self.send_hedge_order(self.fut_ask_id, Side.ASK, MIN_BID_NEAREST_TICK, volume)
-                self.fut_asks.add(self.fut_ask_id)
-        elif client_order_id in self.asks:
+            if self.fut_position - hedge_volume > -POSITION_LIMIT:
+                self.hedger.add(-hedge_volume)
+        else:
             self.position -= volume
-            if self.fut_position + int(volume / self.beta) < POSITION_LIMIT:
-                self.fut_bid_id = next(self.order_ids)
-                if self.beta > 0.8:
-                    self.send_hedge_order(self.fut_bid_id, Side.BID, MAX_ASK_NEAREST_TICK, int(volume / self.beta))
-                else:
-                    self.send_hedge_order(self.fut_bid_id, Side.BID, MAX_ASK_NEAREST_TICK, volume)
-                self.fut_bids.add(self.fut_bid_id)
+            if self.fut_position + hedge_volume < POSITION_LIMIT:
+                self.hedger.add(hedge_volume)
                 
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
@@ -201,16 +202,13 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received order status for order %d with fill volume %d remaining %d and fees %d",
                          client_order_id, fill_volume, remaining_volume, fees)
-        if remaining_volume == 0:
+        order = self.orders.status(client_order_id, remaining_volume)
+        if order is not None and order.state == DONE:
             if client_order_id == self.bid_id:
                 self.bid_id = 0
             elif client_order_id == self.ask_id:
                 self.ask_id = 0
 
-            # It could be either a bid or an ask
-            self.bids.discard(client_order_id)
-            self.asks.discard(client_order_id)
-
     def on_trade_ticks_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
                                ask_volumes: List[int], bid_prices: List[int], bid_volumes: List[int]) -> None:
         """Called periodically when there is trading activity on the market.
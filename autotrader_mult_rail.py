@@ -20,17 +20,23 @@ import itertools
 
 from typing import List
 
-from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
+from ready_trader_go import BaseAutoTrader, Instrument, Side
 
-import numpy as np
+from gc_policy import CollectionPolicy
+from hedging import HedgeEngine
+from log_pipeline import LogPipeline
+from orders import OrderRegistry, QuoteLadder
+from pricing import RailPricer, mid
+from scheduler import MessageScheduler
+from series import PairBuffer
+from streaming_stats import RunningStats
 
 LOT_SIZE2 = 20
 POSITION_LIMIT = 100
 TICK_SIZE_IN_CENTS = 100
-MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
-MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 OFFSET1 = 40
 OFFSET2 = 100
+GC_POLICY = "default"  # one of gc_policy.POLICIES
 
 
 class AutoTrader(BaseAutoTrader):
@@ -47,24 +53,22 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
-        self.bids = set()
-        self.asks = set()
-        self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
+        self.orders = OrderRegistry(POSITION_LIMIT)
+        self.outbox = MessageScheduler(loop, self, self.orders)
+        self.ladder = QuoteLadder(self.outbox, self.orders, self.order_ids, 2)
+        self.hedger = HedgeEngine(loop, self.outbox, self.orders, self.order_ids)
+        self.position = 0
         #
-        self.etf_price = list()
-        self.fut_price = list()
-        self.delta = list()
-        self.upper_rail1 = 0
-        self.upper_rail2 = 0
-        self.lower_rail1 = 0
-        self.lower_rail2 = 0
-        #
-        self.last_bid_price1 = self.last_bid_id1 = 0
-        self.last_bid_price2 = self.last_bid_id2 = 0
-        self.last_ask_price1 = self.last_ask_id1 = 0
-        self.last_ask_price2 = self.last_ask_id2 = 0
+        self.etf_price = 0.0
+        self.fut_price = 0.0
+        self.pairs = PairBuffer()
+        self.delta = RunningStats()
+        self.fut_mid = 0
+        self.rails = RailPricer(2)
         #
         self.LOT_SIZE1 = 10
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -73,8 +77,11 @@ class AutoTrader(BaseAutoTrader):
         will identify that order, otherwise the client_order_id will be zero.
         """
         self.logger.warning("error with order %d: %s", client_order_id, error_message.decode())
-        if client_order_id != 0 and (client_order_id in self.bids or client_order_id in self.asks):
+        order = self.orders.get(client_order_id)
+        if order is not None and order.instrument == Instrument.ETF:
             self.on_order_status_message(client_order_id, 0, 0, 0)
+        elif order is not None:
+            self.hedger.filled(client_order_id, 0)
 
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled.
@@ -85,6 +92,7 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received hedge filled for order %d with average price %d and volume %d", client_order_id,
                          price, volume)
+        self.hedger.filled(client_order_id, volume)
 
     def on_order_book_update_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
                                      ask_volumes: List[int], bid_prices: List[int], bid_volumes: List[int]) -> None:
@@ -95,6 +103,7 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
         self.logger.info("received order book for instrument %d with sequence number %d", instrument,
                          sequence_number)
 
@@ -104,60 +113,35 @@ class AutoTrader(BaseAutoTrader):
             return
 
         if instrument == Instrument.ETF:
-            self.etf_price.append((ask_prices[0] + bid_prices[0]) / 2)
-        if instrument == Instrument.FUTURE:
-            self.fut_price.append((ask_prices[0] + bid_prices[0]) / 2)
-
-        if len(self.etf_price) > 0 and len(self.fut_price) > 0:
-            self.delta.append(self.etf_price[-1] - self.fut_price[-1])
-            std = np.std(self.delta)
-            self.upper_rail1 = std + OFFSET1
-            self.upper_rail2 = std + OFFSET2
-            self.lower_rail1 = -std - OFFSET1
-            self.lower_rail2 = -std - OFFSET2
-
-        if instrument == Instrument.ETF:
-            new_bid_price1 = int(self.lower_rail1 + self.fut_price[-1]) // 100 * 100
-            new_ask_price1 = int(self.upper_rail1 + self.fut_price[-1]) // 100 * 100
-            new_bid_price2 = int(self.lower_rail2 + self.fut_price[-1]) // 100 * 100
-            new_ask_price2 = int(self.upper_rail2 + self.fut_price[-1]) // 100 * 100
-
-            if self.last_bid_id1 != 0 and (new_bid_price1 not in (self.last_bid_price1, 0) or ask_prices[0] <= new_bid_price2):
-                self.send_cancel_order(self.last_bid_id1)
-                self.last_bid_id1 = 0
-            if self.last_bid_id2 != 0 and new_bid_price2 not in (self.last_bid_price2, 0):
-                self.send_cancel_order(self.last_bid_id2)
-                self.last_bid_id2 = 0
-            if self.last_ask_id1 != 0 and (new_ask_price1 not in (self.last_ask_price1, 0) or bid_prices[0] >= new_ask_price2):
-                self.send_cancel_order(self.last_ask_id1)
-                self.last_ask_id1 = 0
-            if self.last_ask_id2 != 0 and new_ask_price2 not in (self.last_ask_price2, 0):
-                self.send_cancel_order(self.last_ask_id2)
-                self.last_ask_id2 = 0
-
-            if self.last_bid_id1 == 0 and new_bid_price1 != 0 and self.position + self.LOT_SIZE1 + LOT_SIZE2 < POSITION_LIMIT and ask_prices[0] > new_bid_price2:
-                self.last_bid_id1 = next(self.order_ids)
-                self.last_bid_price1 = new_bid_price1
-                self.send_insert_order(self.last_bid_id1, Side.BUY, new_bid_price1, self.LOT_SIZE1, Lifespan.GOOD_FOR_DAY)
-                self.bids.add(self.last_bid_id1)
-
-            if self.last_bid_id2 == 0 and new_bid_price2 != 0 and self.position + self.LOT_SIZE1 + LOT_SIZE2 < POSITION_LIMIT:
-                self.last_bid_id2 = next(self.order_ids)
-                self.last_bid_price2 = new_bid_price2
-                self.send_insert_order(self.last_bid_id2, Side.BUY, new_bid_price2, LOT_SIZE2, Lifespan.GOOD_FOR_DAY)
-                self.bids.add(self.last_bid_id2)
-
-            if self.last_ask_id1 == 0 and new_ask_price1 != 0 and self.position - self.LOT_SIZE1 - LOT_SIZE2 > -POSITION_LIMIT and bid_prices[0] < new_ask_price2:
-                self.last_ask_id1 = next(self.order_ids)
-                self.last_ask_price1 = new_ask_price1
-                self.send_insert_order(self.last_ask_id1, Side.SELL, new_ask_price1, self.LOT_SIZE1, Lifespan.GOOD_FOR_DAY)
-                self.asks.add(self.last_ask_id1)
-
-            if self.last_ask_id2 == 0 and new_ask_price2 != 0 and self.position - self.LOT_SIZE1 - LOT_SIZE2 > -POSITION_LIMIT:
-                self.last_ask_id2 = next(self.order_ids)
-                self.last_ask_price2 = new_ask_price2
-                self.send_insert_order(self.last_ask_id2, Side.SELL, new_ask_price2, LOT_SIZE2, Lifespan.GOOD_FOR_DAY)
-                self.asks.add(self.last_ask_id2)
+            self.etf_price = (ask_prices[0] + bid_prices[0]) / 2
+            paired = self.pairs.update_etf(sequence_number, self.etf_price)
+        else:
+            self.fut_mid = mid(ask_prices[0], bid_prices[0])
+            self.fut_price = self.fut_mid / 2
+            paired = self.pairs.update_future(sequence_number, self.fut_price)
+
+        if paired:
+            self.delta.push(self.pairs.last_etf - self.pairs.last_future)
+            std = self.delta.std()
+            self.rails.update((-std - OFFSET1, -std - OFFSET2), (std + OFFSET1, std + OFFSET2))
+
+        if instrument == Instrument.ETF and self.fut_mid != 0:
+            bids, asks = self.rails.prices(self.fut_mid)
+            new_bid_price1, new_bid_price2 = bids
+            new_ask_price1, new_ask_price2 = asks
+
+            if ask_prices[0] <= new_bid_price2:
+                self.ladder.cancel(Side.BUY, 0)
+            if bid_prices[0] >= new_ask_price2:
+                self.ladder.cancel(Side.SELL, 0)
+
+            can_bid = self.position + self.LOT_SIZE1 + LOT_SIZE2 < POSITION_LIMIT
+            can_ask = self.position - self.LOT_SIZE1 - LOT_SIZE2 > -POSITION_LIMIT
+            self.ladder.update(
+                ((new_bid_price1, self.LOT_SIZE1 if can_bid and ask_prices[0] > new_bid_price2 else 0),
+                 (new_bid_price2, LOT_SIZE2 if can_bid else 0)),
+                ((new_ask_price1, self.LOT_SIZE1 if can_ask and bid_prices[0] < new_ask_price2 else 0),
+                 (new_ask_price2, LOT_SIZE2 if can_ask else 0)))
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your orders is filled, partially or fully.
@@ -168,18 +152,19 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received order filled for order %d with price %d and volume %d", client_order_id,
                          price, volume)
-        if client_order_id in self.bids:
+        order = self.orders.filled(client_order_id, volume)
+        if order is not None and order.side == Side.BUY:
             self.position += volume
             self.LOT_SIZE1 = min(10, POSITION_LIMIT - abs(self.position) - LOT_SIZE2)
             if self.LOT_SIZE1 < 0:
                 self.LOT_SIZE1 = 0
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
-        elif client_order_id in self.asks:
+            self.hedger.add(-volume)
+        elif order is not None:
             self.position -= volume
             self.LOT_SIZE1 = min(10, POSITION_LIMIT - abs(self.position) - LOT_SIZE2)
             if self.LOT_SIZE1 < 0:
                 self.LOT_SIZE1 = 0
-            self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
+            self.hedger.add(volume)
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
                                 fees: int) -> None:
@@ -194,15 +179,7 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received order status for order %d with fill volume %d remaining %d and fees %d",
                          client_order_id, fill_volume, remaining_volume, fees)
-        if remaining_volume == 0:
-            if client_order_id == self.bid_id:
-                self.bid_id = 0
-            elif client_order_id == self.ask_id:
-                self.ask_id = 0
-
-            # It could be either a bid or an ask
-            self.bids.discard(client_order_id)
-            self.asks.discard(client_order_id)
+        self.orders.status(client_order_id, remaining_volume)
 
     def on_trade_ticks_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
                                ask_volumes: List[int], bid_prices: List[int], bid_volumes: List[int]) -> None:
@@ -20,17 +20,33 @@ import itertools
 
 from typing import List
 
-from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
+from ready_trader_go import BaseAutoTrader, Instrument, Side
 
 import numpy as np
 
+from diagnostics import OFF, Diagnostics
+from gc_policy import CollectionPolicy
+from hedging import HedgeEngine
+from log_pipeline import LogPipeline
+from orders import OrderRegistry, QuoteLadder
+from pricing import RailPricer, mid
+from regression import SlidingSlope
+from retention import ResidentMemoryCheck, RetentionPolicy
+from scheduler import MessageScheduler
+from series import PairBuffer
+from streaming_stats import RunningStats
+
 LOT_SIZE2 = 20
 POSITION_LIMIT = 100
 TICK_SIZE_IN_CENTS = 100
-MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
-MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 OFFSET1 = 40
 OFFSET2 = 100
+HEDGE_THRESHOLD = 5
+PRICE_WINDOW = 40
+POSITION_WINDOW = 52
+COMPARE_WINDOW = 37  # enough for the price_compare[-8:-2] scan and the len() > 36 warm-up
+GC_POLICY = "default"  # one of gc_policy.POLICIES
+DIAGNOSTICS_LEVEL = OFF  # diagnostics.DEBUG records every channel
 
 
 class AutoTrader(BaseAutoTrader):
@@ -47,35 +63,37 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
-        self.bids = set()
-        self.asks = set()
-        self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
-        self.fut_bids = set()
-        self.fut_asks = set()
-        self.fut_ask_id = self.fut_bid_id = self.fut_position = 0
-        #
-        self.etf_price = list()
-        self.fut_price = list()
-        self.delta = list()
-        self.upper_rail1 = 0
-        self.upper_rail2 = 0
-        self.lower_rail1 = 0
-        self.lower_rail2 = 0
+        self.orders = OrderRegistry(POSITION_LIMIT)
+        self.outbox = MessageScheduler(loop, self, self.orders)
+        self.ladder = QuoteLadder(self.outbox, self.orders, self.order_ids, 2)
+        self.hedger = HedgeEngine(loop, self.outbox, self.orders, self.order_ids, threshold=HEDGE_THRESHOLD)
+        self.position = 0
+        self.fut_position = 0
         #
-        self.last_bid_price1 = self.last_bid_id1 = 0
-        self.last_bid_price2 = self.last_bid_id2 = 0
-        self.last_ask_price1 = self.last_ask_id1 = 0
-        self.last_ask_price2 = self.last_ask_id2 = 0
+        self.retention = RetentionPolicy()
+        self.etf_price = self.retention.retain("etf_price", PRICE_WINDOW)
+        self.fut_price = self.retention.retain("fut_price", PRICE_WINDOW)
+        self.pairs = PairBuffer()
+        self.delta = RunningStats()
+        self.fut_mid = 0
+        self.rails = RailPricer(2)
         #
         self.LOT_SIZE1 = 10
         #
         self.slope = 0
-        self.time = list()
+        self.time = self.retention.retain("time", 1, dtype=np.int64)
+        self.etf_trend = SlidingSlope(48)
         self.current_time = itertools.count(1)
-        self.position_history = list()
+        self.position_history = self.retention.retain("position_history", POSITION_WINDOW)
         self.mode = 0  #0 for normal, 1 for trend
         self.timestamp = 0
-        self.price_compare = list()
+        self.price_compare = self.retention.retain("price_compare", COMPARE_WINDOW, dtype=bool)
+        self.retention.report(self.logger)
+        self.memory_check = ResidentMemoryCheck(self.logger)
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
+        self.diagnostics = Diagnostics(team_name + "_diagnostics.txt", DIAGNOSTICS_LEVEL)
+        self.mode_diagnostics = self.diagnostics.channel("mode", ("pos_std", "stable", "timestamp", "mode"))
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -84,8 +102,11 @@ class AutoTrader(BaseAutoTrader):
         will identify that order, otherwise the client_order_id will be zero.
         """
         self.logger.warning("error with order %d: %s", client_order_id, error_message.decode())
-        if client_order_id != 0 and (client_order_id in self.bids or client_order_id in self.asks):
+        order = self.orders.get(client_order_id)
+        if order is not None and order.instrument == Instrument.ETF:
             self.on_order_status_message(client_order_id, 0, 0, 0)
+        elif order is not None:
+            self.hedger.filled(client_order_id, 0)
 
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled.
@@ -96,9 +117,10 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received hedge filled for order %d with average price %d and volume %d", client_order_id,
                          price, volume)
-        if client_order_id in self.fut_bids:
+        order = self.hedger.filled(client_order_id, volume)
+        if order is not None and order.side == Side.BID:
             self.fut_position += volume
-        elif client_order_id in self.fut_asks:
+        elif order is not None:
             self.fut_position -= volume
 
     def on_order_book_update_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
@@ -113,6 +135,8 @@ class AutoTrader(BaseAutoTrader):
         self.logger.info("received order book for instrument %d with sequence number %d", instrument,
                          sequence_number)
 
+        self.memory_check.update()
+        self.collector.update()
         if ask_prices[0] == 0 or bid_prices[0] == 0:
             return
         if ask_volumes[0] + bid_volumes[0] == 0:
@@ -120,25 +144,29 @@ class AutoTrader(BaseAutoTrader):
 
         if instrument == Instrument.ETF:
             self.etf_price.append((ask_prices[0] + bid_prices[0]) / 2)
+            paired = self.pairs.update_etf(sequence_number, self.etf_price[-1])
             self.time.append(int(next(self.current_time)))
+            self.etf_trend.push(self.etf_price[-1])
             self.position_history.append(self.position)
-        if instrument == Instrument.FUTURE:
-            self.fut_price.append((ask_prices[0] + bid_prices[0]) / 2)
+        else:
+            self.fut_mid = mid(ask_prices[0], bid_prices[0])
+            self.fut_price.append(self.fut_mid / 2)
+            paired = self.pairs.update_future(sequence_number, self.fut_price[-1])
 
         #switch mode
-        self.price_compare.append(np.average(self.etf_price[-40:]) < np.average(self.fut_price[-40:]))
+        self.price_compare.append(np.average(self.etf_price.tail(PRICE_WINDOW)) < np.average(self.fut_price.tail(PRICE_WINDOW)))
         #print(self.price_compare[-1])
-        pos_std = np.std(self.position_history[-52:])
-        print(pos_std)
+        pos_std = np.std(self.position_history.tail(POSITION_WINDOW))
         self.mode = 0
+        stable = False
         if abs(pos_std) < 12:
             temp = self.price_compare[-1]
             flag = True
-            print(self.price_compare[-8:-2])
             for i in self.price_compare[-8:-2]:
                 if temp != i:
                     flag = False
                     break
+            stable = flag
             if flag and len(self.price_compare) > 36:  #for stablity
                 if self.timestamp != 0 and self.timestamp + 40 * 8 > self.time[-1]:
                     self.mode = 1
@@ -149,86 +177,41 @@ class AutoTrader(BaseAutoTrader):
                 self.mode = self.timestamp = 0
         else:
             self.mode = self.timestamp = 0
-        print("timestamp=",self.timestamp)
-        print("mode=",self.mode)
+        self.mode_diagnostics.record(pos_std, stable, self.timestamp, self.mode)
 
-        if len(self.etf_price) > 0 and len(self.fut_price) > 0:
-            self.delta.append(self.etf_price[-1] - self.fut_price[-1])
-            std = np.std(self.delta)
-            self.upper_rail1 = std + OFFSET1
-            self.upper_rail2 = std + OFFSET2
-            self.lower_rail1 = -std - OFFSET1
-            self.lower_rail2 = -std - OFFSET2
+        if paired:
+            self.delta.push(self.pairs.last_etf - self.pairs.last_future)
+            std = self.delta.std()
+            self.rails.update((-std - OFFSET1, -std - OFFSET2), (std + OFFSET1, std + OFFSET2))
 
         if self.mode == 0:
             #check if hedged
-            if self.fut_position + self.position > 5:
-                self.fut_ask_id = next(self.order_ids)
-                self.send_hedge_order(self.fut_ask_id, Side.ASK, MIN_BID_NEAREST_TICK, 1)
-                self.fut_asks.add(self.fut_ask_id)
-            elif self.fut_position + self.position < -5:
-                self.fut_bid_id = next(self.order_ids)
-                self.send_hedge_order(self.fut_bid_id, Side.BID, MAX_ASK_NEAREST_TICK, 1)
-                self.fut_bids.add(self.fut_bid_id)
+            self.hedger.rebalance(self.position)
         
         elif self.mode == 1:  #follow the trend
-            params = np.polyfit(self.time[-48:],self.etf_price[-48:],1)
-            poly = np.poly1d(params)
-            slope = poly[1]
+            slope = self.etf_trend.slope()
             if self.fut_position > 0 and slope < -15 and self.fut_position - 10 > -POSITION_LIMIT:
-                self.fut_ask_id = next(self.order_ids)
-                self.send_hedge_order(self.fut_ask_id, Side.ASK, MIN_BID_NEAREST_TICK, 10)
-                self.fut_asks.add(self.fut_ask_id)
+                self.hedger.add(-10)
             elif self.fut_position < 0 and slope > 15 and self.fut_position + 10 < POSITION_LIMIT:
-                self.fut_bid_id = next(self.order_ids)
-                self.send_hedge_order(self.fut_bid_id, Side.BID, MAX_ASK_NEAREST_TICK, 10)
-                self.fut_bids.add(self.fut_bid_id)
+                self.hedger.add(10)
         
-        if instrument == Instrument.ETF:
-            new_bid_price1 = int(self.lower_rail1 + self.fut_price[-1]) // 100 * 100
-            new_ask_price1 = int(self.upper_rail1 + self.fut_price[-1]) // 100 * 100
-            new_bid_price2 = int(self.lower_rail2 + self.fut_price[-1]) // 100 * 100
-            new_ask_price2 = int(self.upper_rail2 + self.fut_price[-1]) // 100 * 100
-
-            if self.last_bid_id1 != 0 and (new_bid_price1 not in (self.last_bid_price1, 0) or ask_prices[0] <= new_bid_price2):
-                self.send_cancel_order(self.last_bid_id1)
-                self.last_bid_id1 = 0
-
-            if self.last_bid_id2 != 0 and new_bid_price2 not in (self.last_bid_price2, 0):
-                self.send_cancel_order(self.last_bid_id2)
-                self.last_bid_id2 = 0
-
-            if self.last_ask_id1 != 0 and (new_ask_price1 not in (self.last_ask_price1, 0) or bid_prices[0] >= new_ask_price2):
-                self.send_cancel_order(self.last_ask_id1)
-                self.last_ask_id1 = 0
-
-            if self.last_ask_id2 != 0 and new_ask_price2 not in (self.last_ask_price2, 0):
-                self.send_cancel_order(self.last_ask_id2)
-                self.last_ask_id2 = 0
-
-            if self.last_bid_id1 == 0 and new_bid_price1 != 0 and self.position + self.LOT_SIZE1 + LOT_SIZE2 < POSITION_LIMIT and ask_prices[0] > new_bid_price2:
-                self.last_bid_id1 = next(self.order_ids)
-                self.last_bid_price1 = new_bid_price1
-                self.send_insert_order(self.last_bid_id1, Side.BUY, new_bid_price1, self.LOT_SIZE1, Lifespan.GOOD_FOR_DAY)
-                self.bids.add(self.last_bid_id1)
-
-            if self.last_bid_id2 == 0 and new_bid_price2 != 0 and self.position + self.LOT_SIZE1 + LOT_SIZE2 < POSITION_LIMIT:
-                self.last_bid_id2 = next(self.order_ids)
-                self.last_bid_price2 = new_bid_price2
-                self.send_insert_order(self.last_bid_id2, Side.BUY, new_bid_price2, LOT_SIZE2, Lifespan.GOOD_FOR_DAY)
-                self.bids.add(self.last_bid_id2)
-
-            if self.last_ask_id1 == 0 and new_ask_price1 != 0 and self.position - self.LOT_SIZE1 - LOT_SIZE2 > -POSITION_LIMIT and bid_prices[0] < new_ask_price2:
-                self.last_ask_id1 = next(self.order_ids)
-                self.last_ask_price1 = new_ask_price1
-                self.send_insert_order(self.last_ask_id1, Side.SELL, new_ask_price1, self.LOT_SIZE1, Lifespan.GOOD_FOR_DAY)
-                self.asks.add(self.last_ask_id1)
-
-            if self.last_ask_id2 == 0 and new_ask_price2 != 0 and self.position - self.LOT_SIZE1 - LOT_SIZE2 > -POSITION_LIMIT:
-                self.last_ask_id2 = next(self.order_ids)
-                self.last_ask_price2 = new_ask_price2
-                self.send_insert_order(self.last_ask_id2, Side.SELL, new_ask_price2, LOT_SIZE2, Lifespan.GOOD_FOR_DAY)
-                self.asks.add(self.last_ask_id2)
+        if instrument == Instrument.ETF and self.fut_mid != 0:
+            bids, asks = self.rails.prices(self.fut_mid)
+            new_bid_price1, new_bid_price2 = bids
+            new_ask_price1, new_ask_price2 = asks
+
+            if ask_prices[0] <= new_bid_price2:
+                self.ladder.cancel(Side.BUY, 0)
+            if bid_prices[0] >= new_ask_price2:
+                self.ladder.cancel(Side.SELL, 0)
+
+            can_bid = self.position + self.LOT_SIZE1 + LOT_SIZE2 < POSITION_LIMIT
+            can_ask = self.position - self.LOT_SIZE1 - LOT_SIZE2 > -POSITION_LIMIT
+            self.ladder.update(
+                ((new_bid_price1, self.LOT_SIZE1 if can_bid and ask_prices[0] > new_bid_price2 else 0),
+                 (new_bid_price2, LOT_SIZE2 if can_bid else 0)),
+                ((new_ask_price1, self.LOT_SIZE1 if can_ask and bid_prices[0] < new_ask_price2 else 0),
+                 (new_ask_price2, LOT_SIZE2 if can_ask else 0)))
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your orders is filled, partially or fully.
@@ -239,22 +222,19 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received order filled for order %d with price %d and volume %d", client_order_id,
                          price, volume)
-        if client_order_id in self.bids:
+        order = self.orders.filled(client_order_id, volume)
+        if order is not None and order.side == Side.BUY:
             self.position += volume
-            self.fut_ask_id = next(self.order_ids)
             self.LOT_SIZE1 = min(10, POSITION_LIMIT - abs(self.position) - LOT_SIZE2)
             if self.LOT_SIZE1 < 0:
                 self.LOT_SIZE1 = 0
-            self.send_hedge_order(self.fut_ask_id, Side.ASK, MIN_BID_NEAREST_TICK, volume)
-            self.fut_asks.add(self.fut_ask_id)
-        elif client_order_id in self.asks:
+            self.hedger.add(-volume)
+        elif order is not None:
             self.position -= volume
-            self.fut_bid_id = next(self.order_ids)
             self.LOT_SIZE1 = min(10, POSITION_LIMIT - abs(self.position) - LOT_SIZE2)
             if self.LOT_SIZE1 < 0:
                 self.LOT_SIZE1 = 0
-            self.send_hedge_order(self.fut_bid_id, Side.BID, MAX_ASK_NEAREST_TICK, volume)
-            self.fut_bids.add(self.fut_bid_id)
+            self.hedger.add(volume)
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
                                 fees: int) -> None:
@@ -269,15 +249,7 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received order status for order %d with fill volume %d remaining %d and fees %d",
                          client_order_id, fill_volume, remaining_volume, fees)
-        if remaining_volume == 0:
-            if client_order_id == self.bid_id:
-                self.bid_id = 0
-            elif client_order_id == self.ask_id:
-                self.ask_id = 0
-
-            # It could be either a bid or an ask
-            self.bids.discard(client_order_id)
-            self.asks.discard(client_order_id)
+        self.orders.status(client_order_id, remaining_volume)
 
     def on_trade_ticks_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
                                ask_volumes: List[int], bid_prices: List[int], bid_volumes: List[int]) -> None:
@@ -23,10 +23,16 @@ from typing import List
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-from matplotlib import pyplot
-import gc
+
+from charts import ChartRenderer
+from diagnostics import OFF, Diagnostics
+from gc_policy import CollectionPolicy
+from log_pipeline import LogPipeline
+from regression import OnlineLinearRegression
+from retention import ResidentMemoryCheck, RetentionPolicy
+from scheduler import MessageScheduler
+from series import PairBuffer
+from streaming_stats import RunningStats
 
 
 LOT_SIZE = 20
@@ -34,6 +40,9 @@ POSITION_LIMIT = 100
 TICK_SIZE_IN_CENTS = 100
 MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
+PLOT_HISTORY = 500  # samples shown on the charts
+GC_POLICY = "default"  # one of gc_policy.POLICIES
+DIAGNOSTICS_LEVEL = OFF  # diagnostics.DEBUG records every channel
 
 
 class AutoTrader(BaseAutoTrader):
@@ -50,44 +59,26 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
+        self.outbox = MessageScheduler(loop, self, on_dropped=self.on_insert_dropped)
         self.bids = set()
         self.asks = set()
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
         #
-        self.ETF_price = list()
-        self.fut_price = list()
-        self.delta = list()
-        self.std = list()
-        self.aver = list()
-
-    def saveimg(self, name: str, a: List[int], b: List[int], cc: List[int], d: List[int]):
-        fig = pyplot.figure(figsize=(min(len(a)/10,50),min(len(a)/10,50)),clear=True)
-        pp = fig.add_subplot(111)
-        pp.grid(True)
-        ax = pp.plot(a,c='black')
-        bx = pp.plot(b,c='orange')
-        cx = pp.plot(cc,c='green')
-        dx = pp.plot(d,c='red')
-        pyplot.savefig(name,dpi=100)
-        pyplot.clf()
-        pyplot.close(fig)
-        del fig
-        gc.collect()
-    
-    def save_scatter(self,name: str, a: List[int], b: List[int]):
-        fig = pyplot.figure(figsize=(min(len(a)/10,50),min(len(a)/10,50)),clear=True)
-        pp = fig.add_subplot(111)
-        pp.grid(True)
-        if len(a) > len(b):
-            a=a[len(a)-len(b):]
-        elif len(a) < len(b):
-            b=b[len(b)-len(a):]
-        pp.scatter(a,b,s=30)
-        pyplot.savefig(name,dpi=100)
-        pyplot.clf()
-        pyplot.close(fig)
-        del fig
-        gc.collect()
+        self.pairs = PairBuffer()
+        self.retention = RetentionPolicy()
+        self.delta = self.retention.retain("delta", PLOT_HISTORY)
+        self.aver = self.retention.retain("aver", PLOT_HISTORY)
+        self.upper = self.retention.retain("upper", PLOT_HISTORY)
+        self.lower = self.retention.retain("lower", PLOT_HISTORY)
+        self.hedge_fit = OnlineLinearRegression()
+        self.delta_stats = RunningStats()
+        self.retention.report(self.logger)
+        self.memory_check = ResidentMemoryCheck(self.logger)
+        self.charts = ChartRenderer(self.logger)
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
+        self.diagnostics = Diagnostics(team_name + "_diagnostics.txt", DIAGNOSTICS_LEVEL)
+        self.fit_diagnostics = self.diagnostics.channel("hedge_fit", ("beta", "alpha"))
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -99,6 +90,15 @@ class AutoTrader(BaseAutoTrader):
         if client_order_id != 0 and (client_order_id in self.bids or client_order_id in self.asks):
             self.on_order_status_message(client_order_id, 0, 0, 0)
 
+    def on_insert_dropped(self, client_order_id: int) -> None:
+        """Called when the outbox drops an insert that was cancelled before it was sent."""
+        if client_order_id == self.bid_id:
+            self.bid_id = 0
+        elif client_order_id == self.ask_id:
+            self.ask_id = 0
+        self.bids.discard(client_order_id)
+        self.asks.discard(client_order_id)
+
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled.
 
@@ -123,47 +123,43 @@ class AutoTrader(BaseAutoTrader):
 
         if instrument == Instrument.ETF:
             if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
+                self.outbox.send_cancel_order(self.bid_id)
                 self.bid_id = 0
             if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
+                self.outbox.send_cancel_order(self.ask_id)
                 self.ask_id = 0
 
             if self.bid_id == 0 and (new_ask_price > new_bid_price) and self.position + LOT_SIZE < POSITION_LIMIT:
                 self.bid_id = next(self.order_ids)
                 self.bid_price = new_bid_price
-                self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
+                self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
                 self.bids.add(self.bid_id)
 
             if self.ask_id == 0 and (new_ask_price > new_bid_price) and self.position - LOT_SIZE > -POSITION_LIMIT:
                 self.ask_id = next(self.order_ids)
                 self.ask_price = new_ask_price
-                self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
+                self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
                 self.asks.add(self.ask_id)"""
         
+        self.memory_check.update()
+        self.collector.update()
         if ask_prices[0]+bid_prices[0] == 0:
             return
 
         if instrument == Instrument.ETF:
-            self.ETF_price.append(np.log((ask_prices[0]+bid_prices[0])/2))
-        if instrument == Instrument.FUTURE:
-            self.fut_price.append(np.log((ask_prices[0]+bid_prices[0])/2))
-        if len(self.ETF_price) >0 and len(self.fut_price) > 0:
-            a = self.ETF_price
-            b = self.fut_price
-            if len(self.ETF_price) > len(self.fut_price):
-                a=self.ETF_price[len(self.ETF_price)-len(self.fut_price):]
-            elif len(self.ETF_price) < len(self.fut_price):
-                b=self.fut_price[len(self.fut_price)-len(self.ETF_price):]
-            params = np.polyfit(a,b,1)
-            poly = np.poly1d(params)
-            beta = poly[1]
-            alpha = poly[0]
-            print("beta=",beta,"alpha=",alpha)
-            self.delta.append(b[-1] - a[-1] * beta - alpha)
-            self.aver.append(np.average(self.delta))
-            self.std.append(np.std(self.delta))
-            self.saveimg('delta.png',self.delta,self.aver,[self.aver[i] + self.std[i] for i in range(0,len(self.aver))],[self.aver[i] - self.std[i] for i in range(0,len(self.aver))])
+            paired = self.pairs.update_etf(sequence_number, np.log((ask_prices[0]+bid_prices[0])/2))
+        else:
+            paired = self.pairs.update_future(sequence_number, np.log((ask_prices[0]+bid_prices[0])/2))
+        if paired:
+            self.delta.append(self.hedge_fit.push(self.pairs.last_etf, self.pairs.last_future))
+            self.fit_diagnostics.record(self.hedge_fit.beta, self.hedge_fit.alpha)
+            self.delta_stats.push(self.delta[-1])
+            std = self.delta_stats.std()
+            self.aver.append(self.delta_stats.mean)
+            self.upper.append(self.delta_stats.mean + std)
+            self.lower.append(self.delta_stats.mean - std)
+            self.charts.plot('delta.png', ((self.delta, 'black'), (self.aver, 'orange'), (self.upper, 'green'),
+                                           (self.lower, 'red')))
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your orders is filled, partially or fully.
@@ -176,10 +172,10 @@ class AutoTrader(BaseAutoTrader):
                          price, volume)
         if client_order_id in self.bids:
             self.position += volume
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
         elif client_order_id in self.asks:
             self.position -= volume
-            self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
                                 fees: int) -> None:
@@ -22,7 +22,13 @@ from typing import List
 
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
-import numpy as np
+from diagnostics import OFF, Diagnostics
+from gc_policy import CollectionPolicy
+from log_pipeline import LogPipeline
+from pricing import RailPricer, mid
+from scheduler import MessageScheduler
+from series import PairBuffer
+from streaming_stats import RunningStats
 
 
 LOT_SIZE = 100
@@ -31,6 +37,8 @@ TICK_SIZE_IN_CENTS = 100
 MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 OFFSET = 85
+GC_POLICY = "default"  # one of gc_policy.POLICIES
+DIAGNOSTICS_LEVEL = OFF  # diagnostics.DEBUG records every channel
 
 
 class AutoTrader(BaseAutoTrader):
@@ -47,20 +55,26 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
+        self.outbox = MessageScheduler(loop, self, on_dropped=self.on_insert_dropped)
         self.bids = set()
         self.asks = set()
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
         #
-        self.etf_price = list()
-        self.fut_price = list()
-        self.delta = list()
-        self.upper_rail = list()
-        self.lower_rail = list()
+        self.etf_price = 0.0
+        self.fut_price = 0.0
+        self.pairs = PairBuffer()
+        self.delta = RunningStats()
+        self.fut_mid = 0
+        self.rails = RailPricer(1)
         #
         self.bid_lot_size = LOT_SIZE
         self.ask_lot_size = LOT_SIZE
         self.bid_lot_size_pre = LOT_SIZE
         self.ask_lot_size_pre = LOT_SIZE
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
+        self.diagnostics = Diagnostics(team_name + "_diagnostics.txt", DIAGNOSTICS_LEVEL)
+        self.lot_diagnostics = self.diagnostics.channel("lot_sizes", ("bid", "ask"))
     
     def update_lot_size(self) -> None:
         self.bid_lot_size_pre = self.bid_lot_size
@@ -72,11 +86,11 @@ class AutoTrader(BaseAutoTrader):
         if self.ask_lot_size < 0:
             self.ask_lot_size = 0
         if self.bid_lot_size_pre > self.bid_lot_size:
-            self.send_amend_order(self.bid_id, self.bid_lot_size)
+            self.outbox.send_amend_order(self.bid_id, self.bid_lot_size)
         if self.ask_lot_size_pre > self.ask_lot_size:
-            self.send_amend_order(self.ask_id, self.ask_lot_size)
+            self.outbox.send_amend_order(self.ask_id, self.ask_lot_size)
         
-        print(self.bid_lot_size, self.ask_lot_size)
+        self.lot_diagnostics.record(self.bid_lot_size, self.ask_lot_size)
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -88,6 +102,15 @@ class AutoTrader(BaseAutoTrader):
         if client_order_id != 0 and (client_order_id in self.bids or client_order_id in self.asks):
             self.on_order_status_message(client_order_id, 0, 0, 0)
 
+    def on_insert_dropped(self, client_order_id: int) -> None:
+        """Called when the outbox drops an insert that was cancelled before it was sent."""
+        if client_order_id == self.bid_id:
+            self.bid_id = 0
+        elif client_order_id == self.ask_id:
+            self.ask_id = 0
+        self.bids.discard(client_order_id)
+        self.asks.discard(client_order_id)
+
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled.
 
@@ -107,6 +130,7 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
         self.logger.info("received order book for instrument %d with sequence number %d", instrument,
                          sequence_number)
 
@@ -116,37 +140,38 @@ class AutoTrader(BaseAutoTrader):
             return
 
         if instrument == Instrument.ETF:
-            self.etf_price.append((ask_prices[0] + bid_prices[0]) / 2)
-        if instrument == Instrument.FUTURE:
-            self.fut_price.append((ask_prices[0] + bid_prices[0]) / 2)
+            self.etf_price = (ask_prices[0] + bid_prices[0]) / 2
+            paired = self.pairs.update_etf(sequence_number, self.etf_price)
+        else:
+            self.fut_mid = mid(ask_prices[0], bid_prices[0])
+            self.fut_price = self.fut_mid / 2
+            paired = self.pairs.update_future(sequence_number, self.fut_price)
 
-        if len(self.etf_price) > 0 and len(self.fut_price) > 0:
-            self.delta.append(self.etf_price[-1] - self.fut_price[-1])
-            std = np.std(self.delta)
-            self.upper_rail.append(std + OFFSET)
-            self.lower_rail.append(-(std + OFFSET))
+        if paired:
+            self.delta.push(self.pairs.last_etf - self.pairs.last_future)
+            std = self.delta.std()
+            self.rails.update((-(std + OFFSET),), (std + OFFSET,))
 
-        if instrument == Instrument.ETF:
-            new_bid_price = int(self.lower_rail[-1] + self.fut_price[-1]) // 100 * 100
-            new_ask_price = int(self.upper_rail[-1] + self.fut_price[-1]) // 100 * 100
+        if instrument == Instrument.ETF and len(self.pairs) > 0:
+            (new_bid_price,), (new_ask_price,) = self.rails.prices(self.fut_mid)
 
             if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
+                self.outbox.send_cancel_order(self.bid_id)
                 self.bid_id = 0
             if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
+                self.outbox.send_cancel_order(self.ask_id)
                 self.ask_id = 0
 
             if self.bid_id == 0 and new_bid_price != 0 and self.position < POSITION_LIMIT and self.bid_lot_size > 0:
                 self.bid_id = next(self.order_ids)
                 self.bid_price = new_bid_price
-                self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, self.bid_lot_size, Lifespan.GOOD_FOR_DAY)
+                self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, self.bid_lot_size, Lifespan.GOOD_FOR_DAY)
                 self.bids.add(self.bid_id)
 
             if self.ask_id == 0 and new_ask_price != 0 and self.position > -POSITION_LIMIT and self.ask_lot_size > 0:
                 self.ask_id = next(self.order_ids)
                 self.ask_price = new_ask_price
-                self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, self.ask_lot_size, Lifespan.GOOD_FOR_DAY)
+                self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, self.ask_lot_size, Lifespan.GOOD_FOR_DAY)
                 self.asks.add(self.ask_id)
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
@@ -160,10 +185,10 @@ class AutoTrader(BaseAutoTrader):
                          price, volume)
         if client_order_id in self.bids:
             self.position += volume
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
         elif client_order_id in self.asks:
             self.position -= volume
-            self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
         
         self.update_lot_size()
 
@@ -22,12 +22,13 @@ from typing import List
 
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
-import numpy as np
-import matplotlib
-
-matplotlib.use('Agg')
-from matplotlib import pyplot
-import gc
+from charts import ChartRenderer
+from gc_policy import CollectionPolicy
+from log_pipeline import LogPipeline
+from retention import RetentionPolicy
+from scheduler import MessageScheduler
+from series import PairBuffer
+from streaming_stats import RunningStats
 
 LOT_SIZE = 20
 POSITION_LIMIT = 100
@@ -35,20 +36,8 @@ TICK_SIZE_IN_CENTS = 100
 MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 OFFSET = 100
-
-
-def saveimg(name: str, a: List[int], b: List[int], cc: List[int]):
-    fig = pyplot.figure(figsize=(min(len(a) / 10, 50), min(len(b) / 10, 50)), clear=True)
-    pp = fig.add_subplot(111)
-    pp.grid(True)
-    ax = pp.plot(a, c='black')
-    bx = pp.plot(b, c='green')
-    cx = pp.plot(cc, c='red')
-    pyplot.savefig(name, dpi=100)
-    pyplot.clf()
-    pyplot.close(fig)
-    del fig
-    gc.collect()
+PLOT_HISTORY = 500  # samples shown on the charts
+GC_POLICY = "default"  # one of gc_policy.POLICIES
 
 
 class AutoTrader(BaseAutoTrader):
@@ -65,15 +54,23 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
+        self.outbox = MessageScheduler(loop, self, on_dropped=self.on_insert_dropped)
         self.bids = set()
         self.asks = set()
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
         #
-        self.etf_price = list()
-        self.fut_price = list()
-        self.delta = list()
-        self.upper_rail = list()
-        self.lower_rail = list()
+        self.etf_price = 0.0
+        self.fut_price = 0.0
+        self.pairs = PairBuffer()
+        self.retention = RetentionPolicy()
+        self.delta = self.retention.retain("delta", PLOT_HISTORY)
+        self.delta_stats = RunningStats()
+        self.upper_rail = self.retention.retain("upper_rail", PLOT_HISTORY)
+        self.lower_rail = self.retention.retain("lower_rail", PLOT_HISTORY)
+        self.retention.report(self.logger)
+        self.charts = ChartRenderer(self.logger)
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -85,6 +82,15 @@ class AutoTrader(BaseAutoTrader):
         if client_order_id != 0 and (client_order_id in self.bids or client_order_id in self.asks):
             self.on_order_status_message(client_order_id, 0, 0, 0)
 
+    def on_insert_dropped(self, client_order_id: int) -> None:
+        """Called when the outbox drops an insert that was cancelled before it was sent."""
+        if client_order_id == self.bid_id:
+            self.bid_id = 0
+        elif client_order_id == self.ask_id:
+            self.ask_id = 0
+        self.bids.discard(client_order_id)
+        self.asks.discard(client_order_id)
+
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled.
 
@@ -104,6 +110,7 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
         self.logger.info("received order book for instrument %d with sequence number %d", instrument,
                          sequence_number)
 
@@ -113,43 +120,46 @@ class AutoTrader(BaseAutoTrader):
             return
 
         if instrument == Instrument.ETF:
-            self.etf_price.append((ask_prices[0] + bid_prices[0]) / 2)
-        if instrument == Instrument.FUTURE:
-            self.fut_price.append((ask_prices[0] + bid_prices[0]) / 2)
-
-        if len(self.etf_price) > 0 and len(self.fut_price) > 0:
-            self.delta.append(self.etf_price[-1] - self.fut_price[-1])
-            std = np.std(self.delta)
+            self.etf_price = (ask_prices[0] + bid_prices[0]) / 2
+            paired = self.pairs.update_etf(sequence_number, self.etf_price)
+        else:
+            self.fut_price = (ask_prices[0] + bid_prices[0]) / 2
+            paired = self.pairs.update_future(sequence_number, self.fut_price)
+
+        if paired:
+            self.delta.append(self.pairs.last_etf - self.pairs.last_future)
+            self.delta_stats.push(self.delta[-1])
+            std = self.delta_stats.std()
             self.upper_rail.append(std + OFFSET)
             self.lower_rail.append(-(std + OFFSET))
 
-        if len(self.delta) > 5:
-            saveimg('b.png',
-                    self.delta[5:],
-                    self.upper_rail[5:],
-                    self.lower_rail[5:])
+        # The first few deltas are left off the chart while the std settles.
+        shown = self.delta.count - 5
+        if shown > 0:
+            self.charts.plot('b.png', ((self.delta.tail(shown), 'black'), (self.upper_rail.tail(shown), 'green'),
+                                       (self.lower_rail.tail(shown), 'red')))
 
         """if instrument == Instrument.ETF:
-            new_bid_price = int(self.lower_rail[-1] + self.fut_price[-1]) // 100 * 100
-            new_ask_price = int(self.upper_rail[-1] + self.fut_price[-1]) // 100 * 100
+            new_bid_price = int(self.lower_rail[-1] + self.fut_price) // 100 * 100
+            new_ask_price = int(self.upper_rail[-1] + self.fut_price) // 100 * 100
 
             if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
+                self.outbox.send_cancel_order(self.bid_id)
                 self.bid_id = 0
             if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
+                self.outbox.send_cancel_order(self.ask_id)
                 self.ask_id = 0
 
             if self.bid_id == 0 and new_bid_price != 0 and self.position + LOT_SIZE < POSITION_LIMIT:
                 self.bid_id = next(self.order_ids)
                 self.bid_price = new_bid_price
-                self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
+                self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
                 self.bids.add(self.bid_id)
 
             if self.ask_id == 0 and new_ask_price != 0 and self.position - LOT_SIZE > -POSITION_LIMIT:
                 self.ask_id = next(self.order_ids)
                 self.ask_price = new_ask_price
-                self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
+                self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
                 self.asks.add(self.ask_id)"""
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
@@ -163,10 +173,10 @@ class AutoTrader(BaseAutoTrader):
                          price, volume)
         if client_order_id in self.bids:
             self.position += volume
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
         elif client_order_id in self.asks:
             self.position -= volume
-            self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
+            self.outbox.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
                                 fees: int) -> None:
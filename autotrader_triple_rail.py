@@ -20,20 +20,26 @@ import itertools
 
 from typing import List
 
-from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
+from ready_trader_go import BaseAutoTrader, Instrument, Side
 
-import numpy as np
+from gc_policy import CollectionPolicy
+from hedging import HedgeEngine
+from log_pipeline import LogPipeline
+from orders import OrderRegistry, QuoteLadder
+from pricing import RailPricer, mid
+from scheduler import MessageScheduler
+from series import PairBuffer
+from streaming_stats import RunningStats
 
 LOT_SIZE1 = 25
 LOT_SIZE2 = 50
 LOT_SIZE3 = 25
 POSITION_LIMIT = 100
 TICK_SIZE_IN_CENTS = 100
-MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
-MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 OFFSET1 = -50
 OFFSET2 = 50
 OFFSET3 = 100
+GC_POLICY = "default"  # one of gc_policy.POLICIES
 
 
 class AutoTrader(BaseAutoTrader):
@@ -50,26 +56,18 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
-        self.bids = set()
-        self.asks = set()
-        self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
+        self.orders = OrderRegistry(POSITION_LIMIT)
+        self.outbox = MessageScheduler(loop, self, self.orders)
+        self.ladder = QuoteLadder(self.outbox, self.orders, self.order_ids, 3)
+        self.hedger = HedgeEngine(loop, self.outbox, self.orders, self.order_ids)
+        self.position = 0
         #
-        self.etf_price = list()
-        self.fut_price = list()
-        self.delta = list()
-        self.upper_rail1 = 0
-        self.upper_rail2 = 0
-        self.upper_rail3 = 0
-        self.lower_rail1 = 0
-        self.lower_rail2 = 0
-        self.lower_rail3 = 0
-        #
-        self.last_bid_price1 = self.last_bid_id1 = 0
-        self.last_bid_price2 = self.last_bid_id2 = 0
-        self.last_bid_price3 = self.last_bid_id3 = 0
-        self.last_ask_price1 = self.last_ask_id1 = 0
-        self.last_ask_price2 = self.last_ask_id2 = 0
-        self.last_ask_price3 = self.last_ask_id3 = 0
+        self.etf_price = 0.0
+        self.fut_price = 0.0
+        self.pairs = PairBuffer()
+        self.delta = RunningStats()
+        self.fut_mid = 0
+        self.rails = RailPricer(3)
         #
         self.bid_lot_size1 = LOT_SIZE1
         self.bid_lot_size2 = LOT_SIZE2
@@ -77,20 +75,10 @@ class AutoTrader(BaseAutoTrader):
         self.ask_lot_size1 = LOT_SIZE1
         self.ask_lot_size2 = LOT_SIZE2
         self.ask_lot_size3 = LOT_SIZE3
-        self.bid_lot_size1_pre = LOT_SIZE1
-        self.bid_lot_size2_pre = LOT_SIZE2
-        self.bid_lot_size3_pre = LOT_SIZE3
-        self.ask_lot_size1_pre = LOT_SIZE1
-        self.ask_lot_size2_pre = LOT_SIZE2
-        self.ask_lot_size3_pre = LOT_SIZE3
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
 
     def update_lot_sizes(self) -> None:
-        self.bid_lot_size1_pre = self.bid_lot_size1
-        self.bid_lot_size2_pre = self.bid_lot_size2
-        self.bid_lot_size3_pre = self.bid_lot_size3
-        self.ask_lot_size1_pre = self.ask_lot_size1
-        self.ask_lot_size2_pre = self.ask_lot_size2
-        self.ask_lot_size3_pre = self.ask_lot_size3
         self.bid_lot_size1 = min(LOT_SIZE1, POSITION_LIMIT - self.position - LOT_SIZE3 - LOT_SIZE2)
         self.ask_lot_size1 = min(LOT_SIZE1, POSITION_LIMIT + self.position - LOT_SIZE3 - LOT_SIZE2)
         self.bid_lot_size2 = min(LOT_SIZE2, POSITION_LIMIT - self.position - LOT_SIZE2)
@@ -109,18 +97,10 @@ class AutoTrader(BaseAutoTrader):
             self.bid_lot_size3 = 0
         if self.ask_lot_size3 < 0:
             self.ask_lot_size3 = 0
-        """if self.bid_lot_size1_pre > self.bid_lot_size1:
-            self.send_amend_order(self.last_bid_id1, self.bid_lot_size1)
-        if self.bid_lot_size2_pre > self.bid_lot_size2:
-            self.send_amend_order(self.last_bid_id2, self.bid_lot_size2)
-        if self.bid_lot_size3_pre > self.bid_lot_size3:
-            self.send_amend_order(self.last_bid_id3, self.bid_lot_size3)
-        if self.ask_lot_size1_pre > self.ask_lot_size1:
-            self.send_amend_order(self.last_ask_id1, self.ask_lot_size1)
-        if self.ask_lot_size2_pre > self.ask_lot_size2:
-            self.send_amend_order(self.last_ask_id2, self.ask_lot_size2)
-        if self.ask_lot_size3_pre > self.ask_lot_size3:
-            self.send_amend_order(self.last_ask_id3, self.ask_lot_size3)"""
+        for slot, volume in enumerate((self.bid_lot_size1, self.bid_lot_size2, self.bid_lot_size3)):
+            self.ladder.amend(Side.BUY, slot, volume)
+        for slot, volume in enumerate((self.ask_lot_size1, self.ask_lot_size2, self.ask_lot_size3)):
+            self.ladder.amend(Side.SELL, slot, volume)
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -129,8 +109,11 @@ class AutoTrader(BaseAutoTrader):
         will identify that order, otherwise the client_order_id will be zero.
         """
         self.logger.warning("error with order %d: %s", client_order_id, error_message.decode())
-        if client_order_id != 0 and (client_order_id in self.bids or client_order_id in self.asks):
+        order = self.orders.get(client_order_id)
+        if order is not None and order.instrument == Instrument.ETF:
             self.on_order_status_message(client_order_id, 0, 0, 0)
+        elif order is not None:
+            self.hedger.filled(client_order_id, 0)
 
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled.
@@ -141,6 +124,7 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received hedge filled for order %d with average price %d and volume %d", client_order_id,
                          price, volume)
+        self.hedger.filled(client_order_id, volume)
 
     def on_order_book_update_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
                                      ask_volumes: List[int], bid_prices: List[int], bid_volumes: List[int]) -> None:
@@ -151,6 +135,7 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
+        self.collector.update()
         self.logger.info("received order book for instrument %d with sequence number %d", instrument,
                          sequence_number)
 
@@ -160,29 +145,25 @@ class AutoTrader(BaseAutoTrader):
             return
 
         if instrument == Instrument.ETF:
-            self.etf_price.append((ask_prices[0] + bid_prices[0]) / 2)
-        if instrument == Instrument.FUTURE:
-            self.fut_price.append((ask_prices[0] + bid_prices[0]) / 2)
-
-        if len(self.etf_price) > 0 and len(self.fut_price) > 0:
-            self.delta.append(self.etf_price[-1] - self.fut_price[-1])
-            std = np.std(self.delta)
-            self.upper_rail1 = std + OFFSET1
-            self.upper_rail2 = std + OFFSET2
-            self.upper_rail3 = std + OFFSET3
-            self.lower_rail1 = -std - OFFSET1
-            self.lower_rail2 = -std - OFFSET2
-            self.lower_rail3 = -std - OFFSET3
+            self.etf_price = (ask_prices[0] + bid_prices[0]) / 2
+            paired = self.pairs.update_etf(sequence_number, self.etf_price)
+        else:
+            self.fut_mid = mid(ask_prices[0], bid_prices[0])
+            self.fut_price = self.fut_mid / 2
+            paired = self.pairs.update_future(sequence_number, self.fut_price)
+
+        if paired:
+            self.delta.push(self.pairs.last_etf - self.pairs.last_future)
+            std = self.delta.std()
+            self.rails.update((-std - OFFSET1, -std - OFFSET2, -std - OFFSET3),
+                              (std + OFFSET1, std + OFFSET2, std + OFFSET3))
 
         pos_adj = -self.position
 
-        if instrument == Instrument.ETF:
-            new_bid_price1 = int(self.lower_rail1 + self.fut_price[-1] + pos_adj) // 100 * 100
-            new_ask_price1 = int(self.upper_rail1 + self.fut_price[-1] + pos_adj) // 100 * 100
-            new_bid_price2 = int(self.lower_rail2 + self.fut_price[-1] + pos_adj) // 100 * 100
-            new_ask_price2 = int(self.upper_rail2 + self.fut_price[-1] + pos_adj) // 100 * 100
-            new_bid_price3 = int(self.lower_rail3 + self.fut_price[-1] + pos_adj) // 100 * 100
-            new_ask_price3 = int(self.upper_rail3 + self.fut_price[-1] + pos_adj) // 100 * 100
+        if instrument == Instrument.ETF and self.fut_mid != 0:
+            bids, asks = self.rails.prices(self.fut_mid + 2 * pos_adj)
+            new_bid_price1, new_bid_price2, new_bid_price3 = bids
+            new_ask_price1, new_ask_price2, new_ask_price3 = asks
 
             if new_bid_price1 <= new_bid_price2:
                 new_bid_price2 -= 100
@@ -193,60 +174,20 @@ class AutoTrader(BaseAutoTrader):
             if new_ask_price2 <= new_ask_price3:
                 new_ask_price3 = new_ask_price2 - 100
 
-            if self.last_bid_id1 != 0 and (new_bid_price1 not in (self.last_bid_price1, 0) or ask_prices[0] <= new_bid_price2):
-                self.send_cancel_order(self.last_bid_id1)
-                self.last_bid_id1 = 0
-            if self.last_bid_id2 != 0 and new_bid_price2 not in (self.last_bid_price2, 0):
-                self.send_cancel_order(self.last_bid_id2)
-                self.last_bid_id2 = 0
-            if self.last_bid_id3 != 0 and new_bid_price3 not in (self.last_bid_price3, 0):
-                self.send_cancel_order(self.last_bid_id3)
-                self.last_bid_id3 = 0
-            if self.last_ask_id1 != 0 and (new_ask_price1 not in (self.last_ask_price1, 0) or bid_prices[0] >= new_ask_price2):
-                self.send_cancel_order(self.last_ask_id1)
-                self.last_ask_id1 = 0
-            if self.last_ask_id2 != 0 and new_ask_price2 not in (self.last_ask_price2, 0):
-                self.send_cancel_order(self.last_ask_id2)
-                self.last_ask_id2 = 0
-            if self.last_ask_id3 != 0 and new_ask_price3 not in (self.last_ask_price3, 0):
-                self.send_cancel_order(self.last_ask_id3)
-                self.last_ask_id3 = 0
-
-            if self.last_bid_id1 == 0 and new_bid_price1 != 0 and self.position < POSITION_LIMIT and self.bid_lot_size1 > 0:
-                self.last_bid_id1 = next(self.order_ids)
-                self.last_bid_price1 = new_bid_price1
-                self.send_insert_order(self.last_bid_id1, Side.BUY, new_bid_price1, self.bid_lot_size1, Lifespan.GOOD_FOR_DAY)
-                self.bids.add(self.last_bid_id1)
-
-            if self.last_bid_id2 == 0 and new_bid_price2 != 0 and self.position < POSITION_LIMIT and self.bid_lot_size2 > 0:
-                self.last_bid_id2 = next(self.order_ids)
-                self.last_bid_price2 = new_bid_price2
-                self.send_insert_order(self.last_bid_id2, Side.BUY, new_bid_price2, self.bid_lot_size2, Lifespan.GOOD_FOR_DAY)
-                self.bids.add(self.last_bid_id2)
-
-            if self.last_bid_id3 == 0 and new_bid_price3 != 0 and self.position < POSITION_LIMIT and self.bid_lot_size3 > 0:
-                self.last_bid_id3 = next(self.order_ids)
-                self.last_bid_price3 = new_bid_price3
-                self.send_insert_order(self.last_bid_id3, Side.BUY, new_bid_price3, self.bid_lot_size3, Lifespan.GOOD_FOR_DAY)
-                self.bids.add(self.last_bid_id3)
-
-            if self.last_ask_id1 == 0 and new_ask_price1 != 0 and self.position > -POSITION_LIMIT and self.ask_lot_size1 > 0:
-                self.last_ask_id1 = next(self.order_ids)
-                self.last_ask_price1 = new_ask_price1
-                self.send_insert_order(self.last_ask_id1, Side.SELL, new_ask_price1, self.ask_lot_size1, Lifespan.GOOD_FOR_DAY)
-                self.asks.add(self.last_ask_id1)
-
-            if self.last_ask_id2 == 0 and new_ask_price2 != 0 and self.position > -POSITION_LIMIT and self.ask_lot_size2 > 0:
-                self.last_ask_id2 = next(self.order_ids)
-                self.last_ask_price2 = new_ask_price2
-                self.send_insert_order(self.last_ask_id2, Side.SELL, new_ask_price2, self.ask_lot_size2, Lifespan.GOOD_FOR_DAY)
-                self.asks.add(self.last_ask_id2)
-
-            if self.last_ask_id3 == 0 and new_ask_price3 != 0 and self.position > -POSITION_LIMIT and self.ask_lot_size3 > 0:
-                self.last_ask_id3 = next(self.order_ids)
-                self.last_ask_price3 = new_ask_price3
-                self.send_insert_order(self.last_ask_id3, Side.SELL, new_ask_price3, self.ask_lot_size3, Lifespan.GOOD_FOR_DAY)
-                self.asks.add(self.last_ask_id3)
+            if ask_prices[0] <= new_bid_price2:
+                self.ladder.cancel(Side.BUY, 0)
+            if bid_prices[0] >= new_ask_price2:
+                self.ladder.cancel(Side.SELL, 0)
+
+            can_bid = self.position < POSITION_LIMIT
+            can_ask = self.position > -POSITION_LIMIT
+            self.ladder.update(
+                ((new_bid_price1, self.bid_lot_size1 if can_bid else 0),
+                 (new_bid_price2, self.bid_lot_size2 if can_bid else 0),
+                 (new_bid_price3, self.bid_lot_size3 if can_bid else 0)),
+                ((new_ask_price1, self.ask_lot_size1 if can_ask else 0),
+                 (new_ask_price2, self.ask_lot_size2 if can_ask else 0),
+                 (new_ask_price3, self.ask_lot_size3 if can_ask else 0)))
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your orders is filled, partially or fully.
@@ -257,12 +198,13 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received order filled for order %d with price %d and volume %d", client_order_id,
                          price, volume)
-        if client_order_id in self.bids:
+        order = self.orders.filled(client_order_id, volume)
+        if order is not None and order.side == Side.BUY:
             self.position += volume
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
-        elif client_order_id in self.asks:
+            self.hedger.add(-volume)
+        elif order is not None:
             self.position -= volume
-            self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
+            self.hedger.add(volume)
 
         self.update_lot_sizes()
 
@@ -279,15 +221,7 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received order status for order %d with fill volume %d remaining %d and fees %d",
                          client_order_id, fill_volume, remaining_volume, fees)
-        if remaining_volume == 0:
-            if client_order_id == self.bid_id:
-                self.bid_id = 0
-            elif client_order_id == self.ask_id:
-                self.ask_id = 0
-
-            # It could be either a bid or an ask
-            self.bids.discard(client_order_id)
-            self.asks.discard(client_order_id)
+        self.orders.status(client_order_id, remaining_volume)
 
     def on_trade_ticks_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
                                ask_volumes: List[int], bid_prices: List[int], bid_volumes: List[int]) -> None:
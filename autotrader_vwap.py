@@ -23,10 +23,13 @@ from typing import List
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-from matplotlib import pyplot
-import gc
+
+from charts import ChartRenderer
+from gc_policy import CollectionPolicy
+from log_pipeline import LogPipeline
+from retention import ResidentMemoryCheck, RetentionPolicy
+from scheduler import MessageScheduler
+from streaming_stats import RollingStats, RollingVWAP
 
 
 LOT_SIZE = 10
@@ -37,18 +40,19 @@ PERIOD2 = 9
 PERIOD3 = 12
 PERIOD4 = 4
 OFFSET = 2.4
+PLOT_HISTORY = 500  # samples shown on the charts
+GC_POLICY = "default"  # one of gc_policy.POLICIES
 
 
-def least_square(x: np.matrix, y: np.matrix, order: int) -> np.matrix:
+def least_square(x: np.ndarray, y: np.ndarray, order: int) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
     if(x.shape[0] != y.shape[0]) or (x.shape[0] != order + 1) or (y.shape[0] != order + 1):
-        return np.mat([[0]])
-    a = x.transpose() * x
-    try:
-        b = np.linalg.inv(a)
-    except:
-        return np.mat([[1]])
-    sita = b * x.transpose() * y
-    return sita 
+        return np.zeros((1, 1))
+    sita, _, rank, _ = np.linalg.lstsq(x, y, rcond=None)
+    if rank < x.shape[1]:
+        return np.ones((1, 1))
+    return sita
 
 class AutoTrader(BaseAutoTrader):
     """Example Auto-trader.
@@ -64,42 +68,35 @@ class AutoTrader(BaseAutoTrader):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
         self.order_ids = itertools.count(1)
+        self.outbox = MessageScheduler(loop, self, on_dropped=self.on_insert_dropped)
         self.bids = set()
         self.asks = set()
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
         #for vwap
-        self.vwap_list = list()
-        self.vwap_upperband = list()
-        self.vwap_lowerband = list()
-        self.history_price = list()
-        self.history_volume = list()
-        self.history_price_aver = list()
+        self.retention = RetentionPolicy()
+        self.vwap_list = self.retention.retain("vwap_list", PERIOD + PLOT_HISTORY)
+        self.vwap_stats = RollingStats(PERIOD3)
+        self.vwap_upperband = self.retention.retain("vwap_upperband", PERIOD + PLOT_HISTORY)
+        self.vwap_lowerband = self.retention.retain("vwap_lowerband", PERIOD + PLOT_HISTORY)
+        self.history = RollingVWAP(PERIOD - 1, PERIOD2, skip_first=True)
+        self.history_price_aver = self.retention.retain("history_price_aver", PERIOD + PLOT_HISTORY)
         #for slope
-        self.upperband_slope = [0,0]
-        self.lowerband_slope = [0,0]
+        self.upperband_slope = self.retention.retain("upperband_slope", 2, [0, 0])
+        self.lowerband_slope = self.retention.retain("lowerband_slope", 2, [0, 0])
         self.upperband_slope_rev = self.lowerband_slope_rev = 0
-        self.trigger = list()
-        self.time = [0]
+        self.trigger = self.retention.retain("trigger", PLOT_HISTORY, dtype=np.int8)
+        self.time = self.retention.retain("time", 1, [0], dtype=np.int64)
+        self.retention.report(self.logger)
+        self.memory_check = ResidentMemoryCheck(self.logger)
         #for poly
         self.a = list()
         self.b = list()
         self.c = list()
         #self.img = pyplot.figure(figsize=(50,50))
         self.slopes = list()
-    
-    def saveimg(self, name: str, a: List[int], b: List[int], cc: List[int], d: List[int]):
-        fig = pyplot.figure(figsize=(min(len(a)/10,50),min(len(b)/10,50)),clear=True)
-        pp = fig.add_subplot(111)
-        pp.grid(True)
-        ax = pp.plot(a,c='black')
-        bx = pp.plot(b,c='orange')
-        cx = pp.plot(cc,c='green')
-        dx = pp.plot(d,c='red')
-        pyplot.savefig(name,dpi=100)
-        pyplot.clf()
-        pyplot.close(fig)
-        del fig
-        gc.collect()
+        self.charts = ChartRenderer(self.logger)
+        self.collector = CollectionPolicy(loop, self.logger, GC_POLICY)
+        self.log_pipeline = LogPipeline(loop, self.logger)
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -111,6 +108,15 @@ class AutoTrader(BaseAutoTrader):
         if client_order_id != 0:
             self.on_order_status_message(client_order_id, 0, 0, 0)
 
+    def on_insert_dropped(self, client_order_id: int) -> None:
+        """Called when the outbox drops an insert that was cancelled before it was sent."""
+        if client_order_id == self.bid_id:
+            self.bid_id = 0
+        elif client_order_id == self.ask_id:
+            self.ask_id = 0
+        self.bids.discard(client_order_id)
+        self.asks.discard(client_order_id)
+
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
         """Called when one of your hedge orders is filled, partially or fully.
 
@@ -135,25 +141,20 @@ class AutoTrader(BaseAutoTrader):
         self.logger.info("received order book for instrument %d with sequence number %d", instrument,
                          sequence_number)
         
+        self.memory_check.update()
+        self.collector.update()
         if (ask_volumes[0]+bid_volumes[0]==0):
             return
 
-        self.history_price.append((ask_prices[0]+bid_prices[0])/2)
-        self.history_volume.append(ask_volumes[0]+bid_volumes[0])
-        if len(self.history_price) > PERIOD2:
-            self.history_price_aver.append(sum(self.history_price[-PERIOD2:])/PERIOD2)
+        self.history.push((ask_prices[0]+bid_prices[0])/2, ask_volumes[0]+bid_volumes[0])
+        if len(self.history) > PERIOD2:
+            self.history_price_aver.append(self.history.average())
 
         #calculate VWAP
-        s = s2 = 0
-        for i in range(-1,-min(len(self.history_price),PERIOD),-1):
-            s += self.history_price[i] * self.history_volume[i]
-            s2 += self.history_volume[i]
-        if s2 == 0:
-            vwap = 0
-        else:
-            vwap = int(s/s2)
+        vwap = int(self.history.vwap())
         self.vwap_list.append(vwap)
-        std = np.std(self.vwap_list[-PERIOD3:])
+        self.vwap_stats.push(vwap)
+        std = self.vwap_stats.std()
         self.vwap_upperband.append(vwap + std * OFFSET)
         self.vwap_lowerband.append(vwap - std * OFFSET)
 
@@ -200,10 +201,10 @@ class AutoTrader(BaseAutoTrader):
             #print("new_bid_price=",new_bid_price,"new_ask_price=",new_ask_price)
 
             """if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
+                self.outbox.send_cancel_order(self.bid_id)
                 self.bid_id = 0
             if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
+                self.outbox.send_cancel_order(self.ask_id)
                 self.ask_id = 0
 
             trigger_flag = False
@@ -211,7 +212,7 @@ class AutoTrader(BaseAutoTrader):
             if self.bid_id == 0 and (self.history_price_aver[-2] > self.vwap_list[-2] and self.history_price_aver[-1] <= self.vwap_list[-1]) and self.position + LOT_SIZE < POSITION_LIMIT:
                 self.bid_id = next(self.order_ids)
                 self.bid_price = new_bid_price
-                self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
+                self.outbox.send_insert_order(self.bid_id, Side.BUY, new_bid_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
                 self.bids.add(self.bid_id)
                 self.upperband_slope_rev = self.lowerband_slope_rev = 0
                 trigger_flag = True
@@ -220,7 +221,7 @@ class AutoTrader(BaseAutoTrader):
             if self.ask_id == 0 and (self.history_price_aver[-2] < self.vwap_list[-2] and self.history_price_aver[-1] >= self.vwap_list[-1]) and self.position - LOT_SIZE > -POSITION_LIMIT:
                 self.ask_id = next(self.order_ids)
                 self.ask_price = new_ask_price
-                self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
+                self.outbox.send_insert_order(self.ask_id, Side.SELL, new_ask_price, LOT_SIZE, Lifespan.GOOD_FOR_DAY)
                 self.asks.add(self.ask_id)
                 self.upperband_slope_rev = self.lowerband_slope_rev = 0
                 trigger_flag = True
@@ -231,11 +232,11 @@ class AutoTrader(BaseAutoTrader):
         
         #draw
         if len(self.history_price_aver) > PERIOD:
-            self.saveimg('b.png',
-                    self.history_price_aver[PERIOD:],
-                    self.vwap_list[PERIOD:],
-                    self.vwap_upperband[PERIOD:],
-                    self.vwap_lowerband[PERIOD:])
+            self.charts.plot('b.png',
+                             ((self.history_price_aver[PERIOD:], 'black'),
+                              (self.vwap_list[PERIOD:], 'orange'),
+                              (self.vwap_upperband[PERIOD:], 'green'),
+                              (self.vwap_lowerband[PERIOD:], 'red')))
         """if len(self.upperband_slope) > PERIOD:
             pyplot.figure(figsize=(len(self.upperband_slope[PERIOD-PERIOD3:])/10,
                             len(self.upperband_slope[PERIOD-PERIOD3:])/10),clear=True)
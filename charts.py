@@ -0,0 +1,175 @@
+"""Chart rendering off the trading loop.
+
+Drawing a figure with matplotlib and writing it out takes tens of
+milliseconds, far too long to do inside on_order_book_update_message. A
+ChartRenderer snapshots the series a bot wants drawn and ships them over a
+multiprocessing queue to a separate renderer process, which draws at a
+capped frame rate and only ever draws the newest frame of each chart. The
+trading process never imports matplotlib at all.
+
+The renderer builds each chart's figure and lines once and only swaps in
+new data afterwards, and a series longer than the chart is wide is reduced
+to the minimum and maximum of each pixel column first, so a frame costs
+the same however long the session has been running.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import time
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+FIGURE_INCHES = 10
+DPI = 100
+CLOSE_TIMEOUT = 5.0
+
+
+class ChartRenderer:
+    """Client side of the renderer process.
+
+    plot() copies the series it is given (so the bot can carry on
+    appending to them) and queues a frame for the named image file. Frames
+    are dropped rather than queued up whenever a chart was sent less than
+    1 / max_fps seconds ago or the queue is full, so plot() never blocks.
+    dropped counts the frames that were not sent.
+
+    The renderer process is started with the "spawn" method by default, so
+    it inherits none of the bot's threads, locks or sockets, whatever the
+    bot set up before creating it. It is a daemon, so it goes away with
+    the bot; close() runs at exit and stops it cleanly after it has drawn
+    whatever is still queued. If the process dies, `logger` is told once
+    and every later frame is dropped.
+    """
+
+    __slots__ = ("logger", "interval", "dropped", "_queue", "_process", "_last_sent", "_dead")
+
+    def __init__(self, logger: logging.Logger, max_fps: float = 2.0, queue_size: int = 4, context: str = "spawn"):
+        """Initialise a new renderer and start its process."""
+        if max_fps <= 0.0 or queue_size < 1:
+            raise ValueError("need max_fps > 0 and queue_size >= 1")
+        self.logger = logger
+        self.interval = 1.0 / max_fps
+        self.dropped = 0
+        ctx = multiprocessing.get_context(context)
+        self._queue = ctx.Queue(queue_size)
+        self._process = ctx.Process(target=_render_frames, args=(self._queue, self.interval), name="chart-renderer",
+                                    daemon=True)
+        self._process.start()
+        self._last_sent: Dict[str, float] = {}
+        self._dead = False
+        atexit.register(self.close)
+
+    def plot(self, name: str, lines: Sequence[Tuple[Sequence[float], str]]) -> bool:
+        """Queue a line chart of (values, colour) pairs to be written to `name`; return False if dropped."""
+        now = time.monotonic()
+        if now - self._last_sent.get(name, -self.interval) < self.interval:
+            self.dropped += 1
+            return False
+        if not self._dead and not self._process.is_alive():
+            self._dead = True
+            self.logger.error("chart renderer exited with code %s; no more charts will be drawn",
+                              self._process.exitcode)
+        if self._dead:
+            self.dropped += 1
+            return False
+        frame = (name, [(np.array(values, dtype=np.float64), colour) for values, colour in lines])
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self._last_sent[name] = now
+        return True
+
+    def close(self) -> None:
+        """Stop the renderer process once it has drawn everything queued."""
+        if self._process.is_alive():
+            try:
+                self._queue.put(None, timeout=CLOSE_TIMEOUT)
+            except queue.Full:
+                self._process.terminate()
+            self._process.join(CLOSE_TIMEOUT)
+
+
+def min_max_decimate(values: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Reduce a series to the minimum and maximum of each of `buckets` runs of samples.
+
+    Returns the x positions (sample indices) and values to draw. A series
+    of up to 2 * buckets samples is returned whole. Otherwise each run
+    contributes its minimum and then its maximum, placed at the run's first
+    and last sample, which draws the same vertical extent in each pixel
+    column as the full series would, spikes included.
+    """
+    count = len(values)
+    if count <= 2 * buckets:
+        return np.arange(count), values
+    starts = np.linspace(0, count, buckets + 1).astype(np.intp)
+    x = np.empty(2 * buckets, dtype=np.intp)
+    y = np.empty(2 * buckets, dtype=values.dtype)
+    x[0::2] = starts[:-1]
+    x[1::2] = starts[1:] - 1
+    y[0::2] = np.minimum.reduceat(values, starts[:-1])
+    y[1::2] = np.maximum.reduceat(values, starts[:-1])
+    return x, y
+
+
+class _Chart:
+    """A figure and its lines, kept for the life of the renderer."""
+
+    __slots__ = ("figure", "axes", "lines")
+
+    def __init__(self, pyplot):
+        self.figure = pyplot.figure(figsize=(FIGURE_INCHES, FIGURE_INCHES), dpi=DPI)
+        self.axes = self.figure.add_subplot(111)
+        self.axes.grid(True)
+        self.lines: List = []
+
+    def draw(self, name: str, lines) -> None:
+        width = max(int(self.axes.get_window_extent().width), 1)
+        while len(self.lines) < len(lines):
+            self.lines.extend(self.axes.plot([], []))
+        for line, (values, colour) in zip(self.lines, lines):
+            line.set_data(*min_max_decimate(values, width))
+            line.set_color(colour)
+        for line in self.lines[len(lines):]:
+            line.set_data([], [])
+        self.axes.relim()
+        self.axes.autoscale_view()
+        # Write next to the target and rename over it, so readers never see a
+        # half-written image.
+        root, extension = os.path.splitext(name)
+        temporary = "%s.tmp%d%s" % (root, os.getpid(), extension)
+        self.figure.savefig(temporary, dpi=DPI)
+        os.replace(temporary, name)
+
+
+def _render_frames(frames: multiprocessing.Queue, interval: float) -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import pyplot
+
+    charts: Dict[str, _Chart] = {}
+    running = True
+    while running:
+        latest = {}
+        frame = frames.get()
+        while frame is not None:
+            latest[frame[0]] = frame
+            try:
+                frame = frames.get_nowait()
+            except queue.Empty:
+                break
+        else:
+            running = False
+
+        started = time.monotonic()
+        for name, lines in latest.values():
+            if name not in charts:
+                charts[name] = _Chart(pyplot)
+            charts[name].draw(name, lines)
+        if running:
+            time.sleep(max(started + interval - time.monotonic(), 0.0))
@@ -0,0 +1,99 @@
+"""Level-gated diagnostics recorded in memory.
+
+A print() inside on_order_book_update_message formats a string and writes
+to stdout on every tick. Diagnostics records the values themselves, as a
+tuple in a preallocated ring, instead: nothing is formatted or written
+until dump() is called, explicitly or when the interpreter exits, and a
+channel below the recording level costs one call to a function that does
+nothing.
+"""
+import atexit
+import time
+
+from typing import List, Optional, Sequence
+
+DEBUG = 10
+INFO = 20
+OFF = 100
+
+
+def _ignore(*values) -> None:
+    pass
+
+
+class Channel:
+    """One kind of diagnostic event with a fixed list of named fields.
+
+    Call record() with one value per field. The values are kept as they
+    are given, so pass numbers (or other small immutable values) rather
+    than containers the bot goes on to modify.
+    """
+
+    __slots__ = ("diagnostics", "name", "fields", "level", "record")
+
+    def __init__(self, diagnostics: "Diagnostics", name: str, fields: Sequence[str], level: int):
+        """Initialise a new channel; use Diagnostics.channel() rather than calling this."""
+        self.diagnostics = diagnostics
+        self.name = name
+        self.fields = tuple(fields)
+        self.level = level
+        self.record = _ignore
+
+    def _write(self, *values) -> None:
+        diagnostics = self.diagnostics
+        diagnostics.rows[diagnostics.count % diagnostics.capacity] = (time.monotonic(), self, values)
+        diagnostics.count += 1
+
+
+class Diagnostics:
+    """Fixed-size ring of diagnostic events, written out on demand.
+
+    The ring is a list of `capacity` slots allocated up front, each holding
+    one event's timestamp, channel and values; once it is full each new
+    event overwrites the oldest. Channels whose level is below `level`
+    record nothing, and by default (OFF) that is every channel, so a bot
+    records diagnostics only when it asks for them. dump() writes the
+    retained events to `path`, oldest first, one line per event with its
+    fields named, and is registered to run at exit; it writes no file
+    when nothing was recorded.
+    """
+
+    __slots__ = ("path", "level", "capacity", "count", "rows", "channels")
+
+    def __init__(self, path: str, level: int = OFF, capacity: int = 65536):
+        """Initialise a new, empty ring and register it to be dumped at exit."""
+        if capacity < 1:
+            raise ValueError("capacity must be at least one")
+        self.path = path
+        self.level = level
+        self.capacity = capacity
+        self.count = 0
+        self.rows: List[Optional[tuple]] = [None] * capacity
+        self.channels: List[Channel] = []
+        atexit.register(self.dump)
+
+    def channel(self, name: str, fields: Sequence[str], level: int = DEBUG) -> Channel:
+        """Return a new channel recording the given fields at the given level."""
+        channel = Channel(self, name, fields, level)
+        self.channels.append(channel)
+        self.set_level(self.level)
+        return channel
+
+    def set_level(self, level: int) -> None:
+        """Record only the channels at `level` or above from now on."""
+        self.level = level
+        for channel in self.channels:
+            channel.record = channel._write if channel.level >= level else _ignore
+
+    def dump(self, path: Optional[str] = None) -> int:
+        """Write the retained events to `path` (the ring's own path by default); return how many."""
+        retained = min(self.count, self.capacity)
+        if retained == 0:
+            return 0
+        first = self.count - retained
+        with open(path or self.path, "w") as out:
+            for i in range(first, self.count):
+                timestamp, channel, values = self.rows[i % self.capacity]
+                out.write("%.6f %s %s\n" % (timestamp, channel.name,
+                                            " ".join("%s=%s" % field for field in zip(channel.fields, values))))
+        return retained
@@ -0,0 +1,144 @@
+"""Garbage-collector policy for the trading loop.
+
+With the interpreter's default thresholds a bot that churns through lists
+of floats triggers generation-2 collections at unpredictable moments, and
+each one stalls whatever message is being handled. A CollectionPolicy
+takes control of the collector once the bot has warmed up: it collects
+and freezes everything allocated so far (the modules, the bot and its
+preallocated series), which takes it out of every later collection, then
+switches to one of the session policies below. Every collection, automatic
+or not, is timed through gc.callbacks so the pauses can be reported.
+"""
+import asyncio
+import atexit
+import gc
+import time
+
+from typing import Optional
+
+from streaming_stats import RunningStats
+
+DEFAULT = "default"  # keep the interpreter's thresholds, only freeze and report
+RAISED = "raised"  # keep automatic collection but make it much rarer
+IDLE = "idle"  # no automatic collection; collect in gaps between book updates
+POLICIES = (DEFAULT, RAISED, IDLE)
+
+RAISED_THRESHOLDS = (50000, 20, 100)
+
+
+class CollectionPolicy:
+    """Freezes the warmed-up heap and decides when the collector runs.
+
+    update() is meant to be called once per order book update. After
+    `warmup` calls the policy collects, calls gc.freeze() and applies the
+    chosen session policy:
+
+    * DEFAULT leaves automatic collection as it is;
+    * RAISED raises the thresholds to RAISED_THRESHOLDS;
+    * IDLE disables automatic collection. A timer checks every `idle_gap`
+      seconds, and once no book update has arrived for `idle_gap` seconds
+      and at least `idle_threshold` objects have been allocated, it
+      collects. If updates never pause, update() collects anyway when
+      `ceiling` objects are waiting, so memory stays bounded.
+
+    pauses holds the duration of every collection in seconds, max_pause
+    the longest, and collected the number of unreachable objects freed.
+    idle and forced count the collections IDLE started itself. A summary is
+    logged every `report_every` updates.
+
+    close() runs at exit: it stops timing collections, unfreezes the heap
+    and gives the collector back the thresholds it had to begin with.
+    """
+
+    __slots__ = ("loop", "logger", "policy", "warmup", "idle_gap", "idle_threshold", "ceiling", "report_every",
+                 "count", "pauses", "max_pause", "collected", "idle", "forced", "_started", "_last_update",
+                 "_timer", "_thresholds", "_enabled", "_closed")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, logger, policy: str = DEFAULT, warmup: int = 1000,
+                 idle_gap: float = 0.02, idle_threshold: int = 700, ceiling: int = 100000,
+                 report_every: int = 10000):
+        """Initialise a new policy and start timing collections."""
+        if policy not in POLICIES:
+            raise ValueError("unknown garbage-collection policy %r" % policy)
+        if warmup < 1 or report_every < 1 or idle_gap <= 0.0:
+            raise ValueError("need warmup >= 1, report_every >= 1 and idle_gap > 0")
+        self.loop = loop
+        self.logger = logger
+        self.policy = policy
+        self.warmup = warmup
+        self.idle_gap = idle_gap
+        self.idle_threshold = idle_threshold
+        self.ceiling = ceiling
+        self.report_every = report_every
+        self.count = 0
+        self.pauses = RunningStats()
+        self.max_pause = 0.0
+        self.collected = 0
+        self.idle = self.forced = 0
+        self._started = 0.0
+        self._last_update = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._thresholds = gc.get_threshold()
+        self._enabled = gc.isenabled()
+        self._closed = False
+        gc.callbacks.append(self._on_collection)
+        atexit.register(self.close)
+
+    def update(self) -> None:
+        """Count one order book update, warming up or collecting when due."""
+        self.count += 1
+        self._last_update = self.loop.time()
+        if self.count == self.warmup and not self._closed:
+            self._start_session()
+        elif self._timer is not None and gc.get_count()[0] >= self.ceiling:
+            self.forced += 1
+            gc.collect()
+        if self.count % self.report_every == 0:
+            self.report()
+
+    def report(self) -> None:
+        """Log how many collections ran, how long they paused for and what they freed."""
+        self.logger.info("gc policy %s: %d collections (%d idle, %d forced), pause mean %.3fms max %.3fms, "
+                         "%d objects collected", self.policy, len(self.pauses), self.idle, self.forced,
+                         self.pauses.mean * 1e3, self.max_pause * 1e3, self.collected)
+
+    def close(self) -> None:
+        """Stop timing collections and hand the collector back as it was."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        gc.callbacks.remove(self._on_collection)
+        gc.unfreeze()
+        gc.set_threshold(*self._thresholds)
+        if self._enabled:
+            gc.enable()
+
+    def _start_session(self) -> None:
+        gc.collect()
+        gc.freeze()
+        self.logger.info("gc policy %s: froze %d objects after %d updates", self.policy, gc.get_freeze_count(),
+                         self.count)
+        if self.policy == RAISED:
+            gc.set_threshold(*RAISED_THRESHOLDS)
+        elif self.policy == IDLE:
+            gc.disable()
+            self._timer = self.loop.call_later(self.idle_gap, self._on_timer)
+
+    def _on_timer(self) -> None:
+        now = self.loop.time()
+        if now - self._last_update >= self.idle_gap and gc.get_count()[0] >= self.idle_threshold:
+            self.idle += 1
+            gc.collect()
+        self._timer = self.loop.call_later(self.idle_gap, self._on_timer)
+
+    def _on_collection(self, phase: str, info: dict) -> None:
+        if phase == "start":
+            self._started = time.perf_counter()
+            return
+        pause = time.perf_counter() - self._started
+        self.pauses.push(pause)
+        self.max_pause = max(self.max_pause, pause)
+        self.collected += info["collected"]
@@ -0,0 +1,130 @@
+"""Futures hedging shared by the autotraders.
+
+ETF fills tend to arrive in bursts (one resting order filled in several
+pieces, or several levels hit by the same trade), and hedging each fill on
+its own turns every burst into a burst of small hedge orders. A
+HedgeEngine nets the futures volume asked for during one event-loop
+iteration and sends it as a single hedge once the iteration's messages
+have all been handled.
+"""
+import asyncio
+
+from typing import Dict, Iterator, Optional
+
+from ready_trader_go import BaseAutoTrader, Side
+
+from orders import Order, OrderRegistry
+from pricing import MAX_ASK_NEAREST_TICK, MIN_BID_NEAREST_TICK
+from streaming_stats import RunningStats
+
+
+class HedgeEngine:
+    """Nets futures hedges and keeps track of what is not hedged yet.
+
+    Volumes are signed futures lots: positive to buy, negative to sell.
+    Both hedging styles the bots use are supported:
+
+    * hedge every fill: call add() with the futures volume each ETF fill
+      needs. Everything added in one event-loop iteration is summed and
+      sent as one hedge order, or none if the fills cancel out;
+    * hedge when the net position drifts: call rebalance() with the ETF
+      position whenever convenient. If the ETF position plus the futures
+      position, counting hedges already on their way, is more than
+      `threshold` lots from flat, one hedge brings it back to `threshold`.
+
+    Hedges are sent as IOC orders at the most aggressive price through the
+    given trader (or a MessageScheduler) and recorded in the registry, so
+    filled() must be called from on_hedge_filled_message, and also for a
+    hedge the exchange rejected, with zero volume.
+
+    future_position is the futures position hedges have filled so far.
+    unhedged is the volume added but not yet filled, max_unhedged its peak,
+    and latency holds the seconds from the first add() of a batch to its
+    hedge being filled. hedges counts the hedge orders sent and netted the
+    add() calls that did not need an order of their own.
+    """
+
+    __slots__ = ("loop", "trader", "registry", "order_ids", "threshold", "future_position", "pending", "in_flight",
+                 "max_unhedged", "hedges", "netted", "latency", "_since", "_handle", "_sent_at")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, trader: BaseAutoTrader, registry: OrderRegistry,
+                 order_ids: Iterator[int], threshold: int = 0):
+        """Initialise a new engine with nothing hedged yet."""
+        if threshold < 0:
+            raise ValueError("threshold must not be negative")
+        self.loop = loop
+        self.trader = trader
+        self.registry = registry
+        self.order_ids = order_ids
+        self.threshold = threshold
+        self.future_position = 0
+        self.pending = 0
+        self.in_flight = 0
+        self.max_unhedged = 0
+        self.hedges = self.netted = 0
+        self.latency = RunningStats()
+        self._since = 0.0
+        self._handle: Optional[asyncio.Handle] = None
+        self._sent_at: Dict[int, float] = {}
+
+    @property
+    def unhedged(self) -> int:
+        """The signed futures volume added but not filled yet."""
+        return self.pending + self.in_flight
+
+    def exposure(self, etf_position: int) -> int:
+        """Return the net position once every hedge sent or pending has filled."""
+        return etf_position + self.future_position + self.unhedged
+
+    def add(self, volume: int) -> None:
+        """Hedge `volume` futures lots at the end of this event-loop iteration."""
+        if volume == 0:
+            return
+        if self._handle is None:
+            self._since = self.loop.time()
+            self._handle = self.loop.call_soon(self.flush)
+        else:
+            self.netted += 1
+        self.pending += volume
+        self.max_unhedged = max(self.max_unhedged, abs(self.unhedged))
+
+    def rebalance(self, etf_position: int) -> None:
+        """Hedge back to `threshold` lots from flat if the exposure is further out than that."""
+        exposure = self.exposure(etf_position)
+        if exposure > self.threshold:
+            self.add(self.threshold - exposure)
+        elif exposure < -self.threshold:
+            self.add(-self.threshold - exposure)
+
+    def flush(self) -> None:
+        """Send whatever is pending now as a single hedge order."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        volume = self.pending
+        if volume == 0:
+            return
+        self.pending = 0
+        self.in_flight += volume
+        client_order_id = next(self.order_ids)
+        self._sent_at[client_order_id] = self._since
+        if volume > 0:
+            self.registry.hedge(client_order_id, Side.BID, MAX_ASK_NEAREST_TICK, volume)
+            self.trader.send_hedge_order(client_order_id, Side.BID, MAX_ASK_NEAREST_TICK, volume)
+        else:
+            self.registry.hedge(client_order_id, Side.ASK, MIN_BID_NEAREST_TICK, -volume)
+            self.trader.send_hedge_order(client_order_id, Side.ASK, MIN_BID_NEAREST_TICK, -volume)
+        self.hedges += 1
+
+    def filled(self, client_order_id: int, volume: int) -> Optional[Order]:
+        """Apply a hedge filled message (or a rejected hedge) and return the hedge's record."""
+        order = self.registry.hedge_filled(client_order_id)
+        if order is None:
+            return None
+        sign = 1 if order.side == Side.BID else -1
+        self.in_flight -= sign * order.volume
+        self.future_position += sign * volume
+        sent_at = self._sent_at.pop(client_order_id, None)
+        if sent_at is not None and volume:
+            self.latency.push(self.loop.time() - sent_at)
+        return order
@@ -0,0 +1,212 @@
+"""Technical indicators shared by the autotraders.
+
+Each indicator keeps its state in fixed-size ring buffers and is updated
+one sample at a time from inside on_order_book_update_message.
+"""
+from collections import deque
+
+CROSS_DOWN = -1
+NO_CROSS = 0
+CROSS_UP = 1
+
+
+class CrossoverDetector:
+    """Short/long simple moving average crossover.
+
+    Both averages are kept as running sums over one shared ring buffer, so
+    a push costs a handful of float operations regardless of the window
+    lengths. With delay > 0 the newest `delay` samples are left out of both
+    averages (the cta bot compares averages that end one tick back).
+
+    short_now/long_now are the averages after the latest push and
+    short_pre/long_pre are the ones from the push before. push() returns
+    CROSS_UP when the short average moves from below the long one to at or
+    above it, CROSS_DOWN for the opposite move, and NO_CROSS otherwise.
+    Nothing is reported until both averages have a full window behind them
+    for two consecutive pushes (see ready).
+    """
+
+    __slots__ = ("short_window", "long_window", "delay", "count", "short_now", "short_pre", "long_now",
+                 "long_pre", "_buffer", "_head", "_short_sum", "_long_sum")
+
+    def __init__(self, short_window: int, long_window: int, delay: int = 0):
+        """Initialise a new detector for the given window lengths."""
+        if not 0 < short_window < long_window or delay < 0:
+            raise ValueError("need 0 < short_window < long_window and delay >= 0")
+        self.short_window = short_window
+        self.long_window = long_window
+        self.delay = delay
+        self.count = 0
+        self.short_now = self.short_pre = self.long_now = self.long_pre = 0.0
+        self._buffer = [0.0] * (long_window + delay + 1)
+        self._head = 0
+        self._short_sum = self._long_sum = 0.0
+
+    @property
+    def ready(self) -> bool:
+        """True once short_pre and long_pre both cover a full window."""
+        return self.count > self.long_window + self.delay
+
+    def _ago(self, pushes: int) -> float:
+        return self._buffer[(self._head - pushes) % len(self._buffer)]
+
+    def push(self, value: float) -> int:
+        """Add one sample and return CROSS_UP, CROSS_DOWN or NO_CROSS."""
+        self._buffer[self._head] = value
+        self.count += 1
+
+        delay = self.delay
+        if self.count > delay:
+            entering = self._ago(delay)
+            self._short_sum += entering
+            self._long_sum += entering
+            if self.count > delay + self.short_window:
+                self._short_sum -= self._ago(delay + self.short_window)
+            if self.count > delay + self.long_window:
+                self._long_sum -= self._ago(delay + self.long_window)
+
+        self._head += 1
+        if self._head == len(self._buffer):
+            self._head = 0
+
+        self.short_pre = self.short_now
+        self.long_pre = self.long_now
+        self.short_now = self._short_sum / self.short_window
+        self.long_now = self._long_sum / self.long_window
+
+        if not self.ready:
+            return NO_CROSS
+        if self.short_pre < self.long_pre and self.short_now >= self.long_now:
+            return CROSS_UP
+        if self.short_pre > self.long_pre and self.short_now <= self.long_now:
+            return CROSS_DOWN
+        return NO_CROSS
+
+
+class RollingExtremes:
+    """Highest high and lowest low over the last `window` samples.
+
+    Each side is a monotonic deque of (index, value) pairs, so a push is
+    amortised O(1): every sample is appended once and removed at most once.
+    """
+
+    __slots__ = ("window", "count", "_highs", "_lows")
+
+    def __init__(self, window: int):
+        """Initialise a new tracker over the given window length."""
+        if window < 1:
+            raise ValueError("window must be at least one")
+        self.window = window
+        self.count = 0
+        self._highs = deque()
+        self._lows = deque()
+
+    def push(self, high: float, low: float) -> None:
+        """Add one sample's high and low."""
+        index = self.count
+        self.count += 1
+        oldest = index - self.window
+
+        highs = self._highs
+        while highs and highs[-1][1] <= high:
+            highs.pop()
+        highs.append((index, high))
+        if highs[0][0] <= oldest:
+            highs.popleft()
+
+        lows = self._lows
+        while lows and lows[-1][1] >= low:
+            lows.pop()
+        lows.append((index, low))
+        if lows[0][0] <= oldest:
+            lows.popleft()
+
+    @property
+    def high(self) -> float:
+        """The highest high in the window, or zero before the first push."""
+        return self._highs[0][1] if self._highs else 0.0
+
+    @property
+    def low(self) -> float:
+        """The lowest low in the window, or zero before the first push."""
+        return self._lows[0][1] if self._lows else 0.0
+
+    @property
+    def midpoint(self) -> float:
+        """The midpoint of the window's high and low."""
+        return (self.high + self.low) / 2
+
+
+class Ichimoku:
+    """Ichimoku Kinko Hyo over a stream of prices.
+
+    After each push:
+
+    * tenkan_sen and kijun_sen are the high/low midpoints over the last
+      tenkan_window and kijun_window samples;
+    * leading_a, (tenkan + kijun) / 2, and leading_b, the high/low midpoint
+      over senkou_window samples, are the spans calculated now, which are
+      plotted `displacement` samples ahead;
+    * senkou_a and senkou_b are the spans that were calculated
+      `displacement` samples ago, i.e. the cloud under the current price;
+    * chikou is the latest close, and chikou_reference is the close it is
+      compared against, `displacement` samples back.
+
+    Rolling highs and lows come from RollingExtremes and the displaced
+    values from fixed ring buffers, so nothing is shifted or copied per
+    push. close_ago(k) gives the close k pushes back for any k up to
+    max(senkou_window, displacement) and returns zero for pushes that never
+    happened, like a history list that starts out zero-filled.
+    """
+
+    def __init__(self, tenkan_window: int = 9, kijun_window: int = 26, senkou_window: int = 52,
+                 displacement: int = 26):
+        """Initialise a new indicator with the classic 9/26/52 settings by default."""
+        if displacement < 1:
+            raise ValueError("displacement must be at least one")
+        self.displacement = displacement
+        self.count = 0
+        self.tenkan_sen = self.kijun_sen = 0.0
+        self.leading_a = self.leading_b = 0.0
+        self.senkou_a = self.senkou_b = 0.0
+        self.chikou = self.chikou_reference = 0.0
+        self._tenkan = RollingExtremes(tenkan_window)
+        self._kijun = RollingExtremes(kijun_window)
+        self._senkou = RollingExtremes(senkou_window)
+        self._closes = [0.0] * (max(senkou_window, displacement) + 1)
+        self._leading_a = [0.0] * (displacement + 1)
+        self._leading_b = [0.0] * (displacement + 1)
+
+    def push(self, close: float, high: float = None, low: float = None) -> None:
+        """Add one sample. high and low default to the close (e.g. a book mid)."""
+        if high is None:
+            high = close
+        if low is None:
+            low = close
+        self._tenkan.push(high, low)
+        self._kijun.push(high, low)
+        self._senkou.push(high, low)
+
+        index = self.count
+        self.count += 1
+        self.tenkan_sen = self._tenkan.midpoint
+        self.kijun_sen = self._kijun.midpoint
+        self.leading_a = (self.tenkan_sen + self.kijun_sen) / 2
+        self.leading_b = self._senkou.midpoint
+
+        spans = len(self._leading_a)
+        self._leading_a[index % spans] = self.leading_a
+        self._leading_b[index % spans] = self.leading_b
+        if index >= self.displacement:
+            self.senkou_a = self._leading_a[(index - self.displacement) % spans]
+            self.senkou_b = self._leading_b[(index - self.displacement) % spans]
+
+        self._closes[index % len(self._closes)] = close
+        self.chikou = close
+        self.chikou_reference = self.close_ago(self.displacement)
+
+    def close_ago(self, pushes: int) -> float:
+        """Return the close `pushes` pushes back (zero if there was none)."""
+        if pushes >= self.count:
+            return 0.0
+        return self._closes[(self.count - 1 - pushes) % len(self._closes)]
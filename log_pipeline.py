@@ -0,0 +1,149 @@
+"""Logging off the event loop.
+
+The autotraders log every exchange message they receive, several hundred
+a second, and with the logging configuration the bots are started with
+each record is formatted and written by the handler inline, on the event
+loop. A LogPipeline moves the root logger's handlers onto a listener
+thread behind a bounded queue, so the loop only builds the record and
+enqueues it, and samples the high-volume message types so most of those
+records are never queued at all. Warnings and errors are never sampled.
+"""
+import asyncio
+import atexit
+import logging
+import queue
+
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+ORDER_BOOK = "received order book for instrument %d with sequence number %d"
+TRADE_TICKS = "received trade ticks for instrument %d with sequence number %d"
+
+# Log 1 in N records of each message type listed here (none at all if N is
+# zero). Message types not listed, such as fills, are always logged.
+DEFAULT_SAMPLING = {ORDER_BOOK: 100, TRADE_TICKS: 100}
+
+
+class SamplingFilter(logging.Filter):
+    """Pass 1 in N records of each sampled message type.
+
+    A message type is identified by the record's format string, so every
+    call site that logs the same message shares one counter. The first
+    record of each type always passes. Records at WARNING or above always
+    pass whatever their type. sampled_out counts the records rejected.
+    """
+
+    def __init__(self, sampling: Dict[str, int]):
+        """Initialise a new filter with the given 1-in-N rate per format string."""
+        super().__init__()
+        if any(rate < 0 for rate in sampling.values()):
+            raise ValueError("sampling rates must not be negative")
+        self.sampling = dict(sampling)
+        self.seen = dict.fromkeys(sampling, 0)
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.sampling.get(record.msg)
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        seen = self.seen[record.msg]
+        self.seen[record.msg] = seen + 1
+        if rate and seen % rate == 0:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records below WARNING when the queue is full.
+
+    Warnings and errors wait for room instead, so they are never lost.
+    Records are queued as they are, not formatted first: the queue never
+    leaves the process, so formatting can wait for the listener thread.
+    This relies on log arguments not being changed after the call, which
+    holds for the numbers and strings the autotraders log. dropped counts
+    the records lost to a full queue.
+    """
+
+    def __init__(self, records: queue.Queue):
+        """Initialise a new handler feeding the given queue."""
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room rather than fail when stopping with a full queue.
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    """Routes the root logger's records through a queue to a listener thread.
+
+    Creating a pipeline takes the handlers off the root logger, where the
+    bots' logging configuration puts them, and hands them to a listener
+    thread; the root logger gets a DroppingQueueHandler with a
+    SamplingFilter in their place. At most `capacity` records wait in the
+    queue. Every `report_interval` seconds, and when the pipeline is
+    closed, `logger` is told how many records were sampled out and
+    dropped. close() runs at exit: it lets the listener write out whatever
+    is queued and gives the root logger its handlers back.
+    """
+
+    __slots__ = ("loop", "logger", "report_interval", "filter", "handler", "_handlers", "_listener", "_timer")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, logger: logging.Logger,
+                 sampling: Optional[Dict[str, int]] = None, capacity: int = 10000, report_interval: float = 60.0):
+        """Initialise a new pipeline and start its listener thread."""
+        if capacity < 1 or report_interval <= 0.0:
+            raise ValueError("need capacity >= 1 and report_interval > 0")
+        self.loop = loop
+        self.logger = logger
+        self.report_interval = report_interval
+        self.filter = SamplingFilter(DEFAULT_SAMPLING if sampling is None else sampling)
+        records = queue.Queue(capacity)
+        self.handler = DroppingQueueHandler(records)
+        self.handler.addFilter(self.filter)
+        root = logging.getLogger()
+        self._handlers: List[logging.Handler] = root.handlers[:]
+        for handler in self._handlers:
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        self._listener = _Listener(records, *self._handlers, respect_handler_level=True)
+        self._listener.start()
+        self._timer: Optional[asyncio.TimerHandle] = loop.call_later(report_interval, self._on_timer)
+        atexit.register(self.close)
+
+    def report(self) -> None:
+        """Log how many records have been sampled out and dropped so far."""
+        self.logger.info("logging: %d records sampled out, %d dropped on a full queue", self.filter.sampled_out,
+                         self.handler.dropped)
+
+    def close(self) -> None:
+        """Write out everything queued and put the root logger's handlers back."""
+        if self._timer is None:
+            return
+        self._timer.cancel()
+        self._timer = None
+        self._listener.stop()
+        root = logging.getLogger()
+        root.removeHandler(self.handler)
+        for handler in self._handlers:
+            root.addHandler(handler)
+        self.report()
+
+    def _on_timer(self) -> None:
+        self.report()
+        self._timer = self.loop.call_later(self.report_interval, self._on_timer)
@@ -0,0 +1,355 @@
+"""Order bookkeeping shared by the autotraders.
+
+Every order a bot sends is recorded in an OrderRegistry under its
+client_order_id, so each exchange callback finds everything it needs about
+the order (side, instrument, which quote level it belongs to, price and
+remaining volume) with a single dict lookup. The registry also tracks
+where each order is in its life (sent, live, amend or cancel in flight,
+done), so a bot never sends a message that one already in flight makes
+redundant, and keeps a running worst-case Exposure so an insert that
+could take the position past its limit is never sent. A QuoteLadder keeps a number
+of resting ETF quotes on each side of the book in line with the prices a
+strategy wants, sending only the messages needed to get there.
+"""
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, Side
+
+POSITION_LIMIT = 100
+
+PENDING_NEW = 0
+LIVE = 1
+PENDING_AMEND = 2
+PENDING_CANCEL = 3
+DONE = 4
+
+
+class Order:
+    """What the registry knows about one order.
+
+    state moves from PENDING_NEW to LIVE once the exchange first reports
+    on the order, to PENDING_AMEND or PENDING_CANCEL while an amend or
+    cancel is in flight, and to DONE when nothing is left. PENDING_CANCEL
+    only ever gives way to DONE.
+    """
+
+    __slots__ = ("client_order_id", "side", "instrument", "slot", "price", "volume", "remaining", "filled",
+                 "state")
+
+    def __init__(self, client_order_id: int, side: int, instrument: int, slot: int, price: int, volume: int):
+        """Initialise a new record for an order that has just been sent."""
+        self.client_order_id = client_order_id
+        self.side = side
+        self.instrument = instrument
+        self.slot = slot
+        self.price = price
+        self.volume = volume
+        self.remaining = volume
+        self.filled = 0
+        self.state = PENDING_NEW
+
+
+class Exposure:
+    """Worst-case ETF exposure: the position plus everything resting on each side.
+
+    The exchange rejects an insert if the position, plus the volume of
+    every order already resting on the same side, plus the new order's
+    volume, would exceed the position limit. Exposure keeps those sums up
+    to date incrementally as the registry sees orders sent, amended,
+    cancelled and filled, so capacity() answers how much more can be
+    bought or sold in O(1).
+
+    The sums are worst-case: an order being cancelled can still be filled
+    until the cancel lands, so it counts in full until the exchange
+    reports it done. An amend down counts as soon as it is sent, because
+    the exchange handles it before any insert sent after it, and fills
+    that beat it to the exchange move volume into the position either way.
+    """
+
+    __slots__ = ("limit", "position", "resting_buy", "resting_sell")
+
+    def __init__(self, limit: int = POSITION_LIMIT):
+        """Initialise a new exposure with a flat position and nothing resting."""
+        self.limit = limit
+        self.position = 0
+        self.resting_buy = 0
+        self.resting_sell = 0
+
+    def capacity(self, side: int) -> int:
+        """Return the largest volume an insert on the given side can have without breaching the limit."""
+        if side == Side.BUY:
+            return max(self.limit - self.position - self.resting_buy, 0)
+        return max(self.limit + self.position - self.resting_sell, 0)
+
+    def rest(self, side: int, volume: int) -> None:
+        """Add volume resting on one side (negative to take it away)."""
+        if side == Side.BUY:
+            self.resting_buy += volume
+        else:
+            self.resting_sell += volume
+
+    def fill(self, side: int, volume: int) -> None:
+        """Move filled volume into the position."""
+        self.position += volume if side == Side.BUY else -volume
+
+
+class OrderRegistry:
+    """Orders that are still working, keyed by client_order_id.
+
+    insert() and hedge() record an order as it is sent. get() and the
+    callback helpers (filled, status and hedge_filled) each take the
+    client_order_id the exchange reported and return its record, or None
+    for an id the registry does not know, e.g. one that has already
+    finished. Records are dropped as soon as their order is done, so the
+    registry only ever holds the orders that are still working.
+
+    amend() and cancel() are asked before an amend or cancel is sent and
+    say whether it should be: once a cancel is in flight, any further
+    amend or cancel of the order is redundant. suppressed counts the
+    messages that were not sent for that reason.
+
+    exposure follows every ETF order through the same calls, so it is
+    only right if inserts are recorded before they are sent and every
+    order the exchange reports on is passed to filled() and status().
+    """
+
+    __slots__ = ("orders", "suppressed", "exposure")
+
+    def __init__(self, position_limit: int = POSITION_LIMIT):
+        """Initialise a new, empty registry."""
+        self.orders: Dict[int, Order] = {}
+        self.suppressed = 0
+        self.exposure = Exposure(position_limit)
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def __contains__(self, client_order_id: int) -> bool:
+        return client_order_id in self.orders
+
+    def get(self, client_order_id: int) -> Optional[Order]:
+        """Return the record for an order, or None."""
+        return self.orders.get(client_order_id)
+
+    def insert(self, client_order_id: int, side: int, price: int, volume: int, slot: int = 0) -> Order:
+        """Record an ETF order sent with send_insert_order at the given quote level."""
+        order = Order(client_order_id, side, Instrument.ETF, slot, price, volume)
+        self.orders[client_order_id] = order
+        self.exposure.rest(side, volume)
+        return order
+
+    def hedge(self, client_order_id: int, side: int, price: int, volume: int) -> Order:
+        """Record a future order sent with send_hedge_order."""
+        order = Order(client_order_id, side, Instrument.FUTURE, 0, price, volume)
+        self.orders[client_order_id] = order
+        return order
+
+    def amend(self, client_order_id: int, volume: int) -> bool:
+        """Record an amend to the given total volume; return False if it should not be sent."""
+        order = self.orders.get(client_order_id)
+        if order is None or order.state in (PENDING_CANCEL, DONE):
+            self.suppressed += 1
+            return False
+        order.volume = volume
+        self._set_remaining(order, volume - order.filled)
+        order.state = PENDING_AMEND
+        return True
+
+    def cancel(self, client_order_id: int) -> bool:
+        """Record a cancel; return False if one is already in flight or the order is done."""
+        order = self.orders.get(client_order_id)
+        if order is None or order.state in (PENDING_CANCEL, DONE):
+            self.suppressed += 1
+            return False
+        order.state = PENDING_CANCEL
+        return True
+
+    def discard(self, client_order_id: int) -> Optional[Order]:
+        """Drop an order that was recorded but will never reach the exchange."""
+        return self.status(client_order_id, 0)
+
+    def filled(self, client_order_id: int, volume: int) -> Optional[Order]:
+        """Apply an order filled message and return the order's record.
+
+        The order stays registered; the status message that follows the
+        fill says whether anything is left.
+        """
+        order = self.orders.get(client_order_id)
+        if order is not None:
+            if order.instrument == Instrument.ETF:
+                self.exposure.fill(order.side, volume)
+            self._set_remaining(order, order.remaining - volume)
+            order.filled += volume
+            if order.state == PENDING_NEW:
+                order.state = LIVE
+        return order
+
+    def status(self, client_order_id: int, remaining_volume: int) -> Optional[Order]:
+        """Apply an order status message and return the order's record.
+
+        An order with no remaining volume is done and is dropped. Any
+        other status settles a new or amended order as live, but an order
+        with a cancel in flight stays pending until the cancel lands.
+        """
+        if remaining_volume == 0:
+            order = self.orders.pop(client_order_id, None)
+            if order is not None:
+                self._set_remaining(order, 0)
+                order.state = DONE
+            return order
+        order = self.orders.get(client_order_id)
+        if order is not None:
+            self._set_remaining(order, remaining_volume)
+            if order.state != PENDING_CANCEL:
+                order.state = LIVE
+        return order
+
+    def hedge_filled(self, client_order_id: int) -> Optional[Order]:
+        """Apply a hedge filled message; a hedge order is done once it is reported."""
+        order = self.orders.pop(client_order_id, None)
+        if order is not None:
+            order.remaining = 0
+            order.state = DONE
+        return order
+
+    def _set_remaining(self, order: Order, remaining: int) -> None:
+        # A fill that beats an amend down to the exchange can take remaining
+        # below zero for a moment; such an order has nothing left resting.
+        if order.instrument == Instrument.ETF and order.state != DONE:
+            self.exposure.rest(order.side, max(remaining, 0) - max(order.remaining, 0))
+        order.remaining = remaining
+
+
+class QuoteLadder:
+    """Resting ETF quotes at up to `levels` prices on each side of the book.
+
+    Every book update the strategy passes update() the (price, volume) it
+    wants at each bid and ask level, and the ladder diffs that against the
+    order resting in each level:
+
+    * a level whose wanted price matches its resting order, or is zero
+      (no new price yet), is left alone and costs no messages;
+    * a resting order at any other price is cancelled and, unless
+      wait_for_cancel is set, a new order is inserted at the wanted price
+      straight away (with wait_for_cancel the level stays empty until the
+      exchange confirms the cancel);
+    * an empty level gets a new order if its wanted volume is positive.
+
+    A level is empty again as soon as its order is done, which the ladder
+    reads from the order's registry record, so the bot's status handler
+    only has to keep the registry up to date.
+
+    When the price is unchanged but the wanted volume is smaller than what
+    is left of the resting order, the order is amended down in place
+    (send_amend_order), which keeps its queue priority and costs one
+    message instead of a cancel and an insert. Volumes can only be
+    amended down, and a wanted volume of zero (e.g. at the position limit)
+    leaves the resting order alone and stops a new one being inserted.
+    With amend_volumes=False volume changes are ignored until the order
+    is replaced for some other reason.
+
+    Amends and cancels go through the registry first, so an order with a
+    cancel already in flight is never cancelled or amended again, e.g.
+    while a wait_for_cancel level waits for its cancel to land.
+
+    Every insert is checked against the registry's Exposure first and cut
+    down to what the position limit allows, or not sent at all if nothing
+    is left, so the exchange never has to reject one.
+
+    inserts, amends and cancels count the messages the ladder has handed
+    to its trader, and clipped the inserts it had to cut down or hold
+    back. Behind a MessageScheduler many of those messages are coalesced
+    and never sent; the scheduler's own counters of the same names say
+    how many reached the exchange.
+    """
+
+    __slots__ = ("trader", "registry", "order_ids", "levels", "lifespan", "wait_for_cancel", "amend_volumes", "bids",
+                 "asks", "inserts", "amends", "cancels", "clipped")
+
+    def __init__(self, trader: BaseAutoTrader, registry: OrderRegistry, order_ids: Iterator[int], levels: int,
+                 lifespan: int = Lifespan.GOOD_FOR_DAY, wait_for_cancel: bool = False, amend_volumes: bool = True):
+        """Initialise a new, empty ladder.
+
+        Messages go out through the trader's send methods; a MessageScheduler
+        can be passed in its place.
+        """
+        if levels < 1:
+            raise ValueError("levels must be at least one")
+        self.trader = trader
+        self.registry = registry
+        self.order_ids = order_ids
+        self.levels = levels
+        self.lifespan = lifespan
+        self.wait_for_cancel = wait_for_cancel
+        self.amend_volumes = amend_volumes
+        self.bids: List[Optional[Order]] = [None] * levels
+        self.asks: List[Optional[Order]] = [None] * levels
+        self.inserts = self.amends = self.cancels = self.clipped = 0
+
+    @property
+    def messages(self) -> int:
+        """The total number of messages the ladder has handed to its trader."""
+        return self.inserts + self.amends + self.cancels
+
+    def order(self, side: int, slot: int) -> Optional[Order]:
+        """Return the order resting in a level, or None if the level is empty."""
+        order = (self.bids if side == Side.BUY else self.asks)[slot]
+        return order if order is not None and order.state != DONE else None
+
+    def update(self, bids: Sequence[Tuple[int, int]], asks: Sequence[Tuple[int, int]]) -> None:
+        """Bring the resting orders in line with the wanted (price, volume) of each level."""
+        self._reconcile(Side.BUY, self.bids, bids)
+        self._reconcile(Side.SELL, self.asks, asks)
+
+    def amend(self, side: int, slot: int, volume: int) -> None:
+        """Reduce the volume left in a level's order to `volume` if it has more than that."""
+        order = self.order(side, slot)
+        if order is not None and self.amend_volumes:
+            self._reduce(order, volume)
+
+    def cancel(self, side: int, slot: int) -> None:
+        """Cancel whatever rests in a level, whatever its price."""
+        slots = self.bids if side == Side.BUY else self.asks
+        order = slots[slot]
+        if order is not None and order.state != DONE:
+            self._cancel(slots, slot, order)
+
+    def _reduce(self, order: Order, volume: int) -> None:
+        # The exchange takes the order's new total volume, filled lots included.
+        if 0 < volume < order.volume - order.filled:
+            if self.registry.amend(order.client_order_id, order.filled + volume):
+                self.trader.send_amend_order(order.client_order_id, order.volume)
+                self.amends += 1
+
+    def _cancel(self, slots: List[Optional[Order]], slot: int, order: Order) -> None:
+        if self.registry.cancel(order.client_order_id):
+            self.trader.send_cancel_order(order.client_order_id)
+            self.cancels += 1
+        if not self.wait_for_cancel:
+            slots[slot] = None
+
+    def _reconcile(self, side: int, slots: List[Optional[Order]], wanted: Sequence[Tuple[int, int]]) -> None:
+        for slot, (price, volume) in enumerate(wanted):
+            order = slots[slot]
+            if order is not None:
+                if order.state == DONE:
+                    slots[slot] = None
+                elif price == order.price or price == 0:
+                    if self.amend_volumes:
+                        self._reduce(order, volume)
+                    continue
+                else:
+                    self._cancel(slots, slot, order)
+                    if self.wait_for_cancel:
+                        continue
+            if price != 0 and volume > 0:
+                capacity = self.registry.exposure.capacity(side)
+                if volume > capacity:
+                    self.clipped += 1
+                    if capacity == 0:
+                        continue
+                    volume = capacity
+                client_order_id = next(self.order_ids)
+                slots[slot] = self.registry.insert(client_order_id, side, price, volume, slot)
+                self.trader.send_insert_order(client_order_id, side, price, volume, self.lifespan)
+                self.inserts += 1
@@ -0,0 +1,76 @@
+"""Integer tick pricing shared by the autotraders.
+
+Exchange prices are whole cents on a 100-cent tick, and a mid price is
+always a whole number of half-cents, so everything on the quoting path
+can stay in integers: mids are kept as ask + bid (half-cents), rail
+offsets are converted to half-cents once when they change, and quote
+prices come out of integer floor division. Rounding is exact, and bids
+are always snapped down and asks up to the nearest tick, so a quote is
+never more aggressive than the price it was derived from.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+from ready_trader_go import MAXIMUM_ASK, MINIMUM_BID
+
+import numpy as np
+
+TICK_SIZE_IN_CENTS = 100
+MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
+MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
+TICK_SIZE_IN_HALF_CENTS = 2 * TICK_SIZE_IN_CENTS
+
+
+def mid(ask_price: int, bid_price: int) -> int:
+    """Return the mid of a best ask and bid in half-cents."""
+    return ask_price + bid_price
+
+
+def bid_tick(half_cents):
+    """Snap a price in half-cents (an int or an int array) down to a tick, in cents."""
+    return half_cents // TICK_SIZE_IN_HALF_CENTS * TICK_SIZE_IN_CENTS
+
+
+def ask_tick(half_cents):
+    """Snap a price in half-cents (an int or an int array) up to a tick, in cents."""
+    return -(-half_cents // TICK_SIZE_IN_HALF_CENTS) * TICK_SIZE_IN_CENTS
+
+
+class RailPricer:
+    """Quote prices for a ladder of rails around a reference price.
+
+    Each level has a lower rail, added to the reference to give its bid,
+    and an upper rail, added to give its ask. update() takes the rails in
+    cents as the strategy computes them (floats, typically a standard
+    deviation plus an offset) and stores them as int64 half-cents, lower
+    rails rounded down and upper rails up. Because the reference is a
+    whole number of half-cents, flooring the rail first and then the sum
+    gives exactly the same tick as flooring the exact sum, and likewise
+    for ceilings, so prices() needs no float arithmetic at all: it snaps
+    every level of the ladder in one vectorised integer operation.
+    """
+
+    __slots__ = ("levels", "lower", "upper")
+
+    def __init__(self, levels: int):
+        """Initialise a new pricer with every rail at zero."""
+        if levels < 1:
+            raise ValueError("levels must be at least one")
+        self.levels = levels
+        self.lower = np.zeros(levels, dtype=np.int64)
+        self.upper = np.zeros(levels, dtype=np.int64)
+
+    def update(self, lower: Sequence[float], upper: Sequence[float]) -> None:
+        """Set the lower and upper rail of each level, in cents."""
+        self.lower[:] = np.floor(np.multiply(lower, 2.0))
+        self.upper[:] = np.ceil(np.multiply(upper, 2.0))
+
+    def prices(self, bid_reference: int, ask_reference: Optional[int] = None) -> Tuple[List[int], List[int]]:
+        """Return the bid and ask price of each level, in cents.
+
+        References are in half-cents, e.g. a mid() or twice a best bid or
+        ask. The asks are priced off the bid reference unless an ask
+        reference is given.
+        """
+        if ask_reference is None:
+            ask_reference = bid_reference
+        return bid_tick(self.lower + bid_reference).tolist(), ask_tick(self.upper + ask_reference).tolist()
@@ -0,0 +1,177 @@
+"""Online regressions shared by the autotraders.
+
+Like streaming_stats, everything in here is updated one observation at a
+time from inside on_order_book_update_message and costs O(1) per update.
+"""
+
+
+class OnlineLinearRegression:
+    """Least-squares fit of y = alpha + beta * x, updated one pair at a time.
+
+    The sufficient statistics (weight, means and centred co-moments of x and
+    y) are updated with Welford's method, which gives the same alpha and beta
+    as np.polyfit(x, y, 1) over every pair pushed so far without the
+    cancellation that raw sums of x*x and x*y suffer on log prices.
+
+    With forgetting < 1 each older pair's weight is multiplied by forgetting
+    on every push (exponentially weighted least squares), so the fit tracks
+    a hedge ratio that drifts; the effective memory is 1 / (1 - forgetting)
+    pairs.
+
+    beta stays at zero until the x values pushed have some spread; ready
+    says whether it has been fitted yet.
+    """
+
+    __slots__ = ("forgetting", "weight", "mean_x", "mean_y", "cxx", "cxy", "alpha", "beta")
+
+    def __init__(self, forgetting: float = 1.0):
+        """Initialise a new, empty regression."""
+        if not 0.0 < forgetting <= 1.0:
+            raise ValueError("forgetting must be in (0, 1]")
+        self.forgetting = forgetting
+        self.weight = 0.0
+        self.mean_x = self.mean_y = 0.0
+        self.cxx = self.cxy = 0.0
+        self.alpha = self.beta = 0.0
+
+    @property
+    def ready(self) -> bool:
+        """Whether beta has been fitted, i.e. the x values pushed are not all the same."""
+        return self.cxx > 0.0
+
+    def push(self, x: float, y: float) -> float:
+        """Add one (x, y) pair, refit, and return the pair's residual."""
+        lam = self.forgetting
+        self.weight = lam * self.weight + 1.0
+        dx = x - self.mean_x
+        self.mean_x += dx / self.weight
+        self.mean_y += (y - self.mean_y) / self.weight
+        self.cxx = lam * self.cxx + dx * (x - self.mean_x)
+        self.cxy = lam * self.cxy + dx * (y - self.mean_y)
+        if self.cxx > 0.0:
+            self.beta = self.cxy / self.cxx
+        self.alpha = self.mean_y - self.beta * self.mean_x
+        return y - self.alpha - self.beta * x
+
+    def residual(self, x: float, y: float) -> float:
+        """Return y - alpha - beta * x for the current fit."""
+        return y - self.alpha - self.beta * x
+
+
+class KalmanHedgeRatio:
+    """Kalman filter estimate of a time-varying y = alpha + beta * x.
+
+    alpha and beta follow a random walk whose per-step variance is
+    `delta / (1 - delta)`, and each observation of y carries noise of
+    variance `observation_var`. A larger delta lets beta move faster. The
+    interface matches OnlineLinearRegression so either can be used for the
+    hedge ratio.
+    """
+
+    __slots__ = ("process_var", "observation_var", "alpha", "beta", "_p00", "_p01", "_p11")
+
+    def __init__(self, delta: float = 1e-4, observation_var: float = 1e-3):
+        """Initialise a new filter with a diffuse prior on alpha and beta."""
+        if not 0.0 < delta < 1.0:
+            raise ValueError("delta must be in (0, 1)")
+        self.process_var = delta / (1.0 - delta)
+        self.observation_var = observation_var
+        self.alpha = self.beta = 0.0
+        self._p00 = self._p11 = 1.0
+        self._p01 = 0.0
+
+    def push(self, x: float, y: float) -> float:
+        """Add one (x, y) observation, update the state, and return its residual."""
+        # Predict: the state covariance grows by the process noise.
+        r00 = self._p00 + self.process_var
+        r01 = self._p01
+        r11 = self._p11 + self.process_var
+
+        # Update with the observation vector h = (1, x).
+        rh0 = r00 + r01 * x
+        rh1 = r01 + r11 * x
+        q = rh0 + rh1 * x + self.observation_var
+        error = y - self.alpha - self.beta * x
+        k0 = rh0 / q
+        k1 = rh1 / q
+        self.alpha += k0 * error
+        self.beta += k1 * error
+        self._p00 = r00 - k0 * rh0
+        self._p01 = r01 - k0 * rh1
+        self._p11 = r11 - k1 * rh1
+        return y - self.alpha - self.beta * x
+
+    def residual(self, x: float, y: float) -> float:
+        """Return y - alpha - beta * x for the current estimate."""
+        return y - self.alpha - self.beta * x
+
+
+class SlidingSlope:
+    """Least-squares slope of the last `window` samples against their index.
+
+    For equally spaced x the fitted slope is a fixed weighted sum of the
+    window, sum((i - mean_i) * y_i) / sum((i - mean_i) ** 2), so the
+    weights are precomputed once for every fill level up to `window` and
+    the sliding update only has to maintain sum(y_i) and sum(i * y_i).
+    This gives the same slope as np.polyfit(range(n), history[-n:], 1)[0]
+    (or poly1d(...)[1]) for any evenly spaced time axis with a step of one.
+
+    The running sums are recomputed exactly from the ring buffer once per
+    window so non-integer inputs cannot drift.
+    """
+
+    __slots__ = ("window", "count", "_buffer", "_head", "_sum", "_weighted_sum", "_mean_index", "_inv_sxx",
+                 "_since_recompute")
+
+    def __init__(self, window: int):
+        """Initialise a new slope estimator over the given window length."""
+        if window < 1:
+            raise ValueError("window must be at least one")
+        self.window = window
+        self.count = 0
+        self._buffer = [0.0] * window
+        self._head = 0
+        self._sum = 0.0
+        self._weighted_sum = 0.0
+        self._mean_index = [(n - 1) / 2 for n in range(window + 1)]
+        self._inv_sxx = [12.0 / (n * (n * n - 1)) if n > 1 else 0.0 for n in range(window + 1)]
+        self._since_recompute = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, value: float) -> None:
+        """Add one sample, evicting the oldest one once the window is full."""
+        n = self.count
+        if n < self.window:
+            self._weighted_sum += n * value
+            self._sum += value
+            self.count = n + 1
+        else:
+            old = self._buffer[self._head]
+            self._weighted_sum += (n - 1) * value - (self._sum - old)
+            self._sum += value - old
+        self._buffer[self._head] = value
+        self._head += 1
+        if self._head == self.window:
+            self._head = 0
+
+        self._since_recompute += 1
+        if self._since_recompute >= self.window:
+            self._recompute()
+
+    def _recompute(self) -> None:
+        self._since_recompute = 0
+        start = self._head if self.count == self.window else 0
+        total = weighted = 0.0
+        for i in range(self.count):
+            value = self._buffer[(start + i) % self.window]
+            total += value
+            weighted += i * value
+        self._sum = total
+        self._weighted_sum = weighted
+
+    def slope(self) -> float:
+        """Return the fitted slope, or zero with fewer than two samples."""
+        n = self.count
+        return (self._weighted_sum - self._mean_index[n] * self._sum) * self._inv_sxx[n]
@@ -0,0 +1,94 @@
+"""Bounded-memory retention for the autotraders' history series.
+
+A RetentionPolicy hands out RingSeries sized to the longest lookback the
+strategy actually reads, so a bot's state stops growing once every series
+has filled, and can log what it retains at startup. ResidentMemoryCheck
+warns if the process does not stay flat once warmed up.
+"""
+from typing import Dict
+
+import numpy as np
+
+from series import RingSeries
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class RetentionPolicy:
+    """Registry of the bounded series one autotrader keeps."""
+
+    __slots__ = ("series",)
+
+    def __init__(self):
+        """Initialise a new, empty policy."""
+        self.series: Dict[str, RingSeries] = {}
+
+    def retain(self, name: str, lookback: int, values=(), dtype=np.float64) -> RingSeries:
+        """Return a new series that keeps the last `lookback` values under the given name."""
+        if name in self.series:
+            raise ValueError("a series named %r is already retained" % name)
+        series = RingSeries(lookback, values, dtype)
+        self.series[name] = series
+        return series
+
+    @property
+    def nbytes(self) -> int:
+        """The total size of every retained series in bytes."""
+        return sum(series.nbytes for series in self.series.values())
+
+    def report(self, logger) -> None:
+        """Log the capacity of every retained series and the total memory they use."""
+        for name, series in self.series.items():
+            logger.info("retaining the last %d values of %s (%d bytes)", series.capacity, name, series.nbytes)
+        logger.info("retained series use %d bytes in total", self.nbytes)
+
+
+def resident_memory_kb() -> int:
+    """Return the peak resident set size of this process in KiB, or zero if unknown."""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class ResidentMemoryCheck:
+    """Warn when peak resident memory keeps growing after a warm-up.
+
+    update() is meant to be called once per order book update. After
+    `warmup` calls it records the peak resident set size as a baseline,
+    and from then on every `every` calls it checks that the peak has not
+    grown by more than `tolerance_kb`. With every series bounded by a
+    RetentionPolicy this holds for a replay of any length, so growth points
+    at state that still grows without limit. It is logged as a warning
+    rather than raised, since the check runs on the trading loop, and the
+    baseline moves up to the new peak so each further `tolerance_kb` of
+    growth is reported once. The check does nothing where the resource
+    module is unavailable.
+    """
+
+    __slots__ = ("logger", "warmup", "every", "tolerance_kb", "count", "baseline_kb")
+
+    def __init__(self, logger, warmup: int = 10000, every: int = 1000, tolerance_kb: int = 16384):
+        """Initialise a new check reporting to the given logger."""
+        if warmup < 1 or every < 1:
+            raise ValueError("warmup and every must be at least one")
+        self.logger = logger
+        self.warmup = warmup
+        self.every = every
+        self.tolerance_kb = tolerance_kb
+        self.count = 0
+        self.baseline_kb = 0
+
+    def update(self) -> None:
+        """Count one update and check the peak resident memory when due."""
+        self.count += 1
+        if self.count == self.warmup:
+            self.baseline_kb = resident_memory_kb()
+        elif self.count > self.warmup and self.count % self.every == 0 and self.baseline_kb:
+            peak_kb = resident_memory_kb()
+            if peak_kb > self.baseline_kb + self.tolerance_kb:
+                self.logger.warning("resident memory grew from %d KiB to %d KiB after warm-up", self.baseline_kb,
+                                    peak_kb)
+                self.baseline_kb = peak_kb
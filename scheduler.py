@@ -0,0 +1,176 @@
+"""Outbound message scheduling shared by the autotraders.
+
+The exchange limits how many messages a trader may send in any interval,
+so bursts of quoting activity have to be smoothed out rather than sent as
+they happen. A MessageScheduler sits between a bot (or its QuoteLadder)
+and the BaseAutoTrader send methods and releases messages at a rate the
+exchange accepts.
+"""
+import asyncio
+
+from collections import OrderedDict, deque
+from typing import Callable, Optional
+
+from ready_trader_go import BaseAutoTrader, Instrument
+
+from orders import OrderRegistry
+
+
+class MessageScheduler:
+    """Token-bucket scheduler for insert, amend, cancel and hedge messages.
+
+    It has the same send_* methods as BaseAutoTrader, so it can stand in
+    for the trader wherever messages are sent. A message goes out straight
+    away if a token is available; otherwise it waits in one of three
+    queues, which are drained in priority order as tokens come back:
+    cancels and hedges first, then amends, then inserts.
+
+    The bucket holds up to `burst` tokens and refills at
+    (limit - burst) / interval tokens a second, so no window of `interval`
+    seconds ever sees more than `limit` messages.
+
+    Queued messages that have been overtaken are coalesced instead of sent:
+
+    * cancelling an order whose insert is still queued drops both;
+    * amending an order whose insert is still queued changes the queued
+      insert's volume instead;
+    * a queued insert for a quote level (a registry record's side and
+      slot) is dropped when a newer insert for the same level arrives.
+      Levels come from the registry, so this only happens with one;
+      without a registry a replaced quote is only coalesced if the bot
+      cancels it.
+
+    Dropped inserts are marked done and removed from the registry, so a
+    QuoteLadder frees their level, and are passed to `on_dropped` if it is
+    given. The exchange never hears of a dropped insert, so a bot that
+    tracks its orders without a registry needs on_dropped to forget them.
+
+    tokens_used counts the messages sent, and inserts, amends, cancels and
+    hedges how many of each kind; these are what reached the exchange,
+    whereas a QuoteLadder's counters are what it handed to the scheduler.
+    coalesced counts the messages that never had to be sent, and
+    throttled how often the bucket ran dry with messages still waiting.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, trader: BaseAutoTrader,
+                 registry: Optional[OrderRegistry] = None, limit: int = 50, interval: float = 1.0, burst: int = 10,
+                 on_dropped: Optional[Callable[[int], None]] = None):
+        """Initialise a new scheduler that sends through the given trader."""
+        if not 0 < burst < limit or interval <= 0.0:
+            raise ValueError("need 0 < burst < limit and interval > 0")
+        self.loop = loop
+        self.trader = trader
+        self.registry = registry
+        self.on_dropped = on_dropped
+        self.burst = burst
+        self.refill_rate = (limit - burst) / interval
+        self.tokens = float(burst)
+        self.tokens_used = self.coalesced = self.throttled = 0
+        self.inserts = self.amends = self.cancels = self.hedges = 0
+        self._updated = loop.time()
+        self._urgent = deque()
+        self._amends = deque()
+        self._inserts = OrderedDict()
+        self._levels = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def queued(self) -> int:
+        """The number of messages waiting to be sent."""
+        return len(self._urgent) + len(self._amends) + len(self._inserts)
+
+    def send_insert_order(self, client_order_id: int, side: int, price: int, volume: int, lifespan: int) -> None:
+        """Send, or queue, an insert order message."""
+        level = self._level(client_order_id)
+        if level is not None:
+            superseded = self._levels.get(level)
+            if superseded is not None:
+                self._drop_insert(superseded)
+            self._levels[level] = client_order_id
+        self._inserts[client_order_id] = [side, price, volume, lifespan, level]
+        self._drain()
+
+    def send_amend_order(self, client_order_id: int, volume: int) -> None:
+        """Send, or queue, an amend order message."""
+        queued = self._inserts.get(client_order_id)
+        if queued is not None:
+            queued[2] = volume
+            self.coalesced += 1
+            return
+        self._amends.append((client_order_id, volume))
+        self._drain()
+
+    def send_cancel_order(self, client_order_id: int) -> None:
+        """Send, or queue, a cancel order message."""
+        if client_order_id in self._inserts:
+            self._drop_insert(client_order_id)
+            self.coalesced += 1
+            return
+        self._urgent.append((client_order_id,))
+        self._drain()
+
+    def send_hedge_order(self, client_order_id: int, side: int, price: int, volume: int) -> None:
+        """Send, or queue, a hedge order message."""
+        self._urgent.append((client_order_id, side, price, volume))
+        self._drain()
+
+    def _level(self, client_order_id: int):
+        if self.registry is None:
+            return None
+        order = self.registry.get(client_order_id)
+        if order is None or order.instrument != Instrument.ETF:
+            return None
+        return order.side, order.slot
+
+    def _drop_insert(self, client_order_id: int) -> None:
+        side, price, volume, lifespan, level = self._inserts.pop(client_order_id)
+        if level is not None and self._levels.get(level) == client_order_id:
+            del self._levels[level]
+        self.coalesced += 1
+        if self.registry is not None:
+            self.registry.discard(client_order_id)
+        if self.on_dropped is not None:
+            self.on_dropped(client_order_id)
+
+    def _refill(self) -> None:
+        now = self.loop.time()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._refill()
+        # The timer was set for when the next token is due; don't let
+        # rounding in the delay leave the bucket a hair short of it.
+        self.tokens = max(self.tokens, 1.0)
+        self._drain()
+
+    def _drain(self) -> None:
+        self._refill()
+        trader = self.trader
+        while self.tokens >= 1.0:
+            if self._urgent:
+                message = self._urgent.popleft()
+                if len(message) == 1:
+                    trader.send_cancel_order(message[0])
+                    self.cancels += 1
+                else:
+                    trader.send_hedge_order(*message)
+                    self.hedges += 1
+            elif self._amends:
+                trader.send_amend_order(*self._amends.popleft())
+                self.amends += 1
+            elif self._inserts:
+                client_order_id, (side, price, volume, lifespan, level) = self._inserts.popitem(last=False)
+                if level is not None and self._levels.get(level) == client_order_id:
+                    del self._levels[level]
+                trader.send_insert_order(client_order_id, side, price, volume, lifespan)
+                self.inserts += 1
+            else:
+                return
+            self.tokens -= 1.0
+            self.tokens_used += 1
+
+        if self.queued and self._timer is None:
+            self.throttled += 1
+            self._timer = self.loop.call_later((1.0 - self.tokens) / self.refill_rate, self._on_timer)
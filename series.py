@@ -0,0 +1,136 @@
+"""Price series shared by the autotraders.
+
+RingSeries keeps a bounded price history in a preallocated array so that
+the trailing windows the strategies read can be handed to NumPy as views,
+without building a new array from a Python list on every update.
+PairBuffer lines up the ETF and future books by sequence number.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+class PairBuffer:
+    """Time-aligned (ETF, future) price pairs, keyed by sequence number.
+
+    The exchange reports both order books with the same sequence number
+    for the same point in time, but the two messages arrive separately.
+    update_etf/update_future record each side's latest price, and a pair
+    is emitted only once both sides have reported the same sequence
+    number. Stale (out-of-order) updates are ignored, and a sequence
+    number that only one side ever reports produces no pair. Only the
+    most recent pair is kept, as last_etf and last_future; len() is the
+    number of pairs emitted so far.
+    """
+
+    __slots__ = ("count", "last_sequence", "last_etf", "last_future", "_etf_sequence", "_future_sequence",
+                 "_etf_price", "_future_price")
+
+    def __init__(self):
+        """Initialise a new buffer with no pairs."""
+        self.count = 0
+        self.last_sequence = -1
+        self.last_etf = self.last_future = 0.0
+        self._etf_sequence = self._future_sequence = -1
+        self._etf_price = self._future_price = 0.0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def update_etf(self, sequence_number: int, price: float) -> bool:
+        """Record an ETF price; return True if it completed a pair."""
+        if sequence_number < self._etf_sequence:
+            return False
+        self._etf_sequence = sequence_number
+        self._etf_price = price
+        return self._try_emit()
+
+    def update_future(self, sequence_number: int, price: float) -> bool:
+        """Record a future price; return True if it completed a pair."""
+        if sequence_number < self._future_sequence:
+            return False
+        self._future_sequence = sequence_number
+        self._future_price = price
+        return self._try_emit()
+
+    def _try_emit(self) -> bool:
+        sequence_number = self._etf_sequence
+        if sequence_number != self._future_sequence or sequence_number <= self.last_sequence:
+            return False
+        self.last_sequence = sequence_number
+        self.last_etf = self._etf_price
+        self.last_future = self._future_price
+        self.count += 1
+        return True
+
+    def last(self) -> Tuple[float, float]:
+        """Return the most recent (ETF, future) pair."""
+        return self.last_etf, self.last_future
+
+
+class RingSeries:
+    """Fixed-capacity series that keeps only its last `capacity` values.
+
+    Indexing with an int returns a Python scalar like a list would;
+    slicing and tail(n) return ndarray views that NumPy and matplotlib
+    consume directly. Appending past the capacity evicts the oldest value,
+    so memory is fixed when it is created. Every value is written twice,
+    `capacity` slots apart, so the retained window is always one
+    contiguous view. len() is the number of values retained and count the
+    number ever appended.
+    """
+
+    __slots__ = ("capacity", "count", "_data", "_head")
+
+    def __init__(self, capacity: int, values=(), dtype=np.float64):
+        """Initialise a new series retaining up to `capacity` values."""
+        if capacity < 1:
+            raise ValueError("capacity must be at least one")
+        self.capacity = capacity
+        self.count = 0
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        self._head = 0
+        for value in values:
+            self.append(value)
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.values()[key]
+        size = len(self)
+        if key < 0:
+            key += size
+        if not 0 <= key < size:
+            raise IndexError("series index out of range")
+        return self.values()[key].item()
+
+    def __iter__(self):
+        return iter(self.values().tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        view = self.values()
+        return view if dtype is None else view.astype(dtype, copy=False)
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the backing array in bytes."""
+        return self._data.nbytes
+
+    def append(self, value) -> None:
+        """Add a value, evicting the oldest one once the series is full."""
+        head = self._head
+        self._data[head] = self._data[head + self.capacity] = value
+        self._head = head + 1 if head + 1 < self.capacity else 0
+        self.count += 1
+
+    def tail(self, n: int) -> np.ndarray:
+        """Return a view of the last n retained values (all of them if there are fewer)."""
+        values = self.values()
+        return values[max(len(values) - n, 0):]
+
+    def values(self) -> np.ndarray:
+        """Return a view of every retained value, oldest first."""
+        end = self._head + self.capacity if self.count >= self.capacity else self._head
+        return self._data[end - len(self):end]
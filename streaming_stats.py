@@ -0,0 +1,220 @@
+"""Streaming statistics shared by the autotraders.
+
+Everything in here is updated one sample at a time from inside
+on_order_book_update_message, so every update is O(1) no matter how long
+the match has been running.
+"""
+import math
+
+
+class RunningStats:
+    """Expanding-window mean and standard deviation (Welford's algorithm).
+
+    This is a drop-in replacement for calling np.std over a list that only
+    ever grows. The result agrees with np.std of the same samples to within
+    a relative error of 1e-9 for any series whose mean is no more than 1e6
+    standard deviations away from zero (far beyond anything the ETF/future
+    spread does). Two accumulators can be combined with merge(), which uses
+    the pairwise update of Chan et al. and is just as stable.
+    """
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self):
+        """Initialise a new, empty accumulator."""
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, value: float) -> None:
+        """Add one sample."""
+        self.count += 1
+        d = value - self.mean
+        self.mean += d / self.count
+        self.m2 += d * (value - self.mean)
+
+    def merge(self, other: "RunningStats") -> None:
+        """Fold the samples seen by another accumulator into this one."""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            return
+        count = self.count + other.count
+        d = other.mean - self.mean
+        self.mean += d * other.count / count
+        self.m2 += other.m2 + d * d * self.count * other.count / count
+        self.count = count
+
+    def variance(self, ddof: int = 0) -> float:
+        """Return the variance, with the same ddof meaning as np.var.
+
+        Returns zero while there are not yet more than ddof samples.
+        """
+        if self.count <= ddof:
+            return 0.0
+        return max(self.m2, 0.0) / (self.count - ddof)
+
+    def std(self, ddof: int = 0) -> float:
+        """Return the standard deviation, with the same ddof meaning as np.std."""
+        return math.sqrt(self.variance(ddof))
+
+
+class RollingStats:
+    """Mean and standard deviation over the last `window` samples.
+
+    Samples live in a fixed ring buffer. Each push adds the new sample and
+    evicts the oldest one with a Welford-style update, so the cost does not
+    depend on the window length. Add/remove updates slowly accumulate
+    rounding error, so every `recenter_every` pushes (one window's worth by
+    default) the mean and M2 are recomputed exactly from the buffer, which
+    keeps the amortised cost O(1).
+
+    Until the window has filled, the statistics cover every sample seen so
+    far, just like np.std(history[-window:]).
+    """
+
+    __slots__ = ("window", "recenter_every", "count", "mean", "m2", "_buffer", "_head", "_since_recenter")
+
+    def __init__(self, window: int, recenter_every: int = 0):
+        """Initialise a new accumulator over the given window length."""
+        if window < 1:
+            raise ValueError("window must be at least one")
+        self.window = window
+        self.recenter_every = recenter_every if recenter_every > 0 else window
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._buffer = [0.0] * window
+        self._head = 0
+        self._since_recenter = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, value: float) -> None:
+        """Add one sample, evicting the oldest one once the window is full."""
+        if self.count < self.window:
+            self.count += 1
+            d = value - self.mean
+            self.mean += d / self.count
+            self.m2 += d * (value - self.mean)
+        else:
+            old = self._buffer[self._head]
+            old_mean = self.mean
+            self.mean += (value - old) / self.count
+            self.m2 += (value - old) * (value - self.mean + old - old_mean)
+        self._buffer[self._head] = value
+        self._head += 1
+        if self._head == self.window:
+            self._head = 0
+
+        self._since_recenter += 1
+        if self._since_recenter >= self.recenter_every:
+            self.recenter()
+
+    def recenter(self) -> None:
+        """Recompute the mean and M2 exactly from the samples in the window."""
+        self._since_recenter = 0
+        if self.count == 0:
+            return
+        samples = self._buffer if self.count == self.window else self._buffer[:self.count]
+        mean = sum(samples) / self.count
+        self.mean = mean
+        self.m2 = sum((x - mean) * (x - mean) for x in samples)
+
+    def variance(self, ddof: int = 0) -> float:
+        """Return the variance, with the same ddof meaning as np.var.
+
+        Returns zero while there are not yet more than ddof samples.
+        """
+        if self.count <= ddof:
+            return 0.0
+        return max(self.m2, 0.0) / (self.count - ddof)
+
+    def std(self, ddof: int = 0) -> float:
+        """Return the standard deviation, with the same ddof meaning as np.std."""
+        return math.sqrt(self.variance(ddof))
+
+
+class RollingVWAP:
+    """Volume-weighted average price over the last `window` samples.
+
+    Running sums of price * volume and of volume are kept alongside a ring
+    buffer, so adding a sample and evicting the oldest one is O(1). The
+    plain average of the last `average_window` prices, which the VWAP bots
+    compare against the VWAP, is maintained the same way.
+
+    Book mid prices are whole half-cents and volumes are whole lots, so
+    every term is an exactly representable float and the running sums do
+    not drift.
+
+    With skip_first, the very first sample is left out of the VWAP until
+    the window slides past it, which is what the bots' original
+    range(-1, -min(len(history), window + 1), -1) loops did: their VWAP
+    is zero after the first sample and covers all but the first while the
+    window fills. The price average always covers every sample.
+    """
+
+    __slots__ = ("window", "average_window", "skip_first", "count", "_prices", "_volumes", "_head", "_pv_sum",
+                 "_volume_sum", "_price_sum", "_first_pv", "_first_volume")
+
+    def __init__(self, window: int, average_window: int = 5, skip_first: bool = False):
+        """Initialise a new VWAP over the given window length."""
+        if window < 1 or average_window < 1 or average_window > window:
+            raise ValueError("need 1 <= average_window <= window")
+        self.window = window
+        self.average_window = average_window
+        self.skip_first = skip_first
+        self.count = 0
+        self._prices = [0.0] * window
+        self._volumes = [0] * window
+        self._head = 0
+        self._pv_sum = 0.0
+        self._volume_sum = 0
+        self._price_sum = 0.0
+        self._first_pv = 0.0
+        self._first_volume = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, price: float, volume: int) -> None:
+        """Add one price/volume sample, evicting the oldest once the window is full."""
+        head = self._head
+        if self.count >= self.average_window:
+            self._price_sum -= self._prices[head - self.average_window]
+        if self.count == self.window:
+            self._pv_sum -= self._prices[head] * self._volumes[head]
+            self._volume_sum -= self._volumes[head]
+            # The first eviction is the first sample; from here on nothing is skipped.
+            self._first_pv = 0.0
+            self._first_volume = 0
+        else:
+            if self.count == 0 and self.skip_first:
+                self._first_pv = price * volume
+                self._first_volume = volume
+            self.count += 1
+        self._prices[head] = price
+        self._volumes[head] = volume
+        self._pv_sum += price * volume
+        self._volume_sum += volume
+        self._price_sum += price
+        self._head = head + 1 if head + 1 < self.window else 0
+
+    def vwap(self) -> float:
+        """Return the VWAP of the window, or zero if it has seen no volume."""
+        volume = self._volume_sum - self._first_volume
+        if volume == 0:
+            return 0.0
+        return (self._pv_sum - self._first_pv) / volume
+
+    def average(self) -> float:
+        """Return the plain average of the last average_window prices.
+
+        Like sum(history[-n:]) / n, the divisor is always average_window.
+        """
+        return self._price_sum / self.average_window
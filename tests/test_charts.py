@@ -0,0 +1,43 @@
+import logging
+
+import numpy as np
+import pytest
+
+from charts import ChartRenderer, min_max_decimate
+
+
+def test_a_dead_renderer_is_logged_once_and_drops_every_frame(caplog):
+    renderer = ChartRenderer(logging.getLogger("charts"), max_fps=1000.0)
+    renderer._process.terminate()
+    renderer._process.join()
+    with caplog.at_level(logging.ERROR, logger="charts"):
+        assert not renderer.plot("a.png", [([1.0, 2.0], "black")])
+        assert not renderer.plot("b.png", [([1.0, 2.0], "black")])
+    assert len(caplog.records) == 1 and "chart renderer exited" in caplog.text
+    assert renderer.dropped == 2
+    renderer.close()
+
+
+def test_short_series_are_drawn_whole():
+    values = np.arange(10.0)
+    x, y = min_max_decimate(values, 5)
+    np.testing.assert_array_equal(x, np.arange(10))
+    assert y is values
+
+
+@pytest.mark.parametrize("count, buckets", [(11, 5), (1000, 7), (100_000, 1000), (4096, 1024)])
+def test_decimation_keeps_the_extremes_and_the_endpoints(count, buckets):
+    rng = np.random.default_rng(count)
+    values = np.cumsum(rng.normal(0.0, 1.0, count))
+    values[rng.integers(0, count, 3)] += [50.0, -50.0, 80.0]
+    x, y = min_max_decimate(values, buckets)
+    assert len(x) == len(y) == 2 * buckets
+    assert x[0] == 0 and x[-1] == count - 1
+    assert np.all(np.diff(x) >= 0)
+    assert y.min() == values.min() and y.max() == values.max()
+    # Every pixel column spans exactly its run of samples.
+    starts = np.linspace(0, count, buckets + 1).astype(np.intp)
+    for bucket in range(buckets):
+        run = values[starts[bucket]:starts[bucket + 1]]
+        assert (y[2 * bucket], y[2 * bucket + 1]) == (run.min(), run.max())
+        assert (x[2 * bucket], x[2 * bucket + 1]) == (starts[bucket], starts[bucket + 1] - 1)
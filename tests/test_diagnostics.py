@@ -0,0 +1,28 @@
+from diagnostics import DEBUG, INFO, Diagnostics
+
+
+def test_nothing_is_recorded_or_written_by_default(tmp_path):
+    path = tmp_path / "diagnostics.txt"
+    diagnostics = Diagnostics(str(path))
+    channel = diagnostics.channel("price", ("bid", "ask"))
+    for price in range(100):
+        channel.record(price, price + 1)
+    assert diagnostics.count == 0
+    assert diagnostics.dump() == 0 and not path.exists()
+
+
+def test_channels_at_or_above_the_level_are_kept_in_a_ring(tmp_path):
+    path = tmp_path / "diagnostics.txt"
+    diagnostics = Diagnostics(str(path), INFO, capacity=3)
+    verbose = diagnostics.channel("tick", ("n",), DEBUG)
+    fills = diagnostics.channel("fill", ("id", "volume"), INFO)
+    for i in range(5):
+        verbose.record(i)
+        fills.record(i, 10 * i)
+    assert diagnostics.dump() == 3
+    lines = path.read_text().splitlines()
+    assert [line.split(" ", 1)[1] for line in lines] == ["fill id=2 volume=20", "fill id=3 volume=30",
+                                                         "fill id=4 volume=40"]
+    diagnostics.set_level(DEBUG)
+    verbose.record(5)
+    assert diagnostics.count == 6
@@ -0,0 +1,65 @@
+import gc
+import logging
+
+import pytest
+
+from gc_policy import IDLE, RAISED, RAISED_THRESHOLDS, CollectionPolicy
+
+
+class Timer:
+    cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerLoop:
+    def __init__(self):
+        self.timers = []
+
+    def time(self):
+        return 0.0
+
+    def call_later(self, delay, callback, *args):
+        timer = Timer()
+        self.timers.append(timer)
+        return timer
+
+
+@pytest.mark.parametrize("policy", [IDLE, RAISED])
+def test_close_hands_the_collector_back(policy):
+    thresholds = gc.get_threshold()
+    loop = TimerLoop()
+    collector = CollectionPolicy(loop, logging.getLogger("test"), policy, warmup=2)
+    collector.update()
+    assert gc.get_freeze_count() == 0
+    collector.update()
+    assert gc.get_freeze_count() > 0
+    if policy == IDLE:
+        assert not gc.isenabled() and len(loop.timers) == 1
+    else:
+        assert gc.get_threshold() == RAISED_THRESHOLDS
+    gc.collect()
+    assert len(collector.pauses) > 0
+    collector.close()
+    collector.close()
+    assert gc.isenabled() and gc.get_threshold() == thresholds
+    assert gc.get_freeze_count() == 0
+    assert collector._on_collection not in gc.callbacks
+    assert all(timer.cancelled for timer in loop.timers)
+    # Nothing is timed or started once it is closed.
+    collections = len(collector.pauses)
+    gc.collect()
+    collector.update()
+    assert len(collector.pauses) == collections
+
+
+def test_the_default_policy_only_freezes():
+    thresholds = gc.get_threshold()
+    collector = CollectionPolicy(TimerLoop(), logging.getLogger("test"), warmup=1)
+    collector.update()
+    assert gc.isenabled() and gc.get_threshold() == thresholds and gc.get_freeze_count() > 0
+    collector.close()
+    assert gc.get_freeze_count() == 0
+    with pytest.raises(ValueError):
+        CollectionPolicy(TimerLoop(), logging.getLogger("test"), "never")
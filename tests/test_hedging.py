@@ -0,0 +1,130 @@
+import itertools
+
+import pytest
+
+pytest.importorskip("ready_trader_go")
+
+from ready_trader_go import Side
+
+from hedging import HedgeEngine
+from orders import OrderRegistry
+from pricing import MAX_ASK_NEAREST_TICK, MIN_BID_NEAREST_TICK
+
+
+class Handle:
+    cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class IterationLoop:
+    """Runs call_soon callbacks when the test says the iteration is over."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.ready = []
+
+    def time(self):
+        return self.now
+
+    def call_soon(self, callback, *args):
+        handle = Handle()
+        self.ready.append((handle, callback, args))
+        return handle
+
+    def end_iteration(self):
+        ready, self.ready = self.ready, []
+        for handle, callback, args in ready:
+            if not handle.cancelled:
+                callback(*args)
+
+
+class RecordingTrader:
+    def __init__(self):
+        self.hedges = []
+
+    def send_hedge_order(self, client_order_id, side, price, volume):
+        self.hedges.append((client_order_id, side, price, volume))
+
+
+def make_engine(threshold=0):
+    loop = IterationLoop()
+    trader = RecordingTrader()
+    registry = OrderRegistry()
+    return loop, trader, registry, HedgeEngine(loop, trader, registry, itertools.count(1), threshold)
+
+
+def test_fills_in_one_iteration_are_netted_into_one_hedge():
+    loop, trader, registry, engine = make_engine()
+    for volume in (-3, -4, 2, -5):
+        engine.add(volume)
+    assert trader.hedges == [] and engine.unhedged == -10
+    loop.end_iteration()
+    assert trader.hedges == [(1, Side.ASK, MIN_BID_NEAREST_TICK, 10)]
+    assert (engine.hedges, engine.netted) == (1, 3)
+    assert 1 in registry and engine.in_flight == -10 and engine.pending == 0
+    loop.now = 0.25
+    assert engine.filled(1, 10).side == Side.ASK
+    assert engine.future_position == -10 and engine.unhedged == 0
+    assert engine.latency.mean == 0.25
+    assert 1 not in registry and engine.filled(1, 10) is None
+
+
+def test_fills_that_cancel_out_send_nothing():
+    loop, trader, registry, engine = make_engine()
+    engine.add(7)
+    engine.add(0)
+    engine.add(-7)
+    loop.end_iteration()
+    assert trader.hedges == [] and engine.hedges == 0
+    # Each iteration gets its own hedge.
+    engine.add(2)
+    loop.end_iteration()
+    engine.add(3)
+    loop.end_iteration()
+    assert [hedge[1:] for hedge in trader.hedges] == [(Side.BID, MAX_ASK_NEAREST_TICK, 2),
+                                                      (Side.BID, MAX_ASK_NEAREST_TICK, 3)]
+    assert engine.max_unhedged == 7
+
+
+def test_flush_sends_at_once_and_cancels_the_end_of_iteration_call():
+    loop, trader, registry, engine = make_engine()
+    engine.add(4)
+    engine.flush()
+    assert len(trader.hedges) == 1
+    loop.end_iteration()
+    assert len(trader.hedges) == 1
+
+
+def test_rebalance_hedges_back_to_the_threshold():
+    loop, trader, registry, engine = make_engine(threshold=10)
+    engine.rebalance(10)
+    engine.rebalance(-10)
+    loop.end_iteration()
+    assert trader.hedges == []
+    engine.rebalance(25)
+    loop.end_iteration()
+    assert trader.hedges[-1][1:] == (Side.ASK, MIN_BID_NEAREST_TICK, 15)
+    # The hedge in flight counts, so the next update does not hedge it again.
+    engine.rebalance(25)
+    loop.end_iteration()
+    assert len(trader.hedges) == 1 and engine.exposure(25) == 10
+    # A partial fill leaves the rest unhedged once the hedge is done.
+    engine.filled(trader.hedges[-1][0], 12)
+    assert engine.future_position == -12 and engine.exposure(25) == 13
+    engine.rebalance(-40)
+    loop.end_iteration()
+    assert trader.hedges[-1][1:] == (Side.BID, MAX_ASK_NEAREST_TICK, 42)
+    assert engine.exposure(-40) == -10
+
+
+def test_a_rejected_hedge_is_unhedged_again():
+    loop, trader, registry, engine = make_engine()
+    engine.add(5)
+    loop.end_iteration()
+    engine.filled(1, 0)
+    assert engine.future_position == 0 and engine.unhedged == 0 and engine.exposure(5) == 5
+    assert len(engine.latency) == 0
+    with pytest.raises(ValueError):
+        make_engine(threshold=-1)
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from indicators import CROSS_DOWN, CROSS_UP, NO_CROSS, CrossoverDetector, Ichimoku, RollingExtremes
+
+
+def random_mids(count: int, seed: int):
+    """Book mids in whole half-cents, wandering enough for averages to cross."""
+    rng = np.random.default_rng(seed)
+    return (20000 + np.cumsum(rng.integers(-3, 4, count)) * 100).astype(float) / 2
+
+
+def sma(history, end: int, window: int) -> float:
+    return sum(history[end - window:end]) / window
+
+
+@pytest.mark.parametrize("short_window, long_window, delay", [(1, 2, 0), (5, 20, 0), (10, 60, 1), (3, 7, 4)])
+def test_crossover_matches_slice_averages(short_window, long_window, delay):
+    mids = random_mids(3000, long_window).tolist()
+    detector = CrossoverDetector(short_window, long_window, delay)
+    crosses = 0
+    for i, mid in enumerate(mids, 1):
+        signal = detector.push(mid)
+        assert detector.ready == (i > long_window + delay)
+        if not detector.ready:
+            assert signal == NO_CROSS
+            continue
+        short_now, long_now = sma(mids, i - delay, short_window), sma(mids, i - delay, long_window)
+        short_pre, long_pre = sma(mids, i - 1 - delay, short_window), sma(mids, i - 1 - delay, long_window)
+        # Half-cent mids keep the running sums exact, so ties are real ties.
+        assert (detector.short_now, detector.long_now) == (short_now, long_now)
+        assert (detector.short_pre, detector.long_pre) == (short_pre, long_pre)
+        if short_pre < long_pre and short_now >= long_now:
+            expected = CROSS_UP
+        elif short_pre > long_pre and short_now <= long_now:
+            expected = CROSS_DOWN
+        else:
+            expected = NO_CROSS
+        assert signal == expected
+        crosses += signal != NO_CROSS
+    assert crosses > 0
+
+
+def test_crossover_rejects_bad_windows():
+    for args in ((0, 5), (5, 5), (6, 5), (2, 5, -1)):
+        with pytest.raises(ValueError):
+            CrossoverDetector(*args)
+
+
+def midpoint(highs, lows, end: int, window: int) -> float:
+    start = max(end - window, 0)
+    return (max(highs[start:end]) + min(lows[start:end])) / 2
+
+
+@pytest.mark.parametrize("window", [1, 2, 9, 52])
+def test_rolling_extremes_match_slices(window):
+    rng = np.random.default_rng(window)
+    mids = random_mids(2000, window)
+    # Repeated values exercise the ties the deques pop on.
+    highs = (mids + rng.integers(0, 3, len(mids)) * 50).tolist()
+    lows = (mids - rng.integers(0, 3, len(mids)) * 50).tolist()
+    extremes = RollingExtremes(window)
+    assert extremes.high == extremes.low == extremes.midpoint == 0.0
+    for i in range(1, len(highs) + 1):
+        extremes.push(highs[i - 1], lows[i - 1])
+        start = max(i - window, 0)
+        assert extremes.high == max(highs[start:i])
+        assert extremes.low == min(lows[start:i])
+        assert extremes.midpoint == midpoint(highs, lows, i, window)
+    with pytest.raises(ValueError):
+        RollingExtremes(0)
+
+
+@pytest.mark.parametrize("windows", [(9, 26, 52, 26), (3, 5, 8, 1), (2, 4, 6, 10)])
+def test_ichimoku_matches_slices(windows):
+    tenkan_window, kijun_window, senkou_window, displacement = windows
+    rng = np.random.default_rng(senkou_window)
+    closes = random_mids(1000, displacement).tolist()
+    highs = [close + 50 * int(rng.integers(0, 3)) for close in closes]
+    lows = [close - 50 * int(rng.integers(0, 3)) for close in closes]
+    ichimoku = Ichimoku(*windows)
+    leading_a, leading_b = [], []
+    for i in range(1, len(closes) + 1):
+        ichimoku.push(closes[i - 1], highs[i - 1], lows[i - 1])
+        tenkan = midpoint(highs, lows, i, tenkan_window)
+        kijun = midpoint(highs, lows, i, kijun_window)
+        leading_a.append((tenkan + kijun) / 2)
+        leading_b.append(midpoint(highs, lows, i, senkou_window))
+        assert (ichimoku.tenkan_sen, ichimoku.kijun_sen) == (tenkan, kijun)
+        assert (ichimoku.leading_a, ichimoku.leading_b) == (leading_a[-1], leading_b[-1])
+        # The cloud under the price is whatever was projected `displacement` pushes ago.
+        if i > displacement:
+            assert (ichimoku.senkou_a, ichimoku.senkou_b) == (leading_a[-1 - displacement],
+                                                              leading_b[-1 - displacement])
+        else:
+            assert ichimoku.senkou_a == ichimoku.senkou_b == 0.0
+        assert ichimoku.chikou == closes[i - 1]
+        assert ichimoku.chikou_reference == (closes[i - 1 - displacement] if i > displacement else 0.0)
+        for pushes in (0, 1, senkou_window - 1, max(senkou_window, displacement)):
+            assert ichimoku.close_ago(pushes) == (closes[i - 1 - pushes] if pushes < i else 0.0)
+
+
+def test_ichimoku_defaults_high_and_low_to_the_close():
+    ichimoku = Ichimoku(2, 3, 4, 1)
+    for close in (100.0, 104.0, 98.0):
+        ichimoku.push(close)
+    assert ichimoku.tenkan_sen == (104.0 + 98.0) / 2
+    assert ichimoku.kijun_sen == ichimoku.leading_b == (104.0 + 98.0) / 2
+    with pytest.raises(ValueError):
+        Ichimoku(displacement=0)
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ready_trader_go")
+
+from autotrader_vwap import least_square
+
+
+@pytest.mark.parametrize("order", [1, 2, 3, 4])
+def test_least_square_matches_np_polyfit_and_the_normal_equations(order):
+    rng = np.random.default_rng(order)
+    t = np.sort(rng.uniform(0.0, 10.0, order + 1))
+    x = np.vander(t, order + 1, increasing=True)
+    y = rng.normal(100.0, 5.0, (order + 1, 1))
+    coefficients = least_square(x, y, order)
+    assert coefficients.shape == (order + 1, 1)
+    np.testing.assert_allclose(coefficients[:, 0], np.polyfit(t, y[:, 0], order)[::-1], rtol=1e-6, atol=1e-8)
+    np.testing.assert_allclose(coefficients, np.linalg.inv(x.T @ x) @ x.T @ y, rtol=1e-6, atol=1e-8)
+
+
+def test_least_square_sentinels():
+    x = np.vander(np.arange(3.0), 3, increasing=True)
+    assert least_square(x, np.ones((2, 1)), 2).tolist() == [[0.0]]
+    singular = np.ones((3, 3))
+    assert least_square(singular, np.ones((3, 1)), 2).tolist() == [[1.0]]
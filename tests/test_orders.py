@@ -0,0 +1,254 @@
+import itertools
+
+import pytest
+
+pytest.importorskip("ready_trader_go")
+
+from ready_trader_go import Lifespan, Side
+
+from orders import DONE, LIVE, PENDING_AMEND, PENDING_CANCEL, PENDING_NEW, Exposure, OrderRegistry, QuoteLadder
+from scheduler import MessageScheduler
+
+
+class RecordingTrader:
+    def __init__(self):
+        self.sent = []
+
+    def send_insert_order(self, client_order_id, side, price, volume, lifespan):
+        self.sent.append(("insert", client_order_id, side, price, volume))
+
+    def send_amend_order(self, client_order_id, volume):
+        self.sent.append(("amend", client_order_id, volume))
+
+    def send_cancel_order(self, client_order_id):
+        self.sent.append(("cancel", client_order_id))
+
+
+class FrozenLoop:
+    def time(self):
+        return 0.0
+
+    def call_later(self, delay, callback, *args):
+        return None
+
+
+def make_ladder(levels=2, **kwargs):
+    trader = RecordingTrader()
+    registry = OrderRegistry()
+    ladder = QuoteLadder(trader, registry, itertools.count(1), levels, **kwargs)
+    return trader, registry, ladder
+
+
+def test_registry_dispatches_by_client_order_id():
+    registry = OrderRegistry()
+    orders = {client_order_id: registry.insert(client_order_id, Side.BUY, 100 - client_order_id, 5, client_order_id)
+              for client_order_id in range(1, 6)}
+    hedge = registry.hedge(6, Side.SELL, 1, 5)
+    assert len(registry) == 6
+    assert all(client_order_id in registry for client_order_id in range(1, 7))
+    assert registry.get(3) is orders[3] and registry.get(6) is hedge
+    assert registry.filled(2, 1) is orders[2] and orders[2].filled == 1
+    # Ids the registry never saw, e.g. another bot's or a stale one, are ignored.
+    for unknown in (0, 7, 1000):
+        assert unknown not in registry
+        assert registry.get(unknown) is None
+        assert registry.filled(unknown, 1) is None
+        assert registry.status(unknown, 3) is None
+        assert registry.status(unknown, 0) is None
+        assert registry.hedge_filled(unknown) is None
+    assert registry.exposure.resting_buy == 24 and registry.exposure.position == 1
+    assert registry.status(4, 0) is orders[4] and registry.hedge_filled(6) is hedge
+    assert registry.discard(5) is orders[5] and orders[5].state == DONE
+    assert sorted(registry.orders) == [1, 2, 3]
+
+
+def test_registry_moves_an_order_through_its_states():
+    registry = OrderRegistry()
+    order = registry.insert(1, Side.BUY, 100, 10)
+    assert order.state == PENDING_NEW
+    assert registry.status(1, 10).state == LIVE
+    assert registry.amend(1, 6)
+    assert order.state == PENDING_AMEND and order.remaining == 6
+    assert registry.status(1, 6).state == LIVE
+    assert registry.cancel(1)
+    assert order.state == PENDING_CANCEL
+    # A late status or fill does not undo the cancel in flight.
+    assert registry.filled(1, 2).state == PENDING_CANCEL
+    assert registry.status(1, 4).state == PENDING_CANCEL
+    assert not registry.cancel(1)
+    assert not registry.amend(1, 2)
+    assert registry.suppressed == 2
+    assert registry.status(1, 0) is order
+    assert order.state == DONE and 1 not in registry
+    assert registry.status(1, 0) is None
+    assert registry.get(1) is None
+
+
+def test_a_fill_settles_a_new_order_as_live():
+    registry = OrderRegistry()
+    order = registry.insert(1, Side.SELL, 100, 10)
+    registry.filled(1, 3)
+    assert order.state == LIVE and order.filled == 3 and order.remaining == 7
+
+
+def test_hedges_are_done_once_filled_and_do_not_count_towards_exposure():
+    registry = OrderRegistry()
+    hedge = registry.hedge(1, Side.BUY, 100, 10)
+    assert registry.exposure.capacity(Side.BUY) == 100
+    registry.filled(1, 10)
+    assert registry.exposure.position == 0
+    assert registry.hedge_filled(1) is hedge and hedge.state == DONE
+    assert len(registry) == 0
+
+
+def test_exposure_capacity():
+    exposure = Exposure(100)
+    assert exposure.capacity(Side.BUY) == exposure.capacity(Side.SELL) == 100
+    exposure.fill(Side.BUY, 30)
+    exposure.rest(Side.BUY, 50)
+    exposure.rest(Side.SELL, 20)
+    assert exposure.capacity(Side.BUY) == 20
+    assert exposure.capacity(Side.SELL) == 110
+    exposure.rest(Side.BUY, 40)
+    assert exposure.capacity(Side.BUY) == 0
+
+
+def test_registry_keeps_worst_case_exposure():
+    registry = OrderRegistry(100)
+    exposure = registry.exposure
+    registry.insert(1, Side.BUY, 100, 40)
+    registry.insert(2, Side.BUY, 99, 30)
+    registry.insert(3, Side.SELL, 101, 20)
+    assert exposure.capacity(Side.BUY) == 30
+    assert exposure.capacity(Side.SELL) == 80
+    # Fills move volume from resting into the position.
+    registry.filled(1, 10)
+    assert (exposure.position, exposure.resting_buy) == (10, 60)
+    assert exposure.capacity(Side.SELL) == 90
+    # An amend down counts at once; a cancel only once the exchange says it is done.
+    registry.amend(2, 10)
+    assert exposure.resting_buy == 40
+    registry.cancel(1)
+    assert exposure.resting_buy == 40
+    registry.status(1, 0)
+    assert exposure.resting_buy == 10
+    # A fill that beats an amend down can leave nothing resting, never less.
+    registry.amend(3, 5)
+    registry.filled(3, 20)
+    assert exposure.resting_sell == 0 and exposure.position == -10
+    registry.status(3, 0)
+    assert exposure.resting_sell == 0
+    assert exposure.capacity(Side.BUY) == 100 + 10 - 10
+
+
+def test_unchanged_ladder_sends_nothing():
+    trader, registry, ladder = make_ladder()
+    ladder.update([(100, 10), (99, 10)], [(101, 10), (102, 10)])
+    assert len(trader.sent) == 4
+    trader.sent.clear()
+    ladder.update([(100, 10), (99, 10)], [(101, 10), (102, 10)])
+    ladder.update([(0, 10), (0, 10)], [(0, 10), (0, 10)])
+    assert trader.sent == []
+    assert ladder.messages == 4
+
+
+def test_smaller_volume_is_one_amend_not_a_cancel_and_insert():
+    trader, registry, ladder = make_ladder()
+    ladder.update([(100, 10), (99, 10)], [(101, 10), (102, 10)])
+    bid = ladder.order(Side.BUY, 0)
+    registry.filled(bid.client_order_id, 2)
+    trader.sent.clear()
+    ladder.update([(100, 5), (99, 10)], [(101, 10), (102, 10)])
+    # The exchange takes the new total volume, including the 2 lots filled.
+    assert trader.sent == [("amend", bid.client_order_id, 7)]
+    assert ladder.order(Side.BUY, 0) is bid
+    assert (ladder.inserts, ladder.amends, ladder.cancels) == (4, 1, 0)
+
+
+def test_shifted_price_cancels_and_inserts_only_that_level():
+    trader, registry, ladder = make_ladder()
+    ladder.update([(100, 10), (99, 10)], [(101, 10), (102, 10)])
+    old = ladder.order(Side.SELL, 1)
+    trader.sent.clear()
+    ladder.update([(100, 10), (99, 10)], [(101, 10), (103, 10)])
+    new = ladder.order(Side.SELL, 1)
+    assert trader.sent == [("cancel", old.client_order_id), ("insert", new.client_order_id, Side.SELL, 103, 10)]
+
+
+def test_wait_for_cancel_leaves_the_level_empty_until_the_cancel_lands():
+    trader, registry, ladder = make_ladder(1, wait_for_cancel=True)
+    ladder.update([(100, 10)], [(101, 10)])
+    old = ladder.order(Side.BUY, 0)
+    trader.sent.clear()
+    ladder.update([(98, 10)], [(101, 10)])
+    ladder.update([(97, 10)], [(101, 10)])
+    assert trader.sent == [("cancel", old.client_order_id)]
+    registry.status(old.client_order_id, 0)
+    ladder.update([(97, 10)], [(101, 10)])
+    assert trader.sent[-1][0] == "insert" and trader.sent[-1][3] == 97
+
+
+def test_a_level_waiting_for_its_cancel_sends_no_duplicates():
+    trader, registry, ladder = make_ladder(1, wait_for_cancel=True)
+    ladder.update([(100, 10)], [(101, 10)])
+    bid = ladder.order(Side.BUY, 0)
+    trader.sent.clear()
+    # The strategy keeps asking for a new price, and cancels and amends the
+    # level directly, on every book update until the cancel lands.
+    for price in (99, 98, 97, 96):
+        ladder.update([(price, 10)], [(101, 10)])
+        ladder.cancel(Side.BUY, 0)
+        ladder.amend(Side.BUY, 0, 3)
+    assert trader.sent == [("cancel", bid.client_order_id)]
+    assert ladder.cancels == 1 and ladder.amends == 0
+    assert registry.suppressed == 3 * 4 - 1
+    registry.status(bid.client_order_id, 0)
+    ladder.cancel(Side.BUY, 0)
+    assert trader.sent == [("cancel", bid.client_order_id)]
+
+
+def test_inserts_are_clipped_to_the_position_limit():
+    trader = RecordingTrader()
+    registry = OrderRegistry(25)
+    ladder = QuoteLadder(trader, registry, itertools.count(1), 3)
+    ladder.update([(100, 10), (99, 10), (98, 10)], [(101, 10), (102, 10), (103, 10)])
+    # 25 lots fit on each side: two full levels, the third cut to 5.
+    assert [message[4] for message in trader.sent] == [10, 10, 5, 10, 10, 5]
+    assert ladder.clipped == 2
+    assert registry.exposure.capacity(Side.BUY) == registry.exposure.capacity(Side.SELL) == 0
+    # A full side inserts nothing, even at a new price.
+    trader.sent.clear()
+    ladder.cancel(Side.BUY, 2)
+    ladder.update([(0, 0), (0, 0), (97, 10)], [(0, 0), (0, 0), (0, 0)])
+    assert trader.sent == [("cancel", 3)] and ladder.clipped == 3
+    assert ladder.order(Side.BUY, 2) is None
+    # Capacity frees up once the cancel lands, and fills on the other side add to it.
+    registry.status(3, 0)
+    registry.filled(4, 10)
+    ladder.update([(0, 0), (0, 0), (97, 10)], [(0, 0), (0, 0), (0, 0)])
+    assert trader.sent[-1] == ("insert", 7, Side.BUY, 97, 10)
+    assert ladder.clipped == 3
+
+
+def test_lifespan_is_passed_through():
+    trader, registry, ladder = make_ladder(1, lifespan=Lifespan.FILL_AND_KILL)
+    sent = []
+    trader.send_insert_order = lambda *args: sent.append(args)
+    ladder.update([(100, 10)], [(0, 0)])
+    assert sent == [(1, Side.BUY, 100, 10, Lifespan.FILL_AND_KILL)]
+
+
+def test_ladder_counts_what_it_hands_over_and_the_scheduler_what_it_sends():
+    trader = RecordingTrader()
+    registry = OrderRegistry()
+    outbox = MessageScheduler(FrozenLoop(), trader, registry, burst=2)
+    ladder = QuoteLadder(outbox, registry, itertools.count(1), 1)
+    for price in range(100, 90, -1):
+        ladder.update([(price, 10)], [(0, 0)])
+    assert (ladder.inserts, ladder.cancels) == (10, 9)
+    # The first insert and its cancel use up the burst. Every later insert is
+    # queued and then dropped along with its cancel, except the last.
+    assert (outbox.inserts, outbox.cancels, outbox.amends) == (1, 1, 0)
+    assert outbox.tokens_used == len(trader.sent) == 2
+    assert outbox.coalesced == 2 * 8
+    assert outbox.queued == 1
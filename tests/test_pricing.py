@@ -0,0 +1,55 @@
+import math
+
+import numpy as np
+import pytest
+
+pytest.importorskip("ready_trader_go")
+
+from pricing import RailPricer, ask_tick, bid_tick, mid
+
+
+def reference_grid():
+    """Future mids (whole half-cents, in cents) and rails around them, including ones on a tick."""
+    rng = np.random.default_rng(19)
+    mids = [(ask + bid) / 2 for bid in range(90000, 110001, 700) for ask in (bid + 100, bid + 200, bid + 300)]
+    rails = list(rng.uniform(-600.0, 600.0, 200)) + [-300.0, -250.5, -100.0, -50.5, -0.5, 0.0, 0.5, 49.5, 100.0,
+                                                       199.99, 200.0, 200.01]
+    return mids, rails
+
+
+def test_bids_match_the_old_float_pricing():
+    mids, rails = reference_grid()
+    pricer = RailPricer(1)
+    for rail in rails:
+        pricer.update((rail,), (rail,))
+        for fut_price in mids:
+            (bid,), _ = pricer.prices(int(2 * fut_price))
+            assert bid == int(rail + fut_price) // 100 * 100
+
+
+def test_asks_round_up_to_the_next_tick():
+    mids, rails = reference_grid()
+    pricer = RailPricer(1)
+    for rail in rails:
+        pricer.update((rail,), (rail,))
+        for fut_price in mids:
+            _, (ask,) = pricer.prices(int(2 * fut_price))
+            assert ask == math.ceil((rail + fut_price) / 100) * 100
+
+
+def test_levels_are_priced_together_and_asks_can_use_their_own_reference():
+    pricer = RailPricer(3)
+    pricer.update((-150.0, -250.0, -350.0), (150.0, 250.0, 350.0))
+    bids, asks = pricer.prices(mid(10100, 10000))
+    assert bids == [9900, 9800, 9700]
+    assert asks == [10200, 10300, 10400]
+    bids, asks = pricer.prices(2 * 10000, 2 * 10100)
+    assert bids == [9800, 9700, 9600]
+    assert asks == [10300, 10400, 10500]
+
+
+def test_tick_helpers_work_on_ints_and_arrays():
+    assert bid_tick(20199) == 10000 and ask_tick(20001) == 10100
+    assert bid_tick(20000) == ask_tick(20000) == 10000
+    np.testing.assert_array_equal(bid_tick(np.array([19999, 20000, 20399])), [9900, 10000, 10100])
+    np.testing.assert_array_equal(ask_tick(np.array([19999, 20000, 20201])), [10000, 10000, 10200])
@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pytest
+
+from regression import KalmanHedgeRatio, OnlineLinearRegression, SlidingSlope
+
+
+def log_prices(count: int, seed: int, beta: float = 1.3):
+    """Log future prices and log ETF prices that follow them at the given ratio, plus noise."""
+    rng = np.random.default_rng(seed)
+    x = np.log(10000.0) + np.cumsum(rng.normal(0.0, 1e-3, count))
+    y = 0.02 + beta * x + rng.normal(0.0, 1e-4, count)
+    return x, y
+
+
+def test_online_regression_matches_np_polyfit():
+    x, y = log_prices(5000, 4)
+    fit = OnlineLinearRegression()
+    for i in range(len(x)):
+        residual = fit.push(x[i], y[i])
+        if i in (1, 10, 100, 1000, len(x) - 1):
+            beta, alpha = np.polyfit(x[:i + 1], y[:i + 1], 1)
+            assert math.isclose(fit.beta, beta, rel_tol=1e-6)
+            assert math.isclose(fit.alpha, alpha, rel_tol=1e-6, abs_tol=1e-6)
+            assert math.isclose(residual, y[i] - alpha - beta * x[i], abs_tol=1e-9)
+            assert residual == fit.residual(x[i], y[i])
+
+
+@pytest.mark.parametrize("forgetting", [0.99, 0.999])
+def test_online_regression_with_forgetting_is_exponentially_weighted_least_squares(forgetting):
+    x, y = log_prices(3000, 5)
+    fit = OnlineLinearRegression(forgetting)
+    for i in range(len(x)):
+        fit.push(x[i], y[i])
+    # np.polyfit weights the residuals, so the squared weights are the pair weights.
+    weights = forgetting ** np.arange(len(x) - 1, -1, -1)
+    beta, alpha = np.polyfit(x, y, 1, w=np.sqrt(weights))
+    assert math.isclose(fit.beta, beta, rel_tol=1e-6)
+    assert math.isclose(fit.alpha, alpha, rel_tol=1e-6, abs_tol=1e-6)
+    assert math.isclose(fit.weight, weights.sum(), rel_tol=1e-9)
+
+
+def test_online_regression_is_not_ready_until_x_moves():
+    fit = OnlineLinearRegression()
+    for _ in range(3):
+        fit.push(5.0, 7.0)
+    assert not fit.ready and fit.beta == 0.0
+    fit.push(6.0, 9.0)
+    assert fit.ready
+    with pytest.raises(ValueError):
+        OnlineLinearRegression(0.0)
+
+
+def test_kalman_hedge_ratio_converges_to_a_constant_beta():
+    rng = np.random.default_rng(6)
+    x = rng.uniform(-1.0, 1.0, 4000)
+    y = 0.5 + 1.3 * x + rng.normal(0.0, 0.01, len(x))
+    kalman = KalmanHedgeRatio(delta=1e-6, observation_var=1e-4)
+    for i in range(len(x)):
+        kalman.push(x[i], y[i])
+    assert abs(kalman.beta - 1.3) < 5e-3
+    assert abs(kalman.alpha - 0.5) < 5e-3
+    assert abs(kalman.residual(0.25, 0.5 + 1.3 * 0.25)) < 5e-3
+    with pytest.raises(ValueError):
+        KalmanHedgeRatio(delta=1.0)
+
+
+@pytest.mark.parametrize("window", [1, 2, 5, 48])
+def test_sliding_slope_matches_np_polyfit_across_recomputes(window):
+    rng = np.random.default_rng(window)
+    # VWAPs are whole cents, but the bots also feed it mid prices in half-cents.
+    values = (10000.0 + np.cumsum(rng.normal(0.0, 30.0, 5 * window + 7))).round(1).tolist()
+    slope = SlidingSlope(window)
+    assert slope.slope() == 0.0
+    for i, value in enumerate(values, 1):
+        slope.push(value)
+        tail = values[max(i - window, 0):i]
+        assert len(slope) == len(tail)
+        if len(tail) < 2:
+            assert slope.slope() == 0.0
+        else:
+            expected = np.polyfit(range(len(tail)), tail, 1)[0]
+            assert math.isclose(slope.slope(), expected, rel_tol=1e-9, abs_tol=1e-9)
@@ -0,0 +1,135 @@
+import heapq
+import itertools
+
+import pytest
+
+pytest.importorskip("ready_trader_go")
+
+from ready_trader_go import Lifespan, Side
+
+from orders import OrderRegistry
+from scheduler import MessageScheduler
+
+
+class ManualLoop:
+    """Just enough of an event loop to run the scheduler's timers by hand."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []
+        self.order = itertools.count()
+
+    def time(self):
+        return self.now
+
+    def call_later(self, delay, callback, *args):
+        timer = Timer()
+        heapq.heappush(self.timers, (self.now + delay, next(self.order), timer, callback, args))
+        return timer
+
+    def advance(self, seconds):
+        end = self.now + seconds
+        while self.timers and self.timers[0][0] <= end:
+            when, _, timer, callback, args = heapq.heappop(self.timers)
+            self.now = when
+            if not timer.cancelled:
+                callback(*args)
+        self.now = end
+
+
+class Timer:
+    cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class RecordingTrader:
+    def __init__(self, loop):
+        self.loop = loop
+        self.sent = []
+
+    def send_insert_order(self, client_order_id, side, price, volume, lifespan):
+        self.sent.append((self.loop.time(), "insert", client_order_id, volume))
+
+    def send_amend_order(self, client_order_id, volume):
+        self.sent.append((self.loop.time(), "amend", client_order_id, volume))
+
+    def send_cancel_order(self, client_order_id):
+        self.sent.append((self.loop.time(), "cancel", client_order_id))
+
+    def send_hedge_order(self, client_order_id, side, price, volume):
+        self.sent.append((self.loop.time(), "hedge", client_order_id, volume))
+
+
+def make_scheduler(registry=None, **kwargs):
+    loop = ManualLoop()
+    trader = RecordingTrader(loop)
+    return loop, trader, MessageScheduler(loop, trader, registry, **kwargs)
+
+
+def test_no_window_sees_more_than_the_limit():
+    loop, trader, outbox = make_scheduler()
+    for client_order_id in range(1, 301):
+        outbox.send_insert_order(client_order_id, Side.BUY, 100, 1, Lifespan.GOOD_FOR_DAY)
+        if client_order_id % 20 == 0:
+            loop.advance(0.05)
+    loop.advance(10.0)
+    times = [message[0] for message in trader.sent]
+    assert len(times) == 300 and outbox.queued == 0
+    # The burst goes out at once; after that the bucket refills at 40 a second.
+    assert times[:10] == [0.0] * 10 and times[10] > 0.0
+    for i, start in enumerate(times):
+        assert sum(1 for t in times[i:] if t < start + 1.0) <= 50
+    assert times[-1] == pytest.approx(290 / 40.0, abs=1e-6)
+    assert outbox.inserts == outbox.tokens_used == 300
+    assert outbox.throttled > 0
+
+
+def test_queues_drain_cancels_and_hedges_then_amends_then_inserts():
+    loop, trader, outbox = make_scheduler(burst=1)
+    outbox.send_insert_order(1, Side.BUY, 100, 5, Lifespan.GOOD_FOR_DAY)
+    outbox.send_insert_order(2, Side.BUY, 99, 5, Lifespan.GOOD_FOR_DAY)
+    outbox.send_amend_order(1, 3)
+    outbox.send_hedge_order(3, Side.SELL, 1, 5)
+    outbox.send_cancel_order(1)
+    loop.advance(1.0)
+    assert [message[1:3] for message in trader.sent] == [("insert", 1), ("hedge", 3), ("cancel", 1),
+                                                           ("amend", 1), ("insert", 2)]
+    assert (outbox.inserts, outbox.amends, outbox.cancels, outbox.hedges) == (2, 1, 1, 1)
+
+
+def test_cancelling_a_queued_insert_drops_both_and_reports_it():
+    dropped = []
+    loop, trader, outbox = make_scheduler(burst=1, on_dropped=dropped.append)
+    outbox.send_insert_order(1, Side.BUY, 100, 5, Lifespan.GOOD_FOR_DAY)
+    outbox.send_insert_order(2, Side.BUY, 99, 5, Lifespan.GOOD_FOR_DAY)
+    outbox.send_amend_order(2, 3)
+    outbox.send_cancel_order(2)
+    loop.advance(1.0)
+    assert [message[1:] for message in trader.sent] == [("insert", 1, 5)]
+    assert dropped == [2]
+    assert outbox.coalesced == 3
+
+
+def test_amending_a_queued_insert_changes_its_volume():
+    loop, trader, outbox = make_scheduler(burst=1)
+    outbox.send_insert_order(1, Side.BUY, 100, 5, Lifespan.GOOD_FOR_DAY)
+    outbox.send_insert_order(2, Side.BUY, 99, 5, Lifespan.GOOD_FOR_DAY)
+    outbox.send_amend_order(2, 3)
+    loop.advance(1.0)
+    assert [message[1:] for message in trader.sent] == [("insert", 1, 5), ("insert", 2, 3)]
+    assert outbox.coalesced == 1
+
+
+def test_a_newer_insert_for_a_registry_level_replaces_the_queued_one():
+    registry = OrderRegistry()
+    dropped = []
+    loop, trader, outbox = make_scheduler(registry, burst=1, on_dropped=dropped.append)
+    for client_order_id, (slot, price) in enumerate([(0, 100), (1, 99), (1, 98), (0, 101)], 1):
+        registry.insert(client_order_id, Side.BUY, price, 5, slot)
+        outbox.send_insert_order(client_order_id, Side.BUY, price, 5, Lifespan.GOOD_FOR_DAY)
+    loop.advance(1.0)
+    assert [message[2] for message in trader.sent] == [1, 3, 4]
+    assert dropped == [2]
+    assert 2 not in registry
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from series import PairBuffer, RingSeries
+
+
+def test_ring_series_keeps_the_last_capacity_values_across_wraparound():
+    series = RingSeries(4)
+    for value in range(1, 11):
+        series.append(value)
+        expected = list(range(max(value - 3, 1), value + 1))
+        assert list(series) == expected
+        assert series.values().tolist() == expected
+    assert len(series) == 4
+    assert series.count == 10
+    assert series[0] == 7.0 and series[-1] == 10.0
+    assert series.tail(2).tolist() == [9.0, 10.0]
+    assert series.tail(10).tolist() == [7.0, 8.0, 9.0, 10.0]
+    with pytest.raises(IndexError):
+        series[4]
+
+
+def test_ring_series_views_are_contiguous_at_every_head_position():
+    series = RingSeries(5)
+    for value in range(17):
+        series.append(value)
+        view = series.values()
+        assert view.flags.c_contiguous
+        assert np.shares_memory(view, series._data)
+        assert view.tolist() == list(range(max(value - 4, 0), value + 1))
+
+
+def test_ring_series_seeded_values_and_dtype():
+    series = RingSeries(3, [1, 2, 3, 4], dtype=np.int64)
+    assert series.values().dtype == np.int64
+    assert list(series) == [2, 3, 4]
+    assert series.nbytes == 6 * 8
+    with pytest.raises(ValueError):
+        RingSeries(0)
+
+
+def test_pair_buffer_pairs_by_sequence_number():
+    pairs = PairBuffer()
+    assert not pairs.update_etf(1, 100.0)
+    assert pairs.update_future(1, 101.0)
+    assert pairs.last() == (100.0, 101.0)
+    # The future book for 2 arrives first, then a stale ETF update for 1.
+    assert not pairs.update_future(2, 103.0)
+    assert not pairs.update_etf(1, 99.0)
+    assert pairs.update_etf(2, 102.0)
+    assert pairs.last() == (102.0, 103.0)
+    assert len(pairs) == 2
+
+
+def test_pair_buffer_skips_sequence_numbers_only_one_side_reports():
+    pairs = PairBuffer()
+    assert not pairs.update_etf(1, 100.0)
+    assert not pairs.update_etf(2, 104.0)
+    assert not pairs.update_future(1, 101.0)
+    assert pairs.update_future(2, 105.0)
+    assert pairs.last() == (104.0, 105.0)
+    assert len(pairs) == 1
+    assert not pairs.update_future(2, 106.0)
+
+
+def random_arrivals(seed: int, stale: bool):
+    """Both books' updates, each side in order but skipping some sequence
+    numbers, usually in step but sometimes one side runs ahead; optionally
+    with stale repeats mixed in."""
+    rng = np.random.default_rng(seed)
+    sides = {side: [s for s in range(400) if rng.random() > 0.2] for side in ("etf", "future")}
+    positions = {"etf": 0, "future": 0}
+    arrivals = []
+    while any(positions[side] < len(sides[side]) for side in sides):
+        behind = min(sides, key=lambda s: sides[s][positions[s]] if positions[s] < len(sides[s]) else 400)
+        side = behind if rng.random() < 0.8 else ("future" if behind == "etf" else "etf")
+        if positions[side] == len(sides[side]):
+            continue
+        if stale and positions[side] > 1 and rng.random() < 0.2:
+            arrivals.append((side, sides[side][int(rng.integers(0, positions[side] - 1))], -1.0))
+        sequence_number = sides[side][positions[side]]
+        positions[side] += 1
+        arrivals.append((side, sequence_number, float(sequence_number * 10 + (side == "future"))))
+    return arrivals
+
+
+def expected_pairs(arrivals):
+    """A sequence number pairs if both sides reach it before either moves past it."""
+    fresh = [arrival for arrival in arrivals if arrival[2] >= 0]
+    reached = {}
+    left = {}
+    for time, (side, sequence_number, _) in enumerate(fresh):
+        reached[side, sequence_number] = time
+        left.setdefault(side, {})
+        for previous in [s for s in left[side] if left[side][s] is None]:
+            left[side][previous] = time
+        left[side][sequence_number] = None
+    pairs = []
+    for (side, sequence_number), time in reached.items():
+        if side != "etf" or ("future", sequence_number) not in reached:
+            continue
+        complete = max(time, reached["future", sequence_number])
+        moved_on = [left[s][sequence_number] for s in ("etf", "future") if left[s][sequence_number] is not None]
+        if not moved_on or complete < min(moved_on):
+            pairs.append((sequence_number, complete))
+    return [sequence_number for sequence_number, _ in sorted(pairs, key=lambda pair: pair[1])]
+
+
+@pytest.mark.parametrize("seed, stale", [(1, False), (2, False), (3, True), (4, True)])
+def test_pair_buffer_matches_a_reference_pairing_under_random_arrival(seed, stale):
+    arrivals = random_arrivals(seed, stale)
+    pairs = PairBuffer()
+    emitted = []
+    for side, sequence_number, price in arrivals:
+        update = pairs.update_etf if side == "etf" else pairs.update_future
+        if update(sequence_number, price):
+            emitted.append(pairs.last_sequence)
+            assert pairs.last() == (sequence_number * 10.0, sequence_number * 10.0 + 1.0)
+    assert emitted == expected_pairs(arrivals)
+    assert len(pairs) == len(emitted) > 100
@@ -0,0 +1,153 @@
+import math
+
+import numpy as np
+import pytest
+
+from streaming_stats import RollingStats, RollingVWAP, RunningStats
+
+TICKS = 1_000_000
+TOLERANCE = 1e-9
+
+
+def synthetic_spread(seed: int = 2023) -> np.ndarray:
+    """An ETF-minus-future spread in cents: a noisy random walk around a level."""
+    rng = np.random.default_rng(seed)
+    walk = np.cumsum(rng.normal(0.0, 5.0, TICKS))
+    return 150.0 + walk + rng.normal(0.0, 100.0, TICKS)
+
+
+def test_running_stats_matches_np_std_over_a_million_ticks():
+    spread = synthetic_spread()
+    stats = RunningStats()
+    checkpoints = {10, 1000, 100_000, TICKS}
+    for i, value in enumerate(spread.tolist(), 1):
+        stats.push(value)
+        if i in checkpoints:
+            assert math.isclose(stats.mean, np.mean(spread[:i]), rel_tol=TOLERANCE)
+            assert math.isclose(stats.std(), np.std(spread[:i]), rel_tol=TOLERANCE)
+            assert math.isclose(stats.std(1), np.std(spread[:i], ddof=1), rel_tol=TOLERANCE)
+    assert len(stats) == TICKS
+
+
+def test_merge_matches_a_single_accumulator():
+    spread = synthetic_spread(7)
+    whole = RunningStats()
+    parts = [RunningStats() for _ in range(4)]
+    for part, chunk in zip(parts, np.array_split(spread, len(parts))):
+        for value in chunk.tolist():
+            part.push(value)
+            whole.push(value)
+    merged = RunningStats()
+    for part in parts:
+        merged.merge(part)
+    assert merged.count == whole.count == TICKS
+    assert math.isclose(merged.mean, np.mean(spread), rel_tol=TOLERANCE)
+    assert math.isclose(merged.std(), np.std(spread), rel_tol=TOLERANCE)
+    assert math.isclose(merged.std(), whole.std(), rel_tol=TOLERANCE)
+
+
+def test_merge_with_empty_accumulators():
+    stats = RunningStats()
+    for value in (1.0, 2.0, 4.0):
+        stats.push(value)
+    stats.merge(RunningStats())
+    empty = RunningStats()
+    empty.merge(stats)
+    assert empty.count == 3
+    assert math.isclose(empty.std(), np.std([1.0, 2.0, 4.0]), rel_tol=TOLERANCE)
+
+
+def random_book(ticks: int, seed: int):
+    """Mid prices in whole half-cents and top-of-book volumes, some of them zero."""
+    rng = np.random.default_rng(seed)
+    prices = (20000 + np.cumsum(rng.integers(-2, 3, ticks)) * 100 + rng.integers(0, 2, ticks) * 100) / 2
+    volumes = rng.integers(0, 40, ticks) * (rng.random(ticks) > 0.1)
+    return prices.tolist(), volumes.tolist()
+
+
+def old_loop_vwap(prices, volumes, period):
+    """The bots' original VWAP, which always left out one sample."""
+    s = s2 = 0
+    for i in range(-1, -min(len(prices), period), -1):
+        s += prices[i] * volumes[i]
+        s2 += volumes[i]
+    return 0 if s2 == 0 else int(s / s2)
+
+
+@pytest.mark.parametrize("window", [1, 5, 23])
+def test_rolling_vwap_matches_a_numpy_window(window):
+    prices, volumes = random_book(500, window)
+    vwap = RollingVWAP(window, min(5, window))
+    for i in range(len(prices)):
+        vwap.push(prices[i], volumes[i])
+        p = np.array(prices[max(i + 1 - window, 0):i + 1])
+        v = np.array(volumes[max(i + 1 - window, 0):i + 1])
+        expected = 0.0 if v.sum() == 0 else float(p @ v) / v.sum()
+        assert vwap.vwap() == expected
+        assert len(vwap) == min(i + 1, window)
+        assert math.isclose(vwap.average(), sum(prices[max(i + 1 - vwap.average_window, 0):i + 1]) /
+                            vwap.average_window)
+
+
+@pytest.mark.parametrize("period", [2, 9, 24])
+def test_rolling_vwap_skip_first_matches_the_old_loop_from_the_first_tick(period):
+    prices, volumes = random_book(300, period)
+    vwap = RollingVWAP(period - 1, 1, skip_first=True)
+    for i in range(len(prices)):
+        vwap.push(prices[i], volumes[i])
+        assert int(vwap.vwap()) == old_loop_vwap(prices[:i + 1], volumes[:i + 1], period)
+
+
+def test_rolling_vwap_with_no_volume_is_zero():
+    vwap = RollingVWAP(3, 1)
+    for price in (100.0, 101.0, 102.0, 103.0):
+        vwap.push(price, 0)
+        assert vwap.vwap() == 0.0
+    vwap.push(104.0, 5)
+    assert vwap.vwap() == 104.0
+    with pytest.raises(ValueError):
+        RollingVWAP(3, 4)
+
+
+@pytest.mark.parametrize("window, recenter_every", [(1, 0), (12, 0), (360, 0), (50, 7)])
+def test_rolling_stats_matches_np_std_of_the_trailing_window(window, recenter_every):
+    values = synthetic_spread(window)[:2000].tolist()
+    stats = RollingStats(window, recenter_every)
+    for i, value in enumerate(values, 1):
+        stats.push(value)
+        tail = values[max(i - window, 0):i]
+        assert len(stats) == len(tail)
+        assert math.isclose(stats.mean, np.mean(tail), rel_tol=1e-9, abs_tol=1e-9)
+        assert math.isclose(stats.std(), np.std(tail), rel_tol=1e-7, abs_tol=1e-7)
+        if len(tail) > 1:
+            assert math.isclose(stats.std(1), np.std(tail, ddof=1), rel_tol=1e-7, abs_tol=1e-7)
+        else:
+            assert stats.std(1) == 0.0
+
+
+def test_rolling_stats_recenter_keeps_a_large_level_accurate():
+    # Prices in cents sit far from zero, which is where add/remove updates
+    # lose the most precision between recentres.
+    rng = np.random.default_rng(3)
+    values = (1e7 + rng.normal(0.0, 1.0, 20_000)).tolist()
+    stats = RollingStats(100)
+    for i, value in enumerate(values, 1):
+        stats.push(value)
+        # Check halfway between recentres, where the drift is largest.
+        if i % 100 == 50 and i > 100:
+            tail = values[i - 100:i]
+            assert math.isclose(stats.std(), np.std(tail), rel_tol=1e-6)
+    stats.recenter()
+    assert math.isclose(stats.mean, np.mean(values[-100:]), rel_tol=1e-12)
+    assert math.isclose(stats.std(), np.std(values[-100:]), rel_tol=1e-9)
+    with pytest.raises(ValueError):
+        RollingStats(0)
+
+
+def test_rolling_stats_empty_and_constant_windows():
+    stats = RollingStats(4)
+    stats.recenter()
+    assert stats.std() == stats.std(1) == 0.0
+    for _ in range(10):
+        stats.push(2.5)
+    assert stats.mean == 2.5 and stats.variance() == 0.0